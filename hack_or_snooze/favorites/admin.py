@@ -1,3 +1,19 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Favorite
+
+
+class FavoriteInline(admin.TabularInline):
+    """
+    A user's favorites, edited on their admin page.
+
+    Inline saves and deletes go through the Favorite receivers (see
+    favorites/signals.py), which keep favorite counts and caches in step.
+    """
+
+    model = Favorite
+    fk_name = "user"
+    # A select of every story would load the whole table per row:
+    raw_id_fields = ("story",)
+    readonly_fields = ("created",)
+    extra = 0
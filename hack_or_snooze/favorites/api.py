@@ -1,6 +1,5 @@
-from django.core.exceptions import ObjectDoesNotExist
-
-from ninja import Router
+from django.conf import settings
+from ninja import Router, Query
 
 from hack_or_snooze.error_schemas import (
     BadRequest,
@@ -10,9 +9,25 @@ from hack_or_snooze.error_schemas import (
 from stories.models import Story
 from users.models import User
 from users.auth_utils import token_header
+from users.queries import aprefetch_user_payload
 
+from hack_or_snooze.fieldsets import narrow_schema, schema_response
 from users.schemas import (
+    FavoriteBatchInput,
+    FavoriteBatchOutput,
+    FavoriteContainsInput,
+    FavoriteContainsOutput,
+    FavoriteToggleOutput,
     UserOutput,
+    UserPayloadLimits,
+)
+
+from .cache import afavorite_ids, contains
+from .queries import (
+    aadd_favorite,
+    aapply_favorite_batch,
+    aremove_favorite,
+    afavorite_failure,
 )
 
 router = Router()
@@ -28,7 +43,13 @@ router = Router()
     },
     auth=token_header
 )
-def add_favorite(request, username: str, story_id: str):
+async def add_favorite(
+    request,
+    username: str,
+    story_id: str,
+    limits: Query[UserPayloadLimits],
+    delta: bool = False,
+):
     """
     Add a story to a user's favorites.
 
@@ -45,6 +66,18 @@ def add_favorite(request, username: str, story_id: str):
             }
         }
 
+    Optional query parameters **stories_limit** and **favorites_limit** keep
+    only the newest N nested stories/favorites.
+
+    With query parameter **delta=true**, returns only the change, which
+    costs the same however many stories and favorites the user has:
+
+        {
+            "story_id": "725ff2f9-2cc4-4e29-abab-95b9921f5a6b",
+            "favorited": true,
+            "favorite_count": 3
+        }
+
     **Authentication: token**
 
     **Authorization: same user or admin**
@@ -54,28 +87,15 @@ def add_favorite(request, username: str, story_id: str):
     if username != curr_user.username and curr_user.is_staff is not True:
         return 401, {"detail": "Unauthorized"}
 
-    # this covers the case where the curr_user is staff, but the target user
-    # does not exist:
-    try:
-        user = User.objects.get(username=username)
-    except ObjectDoesNotExist:
-        return 404, {"detail": "User not found."}
-
-    try:
-        story = Story.objects.get(id=story_id)
-    except ObjectDoesNotExist:
-        return 404, {"detail": "Story not found."}
-
-    if story in user.stories.all():
-        return 400, {"detail": "Cannot add own user stories to favorites"}
+    if not await aadd_favorite(username, story_id):
+        status, detail = await afavorite_failure(username, story_id)
+        return status, {"detail": detail}
 
-    isFavorited = User.favorites.through.objects.filter(
-        user_id=username, story_id=story_id).exists()
+    if delta:
+        return await favorite_delta_response(request, story_id, True)
 
-    if isFavorited:
-        return 400, {"detail": "Story already favorited."}
-
-    user.favorites.add(story)
+    user = await User.objects.aget(username=username)
+    await aprefetch_user_payload(user, **limits.dict())
 
     return {"user": user}
 
@@ -90,7 +110,13 @@ def add_favorite(request, username: str, story_id: str):
     },
     auth=token_header
 )
-def remove_favorite(request, username: str, story_id: str):
+async def remove_favorite(
+    request,
+    username: str,
+    story_id: str,
+    limits: Query[UserPayloadLimits],
+    delta: bool = False,
+):
     """
     Remove a story from a user's favorites.
 
@@ -108,6 +134,12 @@ def remove_favorite(request, username: str, story_id: str):
             }
         }
 
+    Optional query parameters **stories_limit** and **favorites_limit** keep
+    only the newest N nested stories/favorites.
+
+    With query parameter **delta=true**, returns only the change (see POST
+    /favorites/{username}/{story_id}/favorite), with "favorited" false.
+
     **Authentication: token**
 
     **Authorization: same user or admin**
@@ -117,15 +149,203 @@ def remove_favorite(request, username: str, story_id: str):
     if username != curr_user.username and curr_user.is_staff is not True:
         return 401, {"detail": "Unauthorized"}
 
-    isFavorited = User.favorites.through.objects.filter(
-        user_id=username, story_id=story_id).exists()
-
-    if not isFavorited:
+    if not await aremove_favorite(username, story_id):
         return 404, {"detail": "Favorite not found."}
 
-    story = Story.objects.get(id=story_id)
-    user = User.objects.get(username=username)
+    if delta:
+        return await favorite_delta_response(request, story_id, False)
 
-    user.favorites.remove(story)
+    user = await User.objects.aget(username=username)
+    await aprefetch_user_payload(user, **limits.dict())
 
     return {"user": user}
+
+
+async def favorite_delta_response(request, story_id, favorited):
+    """Render the ?delta=true response to a favorite toggle of story_id.
+    Costs one query, for the story's updated favorite_count."""
+
+    favorite_count = await Story.objects.filter(id=story_id).values_list(
+        "favorite_count", flat=True
+    ).afirst()
+
+    return schema_response(
+        request,
+        router.api,
+        FavoriteToggleOutput,
+        {
+            "story_id": story_id,
+            "favorited": favorited,
+            # None if the story was deleted since:
+            "favorite_count": favorite_count or 0,
+        }
+    )
+
+
+@router.post(
+    '/{str:username}/batch',
+    response={
+        200: FavoriteBatchOutput,
+        400: BadRequest,
+        401: Unauthorized,
+        404: ObjectNotFound
+    },
+    auth=token_header
+)
+async def favorites_batch(
+    request,
+    username: str,
+    data: FavoriteBatchInput,
+    limits: Query[UserPayloadLimits],
+    delta: bool = False,
+):
+    """
+    Add and remove many of a user's favorites in one request, all in one
+    transaction.
+
+        {
+            "add": ["725ff2f9-...", "a3c1e0b2-..."],
+            "remove": ["5d3b1f0e-..."]
+        }
+
+    On success, returns what happened to each story ID (adds first, each in
+    request order) and the user data after the changes:
+
+        {
+            "results": [
+                {"story_id": "725ff2f9-...", "outcome": "added"},
+                {"story_id": "a3c1e0b2-...", "outcome": "already_favorited"},
+                {"story_id": "5d3b1f0e-...", "outcome": "removed"}
+            ],
+            "user": {
+                "stories": [Story, Story...],
+                "favorites": [Story, Story...],
+                "username": "test",
+                ...
+            }
+        }
+
+    Outcomes for added IDs are "added", "already_favorited", "own_story" and
+    "not_found"; for removed IDs, "removed" and "not_favorited". A story that
+    can't be changed doesn't fail the batch.
+
+    With query parameter **delta=true**, "user" is left out, which saves
+    loading it. Otherwise, optional query parameters **stories_limit** and
+    **favorites_limit** keep only the newest N nested stories/favorites.
+
+    On failure for more IDs than the configured maximum (100 by default), or
+    for an ID in both lists, returns error JSON:
+
+        {
+            "detail": "Too many IDs. Max is 100."
+        }
+
+    **Authentication: token**
+
+    **Authorization: same user or admin**
+    """
+    curr_user = request.auth
+
+    if username != curr_user.username and curr_user.is_staff is not True:
+        return 401, {"detail": "Unauthorized"}
+
+    add = list(dict.fromkeys(data.add))
+    remove = list(dict.fromkeys(data.remove))
+
+    max_ids = settings.FAVORITES_BATCH_MAX_IDS
+
+    if len(add) + len(remove) > max_ids:
+        return 400, {"detail": f"Too many IDs. Max is {max_ids}."}
+
+    if not set(add).isdisjoint(remove):
+        return 400, {"detail": "Cannot both add and remove the same story."}
+
+    # Staff may name any user; the batch adds nothing for a missing one:
+    if (
+        username != curr_user.username
+        and not await User.objects.filter(username=username).aexists()
+    ):
+        return 404, {"detail": "User not found."}
+
+    results = await aapply_favorite_batch(username, add, remove)
+
+    if delta:
+        return schema_response(
+            request,
+            router.api,
+            narrow_schema(FavoriteBatchOutput, ("results",)),
+            {"results": results}
+        )
+
+    user = await User.objects.aget(username=username)
+    await aprefetch_user_payload(user, **limits.dict())
+
+    return {"results": results, "user": user}
+
+
+@router.post(
+    '/{str:username}/contains',
+    response={
+        200: FavoriteContainsOutput,
+        400: BadRequest,
+        401: Unauthorized,
+        404: ObjectNotFound
+    },
+    auth=token_header
+)
+async def favorites_contains(request, username: str,
+                             data: FavoriteContainsInput):
+    """
+    Check which of a list of stories are among a user's favorites.
+
+        {
+            "ids": ["725ff2f9-...", "a3c1e0b2-..."]
+        }
+
+    On success, returns whether each story ID is a favorite:
+
+        {
+            "favorited": {
+                "725ff2f9-...": true,
+                "a3c1e0b2-...": false
+            }
+        }
+
+    Answered from a cached set of the user's favorite IDs, so a repeat check
+    for your own favorites costs no database queries.
+
+    On failure for more IDs than the configured maximum (500 by default),
+    returns error JSON:
+
+        {
+            "detail": "Too many IDs. Max is 500."
+        }
+
+    **Authentication: token**
+
+    **Authorization: same user or admin**
+    """
+    curr_user = request.auth
+
+    if username != curr_user.username and curr_user.is_staff is not True:
+        return 401, {"detail": "Unauthorized"}
+
+    max_ids = settings.FAVORITES_CONTAINS_MAX_IDS
+
+    if len(data.ids) > max_ids:
+        return 400, {"detail": f"Too many IDs. Max is {max_ids}."}
+
+    # Staff may name any user; a missing one would look like no favorites:
+    if (
+        username != curr_user.username
+        and not await User.objects.filter(username=username).aexists()
+    ):
+        return 404, {"detail": "User not found."}
+
+    ids = await afavorite_ids(username)
+
+    return {
+        "favorited": {
+            story_id: contains(ids, story_id) for story_id in data.ids
+        }
+    }
@@ -0,0 +1,89 @@
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import caches
+
+from hack_or_snooze.cache_versions import CacheVersion, invalidate_on_write
+
+from .models import Favorite
+
+
+###############################################################################
+# Per-user favorite ID sets
+#
+# Membership checks (is story X one of user U's favorites?) are answered from
+# a cached, sorted tuple of U's favorite story IDs, searched by bisection.
+# A tuple of strings pickles compactly and needs no per-ID bookkeeping. The
+# set is loaded lazily on the first check after a miss, in one index-only
+# query on the unique (user, story) index.
+#
+# Writers drop what they change: favorite adds and removes drop that user's
+# set (see favorites/queries.py and favorites/signals.py). Deleting a story
+# takes its favorites rows from any number of users, so it replaces the
+# version in every key instead, orphaning all sets at once (see
+# hack_or_snooze/cache_versions.py).
+#
+# Cache calls are sync, as for the feed cache.
+
+def favorite_ids_cache():
+    """Return the cache backend configured for favorite ID sets."""
+
+    return caches[settings.FAVORITE_IDS_CACHE_ALIAS]
+
+
+_favorite_ids_version = CacheVersion(
+    favorite_ids_cache,
+    "favorites:ids:version"
+)
+
+
+def favorite_ids_key(username):
+    """Return the cache key of username's set under the current version."""
+
+    return f"favorites:ids:{_favorite_ids_version.get()}:{username}"
+
+
+def invalidate_favorite_ids(username=None):
+    """Drop username's cached set, or every user's if username is None."""
+
+    if username is None:
+        _favorite_ids_version.replace()
+    else:
+        favorite_ids_cache().delete(favorite_ids_key(username))
+
+
+def invalidate_favorite_ids_on_write(username=None):
+    """Drop cached sets (see invalidate_favorite_ids()) after a favorites
+    write (see invalidate_on_write())."""
+
+    invalidate_on_write(lambda: invalidate_favorite_ids(username))
+
+
+async def afavorite_ids(username):
+    """Return username's favorite story IDs as a sorted tuple, from the cache
+    or (on a miss) one query."""
+
+    cache = favorite_ids_cache()
+    key = favorite_ids_key(username)
+    ids = cache.get(key)
+
+    if ids is None:
+        # Sorted here, not by the database, whose collation may not order
+        # strings the way bisection in Python expects:
+        ids = tuple(sorted([
+            id async for id in Favorite.objects.filter(
+                user_id=username
+            ).values_list("story_id", flat=True)
+        ]))
+        cache.set(key, ids)
+
+    return ids
+
+
+def contains(ids, story_id):
+    """Return whether story_id is in ids, a sorted tuple from
+    afavorite_ids()."""
+
+    index = bisect_left(ids, story_id)
+
+    return index < len(ids) and ids[index] == story_id
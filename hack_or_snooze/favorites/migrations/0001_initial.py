@@ -0,0 +1,39 @@
+# Generated by Django 5.0 on 2026-10-17 03:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Take over User.favorites' auto-created through table as the Favorite
+    model, without touching the database: the table, its rows and its
+    constraints stay as they are. 0002 then reshapes it.
+    """
+
+    initial = True
+
+    dependencies = [
+        ('stories', '0012_trendingstory'),
+        ('users', '0010_alter_user_favorites_alter_user_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Favorite',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                        ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='stories.story')),
+                    ],
+                    options={
+                        'db_table': 'users_user_favorites',
+                        'unique_together': {('user', 'story')},
+                    },
+                ),
+            ],
+        ),
+    ]
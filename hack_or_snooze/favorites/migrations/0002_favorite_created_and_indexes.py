@@ -0,0 +1,64 @@
+# Generated by Django 5.0 on 2026-10-17 03:20
+
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Rename the favorites table after its model and add "created" (existing
+    rows get the time of the migration, so they page by id among
+    themselves).
+
+    The unnamed unique (user, story) becomes a named constraint, and the
+    single-column foreign key indexes give way to composite ones (see
+    Favorite.Meta).
+    """
+
+    dependencies = [
+        ('favorites', '0001_initial'),
+        ('stories', '0012_trendingstory'),
+        ('users', '0011_alter_user_favorites'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelTable(
+            name='favorite',
+            table=None,
+        ),
+        migrations.AddField(
+            model_name='favorite',
+            name='created',
+            field=model_utils.fields.AutoCreatedField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='favorite',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'story'), name='favorites_user_story_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'created', 'id'], name='favorites_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['story', 'user'], name='favorites_story_user_idx'),
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='story',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='stories.story'),
+        ),
+        migrations.AlterField(
+            model_name='favorite',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
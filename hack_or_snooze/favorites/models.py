@@ -1,3 +1,58 @@
 from django.db import models
+from django.conf import settings
 
-# Create your models here.
+from model_utils.fields import AutoCreatedField
+
+from stories.models import Story
+
+
+class Favorite(models.Model):
+    """
+    One user's favorite story: the through model of User.favorites.
+
+    Rows are also written directly with raw SQL (see favorites/queries.py),
+    which must set "created" itself.
+    """
+
+    class Meta:
+        constraints = [
+            # Also the conflict target of the favorite INSERT, and backs
+            # lookups of a user's favorites:
+            models.UniqueConstraint(
+                fields=["user", "story"],
+                name="favorites_user_story_uniq",
+            ),
+        ]
+        indexes = [
+            # Backs newest-first paging of a user's favorites, which filters
+            # on user and orders on (created, id):
+            models.Index(
+                fields=["user", "created", "id"],
+                name="favorites_user_created_idx",
+            ),
+            # Backs lookups from the story side (favorite counts, who
+            # favorited a story):
+            models.Index(
+                fields=["story", "user"],
+                name="favorites_story_user_idx",
+            ),
+        ]
+
+    # Both foreign keys lead an index above; separate ones would be dead
+    # weight on every write:
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+
+    story = models.ForeignKey(
+        Story,
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+
+    created = AutoCreatedField()
+
+    def __str__(self):
+        return f"{self.user_id}: {self.story_id}"
@@ -0,0 +1,243 @@
+from asgiref.sync import sync_to_async
+
+from django.db import connections, router, transaction
+from django.db.models import Exists, OuterRef, Subquery
+from django.utils import timezone
+
+from stories.cache import invalidate_favorite_counts_on_write
+from stories.models import Story
+from stories.queries import adjust_favorite_counts
+from users.models import User
+
+from .cache import invalidate_favorite_ids_on_write
+from .models import Favorite
+
+
+###############################################################################
+# Set-based favorite mutations
+#
+# Adding favorites is one conditional INSERT ... SELECT ... ON CONFLICT DO
+# NOTHING that only inserts rows if the user exists, the stories exist, and
+# the stories are not the user's own; removing them is one DELETE of exactly
+# those rows. Either way, one statement handles any number of stories and
+# reports which ones it changed, without loading the user or their stories.
+# Callers that need to know why a story wasn't changed ask afterwards (see
+# afavorite_failure() and apply_favorite_batch()).
+#
+# On PostgreSQL, the matching Story.favorite_count update rides along in the
+# same statement (a data-modifying CTE), so the count can't drift from the
+# rows. Other databases run it as a second statement in the same
+# transaction.
+#
+# These write the favorites table directly, so no signals are sent; they do
+# the favorite_count, feed cache and favorite ID cache upkeep the Favorite
+# receivers (see favorites/signals.py) would.
+
+def favorite_sql(connection, story_ids):
+    """Return the table and column names the raw statements below use,
+    quoted for connection, and placeholders for story_ids."""
+
+    quote = connection.ops.quote_name
+
+    return {
+        "favorites": quote(Favorite._meta.db_table),
+        "fav_user_id": quote(Favorite._meta.get_field("user").column),
+        "fav_story_id": quote(Favorite._meta.get_field("story").column),
+        "fav_created": quote(Favorite._meta.get_field("created").column),
+        "stories": quote(Story._meta.db_table),
+        "users": quote(User._meta.db_table),
+        "story_ids": ", ".join(["%s"] * len(story_ids)),
+    }
+
+
+ADD_FAVORITES_SQL = """
+    INSERT INTO {favorites} ({fav_user_id}, {fav_story_id}, {fav_created})
+    SELECT %s, story.id, %s FROM {stories} story
+    WHERE story.id IN ({story_ids})
+        AND story.user_id <> %s
+        AND EXISTS (SELECT 1 FROM {users} WHERE username = %s)
+    ON CONFLICT DO NOTHING
+    RETURNING {fav_story_id}
+"""
+
+REMOVE_FAVORITES_SQL = """
+    DELETE FROM {favorites}
+    WHERE {fav_user_id} = %s AND {fav_story_id} IN ({story_ids})
+    RETURNING {fav_story_id}
+"""
+
+# Wraps either of the above (as "changed") on PostgreSQL:
+ADJUST_COUNTS_SQL = """
+    WITH changed AS ({statement})
+    UPDATE {stories}
+    SET favorite_count = GREATEST(favorite_count + %s, 0)
+    WHERE id IN (SELECT {fav_story_id} FROM changed)
+    RETURNING id
+"""
+
+
+def change_favorites(username, statement, params, story_ids, delta):
+    """
+    Run one of the statements above for username's story_ids, moving
+    favorite_count by delta on each story it touched. Returns the set of
+    touched story IDs.
+    """
+
+    if not story_ids:
+        return set()
+
+    connection = connections[router.db_for_write(Favorite)]
+    names = favorite_sql(connection, story_ids)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            # A single statement, so it is atomic on its own:
+            cursor.execute(
+                ADJUST_COUNTS_SQL.format(
+                    statement=statement.format(**names), **names
+                ),
+                [*params, delta]
+            )
+            changed = {row[0] for row in cursor.fetchall()}
+        else:
+            with transaction.atomic(using=connection.alias, savepoint=False):
+                cursor.execute(statement.format(**names), params)
+                changed = {row[0] for row in cursor.fetchall()}
+                if changed:
+                    adjust_favorite_counts(changed, delta)
+
+    if changed:
+        invalidate_favorite_counts_on_write()
+        invalidate_favorite_ids_on_write(username)
+
+    return changed
+
+
+def add_favorites(username, story_ids):
+    """
+    Favorite story_ids for username, skipping any story that doesn't exist,
+    is the user's own, or is already favorited, and adding none if the user
+    doesn't exist. Returns the set of story IDs added.
+    """
+
+    return change_favorites(
+        username,
+        ADD_FAVORITES_SQL,
+        [username, timezone.now(), *story_ids, username, username],
+        story_ids,
+        1
+    )
+
+
+def remove_favorites(username, story_ids):
+    """Unfavorite story_ids for username. Returns the set of story IDs that
+    were favorites."""
+
+    return change_favorites(
+        username,
+        REMOVE_FAVORITES_SQL,
+        [username, *story_ids],
+        story_ids,
+        -1
+    )
+
+
+async def aadd_favorite(username, story_id):
+    """Favorite one story (see add_favorites()). Returns whether it was
+    added."""
+
+    return bool(await sync_to_async(add_favorites)(username, [story_id]))
+
+
+async def aremove_favorite(username, story_id):
+    """Unfavorite one story. Returns whether it was a favorite."""
+
+    return bool(await sync_to_async(remove_favorites)(username, [story_id]))
+
+
+def apply_favorite_batch(username, add, remove):
+    """
+    Favorite the story IDs in add and unfavorite those in remove for
+    username, in one transaction. Returns [{"story_id", "outcome"}, ...],
+    adds first, each in the order given.
+
+    Outcomes for add are "added", "already_favorited", "own_story" and
+    "not_found"; for remove, "removed" and "not_favorited". Costs a
+    statement per non-empty list, plus one query if any add fails.
+    """
+
+    with transaction.atomic(savepoint=False):
+        added = add_favorites(username, add)
+        removed = remove_favorites(username, remove)
+
+        not_added = [id for id in add if id not in added]
+        owners = dict(
+            Story.objects.filter(id__in=not_added).values_list("id", "user_id")
+        ) if not_added else {}
+
+    results = []
+
+    for id in add:
+        if id in added:
+            outcome = "added"
+        elif id not in owners:
+            outcome = "not_found"
+        elif owners[id] == username:
+            outcome = "own_story"
+        else:
+            outcome = "already_favorited"
+        results.append({"story_id": id, "outcome": outcome})
+
+    for id in remove:
+        outcome = "removed" if id in removed else "not_favorited"
+        results.append({"story_id": id, "outcome": outcome})
+
+    return results
+
+
+async def aapply_favorite_batch(username, add, remove):
+    """Async version of apply_favorite_batch()."""
+
+    return await sync_to_async(apply_favorite_batch)(username, add, remove)
+
+
+def annotate_is_favorited(stories, username):
+    """
+    Annotate a Story queryset with is_favorited for username.
+
+    One EXISTS subquery per row, served by the unique (user, story) index:
+    no query per story, and the user's favorites are never loaded.
+    """
+
+    return stories.annotate(
+        is_favorited=Exists(
+            Favorite.objects.filter(user_id=username, story_id=OuterRef("pk"))
+        )
+    )
+
+
+async def afavorite_failure(username, story_id):
+    """
+    Return (status, detail) saying why aadd_favorite(username, story_id)
+    added nothing. Costs one query.
+    """
+
+    row = await User.objects.filter(username=username).annotate(
+        story_owner=Subquery(
+            Story.objects.filter(id=story_id).values("user_id")[:1]
+        ),
+    ).values_list("username", "story_owner").afirst()
+
+    if row is None:
+        return 404, "User not found."
+
+    _, story_owner = row
+
+    if story_owner is None:
+        return 404, "Story not found."
+
+    if story_owner == username:
+        return 400, "Cannot add own user stories to favorites"
+
+    # Only the ON CONFLICT is left:
+    return 400, "Story already favorited."
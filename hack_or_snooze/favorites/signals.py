@@ -0,0 +1,106 @@
+from django.db.models import QuerySet
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from stories.cache import invalidate_favorite_counts_on_write
+from stories.models import Story
+from stories.queries import adjust_favorite_counts
+from users.auth_utils import user_cache
+
+from .cache import invalidate_favorite_ids_on_write
+from .models import Favorite
+
+
+###############################################################################
+# Favorite count upkeep
+#
+# Keeps Story.favorite_count, the per-user favorite ID sets and the auth user
+# cache in step with every favorites edit made through the ORM (admin inline,
+# m2m managers, shell). The API's raw SQL writes in favorites/queries.py send
+# no signals and do the same upkeep themselves.
+#
+# Deletes are counted per row, after the fact: m2m remove()/clear(), admin
+# inline deletes and user deletion all delete Favorite rows, which send
+# post_delete. Adds through the m2m managers are bulk inserts, which send only
+# m2m_changed; anything else that saves a Favorite sends post_save.
+
+def favorites_changed(story_ids, delta, usernames):
+    """Move favorite_count by delta on story_ids, and drop usernames' cached
+    favorites."""
+
+    adjust_favorite_counts(story_ids, delta)
+    invalidate_favorite_counts_on_write()
+
+    for username in usernames:
+        invalidate_favorite_ids_on_write(username)
+        user_cache.invalidate(username)
+
+
+@receiver(m2m_changed, sender=Favorite)
+def count_added_favorites(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """
+    Count favorites added through user.favorites or story.favorited_by.
+
+    Django has already dropped existing favorites from pk_set.
+    """
+
+    if action != "post_add" or not pk_set:
+        return
+
+    if reverse:
+        # instance is a story, pk_set is usernames:
+        favorites_changed([instance.pk], len(pk_set), pk_set)
+    else:
+        # instance is a user, pk_set is story ids:
+        favorites_changed(pk_set, 1, [instance.pk])
+
+
+@receiver(pre_save, sender=Favorite)
+def remember_saved_favorite(sender, instance, raw, **kwargs):
+    """Note which (user, story) an existing favorite pointed at before this
+    save, for count_saved_favorite()."""
+
+    if raw or instance._state.adding:
+        instance._previous = None
+    else:
+        instance._previous = Favorite.objects.filter(
+            pk=instance.pk
+        ).values_list("user_id", "story_id").first()
+
+
+@receiver(post_save, sender=Favorite)
+def count_saved_favorite(sender, instance, created, raw, **kwargs):
+    """Count a favorite created, or moved to another user or story, by a
+    save."""
+
+    if raw:
+        return
+
+    previous = None if created else instance._previous
+    current = (instance.user_id, instance.story_id)
+
+    if previous == current:
+        return
+
+    if previous is not None:
+        favorites_changed([previous[1]], -1, [previous[0]])
+
+    favorites_changed([instance.story_id], 1, [instance.user_id])
+
+
+@receiver(post_delete, sender=Favorite)
+def count_deleted_favorite(sender, instance, origin, **kwargs):
+    """Uncount a deleted favorite, unless its story is being deleted too
+    (which does its own upkeep; see stories/signals.py)."""
+
+    if isinstance(origin, Story) or (
+            isinstance(origin, QuerySet) and origin.model is Story):
+        return
+
+    favorites_changed([instance.story_id], -1, [instance.user_id])
@@ -0,0 +1,81 @@
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+
+from favorites.cache import afavorite_ids
+from stories.factories import StoryFactory
+from users.factories import UserFactory
+
+INLINE_PREFIX = "favorite_set"
+
+
+class FavoriteInlineTestCase(TestCase):
+    """Test editing a user's favorites inline on the user admin page."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserFactory(
+            username="admin",
+            is_staff=True,
+            is_superuser=True
+        )
+        cls.poster = UserFactory(username="poster")
+        cls.user = UserFactory()
+        cls.story = StoryFactory(user=cls.poster)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = f'/admin/users/user/{self.user.username}/change/'
+
+    def post_change_form(self, rows):
+        """Submit the user's change form unchanged, with rows (dicts of
+        inline fields) as the favorites inline."""
+
+        data = {
+            "username": self.user.username,
+            "password": self.user.password,
+            "first_name": self.user.first_name,
+            "last_name": self.user.last_name,
+            "is_active": "on",
+            "date_joined_0": "2020-01-01",
+            "date_joined_1": "00:00:00",
+        }
+        data.update({
+            f"{INLINE_PREFIX}-TOTAL_FORMS": len(rows),
+            f"{INLINE_PREFIX}-INITIAL_FORMS": sum("id" in row for row in rows),
+        })
+        for i, row in enumerate(rows):
+            for name, value in row.items():
+                data[f"{INLINE_PREFIX}-{i}-{name}"] = value
+
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+
+    def favorite_ids(self):
+        return async_to_sync(afavorite_ids)(self.user.username)
+
+    def test_change_form_has_favorites_inline(self):
+        response = self.client.get(self.url)
+
+        self.assertContains(response, f"{INLINE_PREFIX}-TOTAL_FORMS")
+
+    def test_inline_add_and_delete_keep_counts_and_cache(self):
+        # warm the user's cached favorite ID set:
+        self.assertEqual(self.favorite_ids(), ())
+
+        self.post_change_form([{"story": self.story.id}])
+
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.favorite_count, 1)
+        self.assertEqual(self.favorite_ids(), (self.story.id,))
+
+        favorite = self.user.favorite_set.get()
+        self.post_change_form([{
+            "id": favorite.id,
+            "user": self.user.username,
+            "story": self.story.id,
+            "DELETE": "on",
+        }])
+
+        self.story.refresh_from_db()
+        self.assertEqual(self.story.favorite_count, 0)
+        self.assertEqual(self.favorite_ids(), ())
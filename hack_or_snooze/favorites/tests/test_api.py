@@ -1,14 +1,22 @@
+import json
+
+from django.db import connection
 from django.test import TestCase
 
 from users.factories import UserFactory
-from users.auth_utils import generate_token
+from users.auth_utils import generate_token, user_cache
 from stories.factories import StoryFactory
+from stories.models import Story
+from favorites.cache import favorite_ids_cache
 
 AUTH_KEY = 'token'
 EMPTY_TOKEN_VALUE = ''
 MALFORMED_TOKEN_VALUE = 'malformed::token'
 INVALID_TOKEN_VALUE = 'user:abcdef123456'
 
+# Statements per favorite add/remove (see favorites/queries.py):
+MUTATION_QUERIES = 1 if connection.vendor == "postgresql" else 2
+
 
 class APIFavoritePostTestCase(TestCase):
     """Test POST /user/{username}/favorites endpoint."""
@@ -36,6 +44,7 @@ class APIFavoritePostTestCase(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
+
         self.assertJSONEqual(
             response.content,
             {
@@ -48,6 +57,7 @@ class APIFavoritePostTestCase(TestCase):
                         'modified': '2020-01-01T00:00:00Z',
                         'title': 'test_title',
                         'url': 'http://test.com',
+                        'favorite_count': 1,
                         'username': 'user'
                     }],
                     "username": "user2",
@@ -70,6 +80,7 @@ class APIFavoritePostTestCase(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
+
         self.assertJSONEqual(
             response.content,
             {
@@ -82,6 +93,7 @@ class APIFavoritePostTestCase(TestCase):
                         'modified': '2020-01-01T00:00:00Z',
                         'title': 'test_title',
                         'url': 'http://test.com',
+                        'favorite_count': 1,
                         'username': 'user'
                     }],
                     "username": "user2",
@@ -102,6 +114,7 @@ class APIFavoritePostTestCase(TestCase):
         )
 
         self.assertEqual(response.status_code, 200)
+
         self.assertJSONEqual(
             response.content,
             {
@@ -114,6 +127,7 @@ class APIFavoritePostTestCase(TestCase):
                         'modified': '2020-01-01T00:00:00Z',
                         'title': 'test_title',
                         'url': 'http://test.com',
+                        'favorite_count': 1,
                         'username': 'user'
                     }],
                     "username": "user2",
@@ -135,6 +149,22 @@ class APIFavoritePostTestCase(TestCase):
             {"detail": "Story already favorited."}
         )
 
+    def test_add_favorite_ok_delta(self):
+        response = self.client.post(
+            f'/api/favorites/user2/{self.story.id}/favorite?delta=true',
+            headers={AUTH_KEY: self.user2_token},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {
+                "story_id": self.story.id,
+                "favorited": True,
+                "favorite_count": 1,
+            }
+        )
+
     def test_add_favorite_fail_unauthorized_no_token_header(self):
 
         story_id = self.story.id
@@ -394,6 +424,22 @@ class APIFavoriteDeleteTestCase(TestCase):
 
         )
 
+    def test_delete_favorite_ok_delta(self):
+        response = self.client.post(
+            f'/api/favorites/user2/{self.story.id}/unfavorite?delta=true',
+            headers={AUTH_KEY: self.user2_token},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {
+                "story_id": self.story.id,
+                "favorited": False,
+                "favorite_count": 0,
+            }
+        )
+
     def test_delete_favorite_fail_unauthorized_no_token_header(self):
         story_id = self.story.id
 
@@ -519,3 +565,396 @@ class APIFavoriteDeleteTestCase(TestCase):
                 'detail': 'Favorite not found.'
             }
         )
+
+
+class APIFavoriteBatchTestCase(TestCase):
+    """Test POST /favorites/{username}/batch endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_2 = UserFactory(username="user2")
+        cls.staff_user = UserFactory(username="staffUser", is_staff=True)
+
+        # posted by "user":
+        cls.story = StoryFactory()
+        cls.story_2 = StoryFactory()
+        cls.favorited = StoryFactory()
+        cls.own_story = StoryFactory(user=cls.user_2)
+
+        cls.user_2.favorites.add(cls.favorited)
+
+        cls.user_token = generate_token(cls.user.username)
+        cls.user2_token = generate_token(cls.user_2.username)
+        cls.staff_user_token = generate_token(cls.staff_user.username)
+
+    def post_batch(self, data, token, username="user2", query=""):
+        return self.client.post(
+            f'/api/favorites/{username}/batch{query}',
+            data=json.dumps(data),
+            content_type="application/json",
+            headers={AUTH_KEY: token},
+        )
+
+    def test_batch_ok_reports_outcomes_in_order(self):
+        response = self.post_batch(
+            {
+                "add": [
+                    self.story.id,
+                    self.favorited.id,
+                    self.own_story.id,
+                    "nonexistent",
+                    self.story_2.id,
+                ],
+                "remove": ["nonexistent-2"],
+            },
+            self.user2_token
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        response_json = json.loads(response.content)
+        self.assertEqual(
+            response_json["results"],
+            [
+                {"story_id": self.story.id, "outcome": "added"},
+                {"story_id": self.favorited.id, "outcome": "already_favorited"},
+                {"story_id": self.own_story.id, "outcome": "own_story"},
+                {"story_id": "nonexistent", "outcome": "not_found"},
+                {"story_id": self.story_2.id, "outcome": "added"},
+                {"story_id": "nonexistent-2", "outcome": "not_favorited"},
+            ]
+        )
+        self.assertEqual(
+            {story["id"] for story in response_json["user"]["favorites"]},
+            {self.story.id, self.story_2.id, self.favorited.id}
+        )
+
+    def test_batch_ok_adds_and_removes_updating_counts(self):
+        response = self.post_batch(
+            {"add": [self.story.id], "remove": [self.favorited.id]},
+            self.user2_token
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            set(self.user_2.favorites.values_list("id", flat=True)),
+            {self.story.id}
+        )
+
+        counts = dict(Story.objects.filter(
+            id__in=[self.story.id, self.favorited.id]
+        ).values_list("id", "favorite_count"))
+        self.assertEqual(counts, {self.story.id: 1, self.favorited.id: 0})
+
+    def test_batch_ok_delta_leaves_out_user(self):
+        response = self.post_batch(
+            {"remove": [self.favorited.id]},
+            self.user2_token,
+            query="?delta=true"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {
+                "results": [
+                    {"story_id": self.favorited.id, "outcome": "removed"},
+                ]
+            }
+        )
+
+    def test_batch_ok_duplicate_ids_reported_once(self):
+        response = self.post_batch(
+            {"add": [self.story.id, self.story.id]},
+            self.user2_token,
+            query="?delta=true"
+        )
+
+        self.assertJSONEqual(
+            response.content,
+            {"results": [{"story_id": self.story.id, "outcome": "added"}]}
+        )
+        self.assertEqual(Story.objects.get(id=self.story.id).favorite_count, 1)
+
+    def test_batch_ok_as_staff(self):
+        response = self.post_batch(
+            {"add": [self.story.id]},
+            self.staff_user_token,
+            query="?delta=true"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.user_2.favorites.filter(id=self.story.id).exists())
+
+    def test_batch_fail_unauthorized_as_different_user(self):
+        response = self.post_batch({"add": [self.story.id]}, self.user_token)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(self.user_2.favorites.filter(id=self.story.id).exists())
+
+    def test_batch_fail_nonexistent_user_as_staff(self):
+        response = self.post_batch(
+            {"add": [self.story.id]},
+            self.staff_user_token,
+            username="nonexistent"
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertJSONEqual(response.content, {"detail": "User not found."})
+
+    def test_batch_fail_same_id_in_both_lists(self):
+        response = self.post_batch(
+            {"add": [self.story.id], "remove": [self.story.id]},
+            self.user2_token
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Cannot both add and remove the same story."}
+        )
+
+    def test_batch_fail_too_many_ids(self):
+        with self.settings(FAVORITES_BATCH_MAX_IDS=2):
+            response = self.post_batch(
+                {"add": [self.story.id, self.story_2.id],
+                 "remove": [self.favorited.id]},
+                self.user2_token
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Too many IDs. Max is 2."}
+        )
+        self.assertFalse(self.user_2.favorites.filter(id=self.story.id).exists())
+
+
+class APIFavoriteContainsTestCase(TestCase):
+    """Test POST /favorites/{username}/contains endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_2 = UserFactory(username="user2")
+        cls.staff_user = UserFactory(username="staffUser", is_staff=True)
+
+        # posted by "user":
+        cls.favorited = StoryFactory()
+        cls.other = StoryFactory()
+
+        cls.user_2.favorites.add(cls.favorited)
+
+        cls.user_token = generate_token(cls.user.username)
+        cls.user2_token = generate_token(cls.user_2.username)
+        cls.staff_user_token = generate_token(cls.staff_user.username)
+
+    def setUp(self):
+        favorite_ids_cache().clear()
+        user_cache.clear()
+
+    def post_contains(self, ids, token=None, username="user2"):
+        return self.client.post(
+            f'/api/favorites/{username}/contains',
+            data=json.dumps({"ids": ids}),
+            content_type="application/json",
+            headers={AUTH_KEY: token or self.user2_token},
+        )
+
+    def is_favorited(self, story_id):
+        response = self.post_contains([story_id])
+        self.assertEqual(response.status_code, 200)
+
+        return json.loads(response.content)["favorited"][story_id]
+
+    def test_contains_ok(self):
+        response = self.post_contains(
+            [self.other.id, self.favorited.id, "nonexistent"]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {
+                "favorited": {
+                    self.other.id: False,
+                    self.favorited.id: True,
+                    "nonexistent": False,
+                }
+            }
+        )
+
+    def test_contains_warm_cache_costs_no_queries(self):
+        ids = [self.favorited.id] + [f"story-{i}" for i in range(499)]
+        self.post_contains(ids)
+
+        with self.assertNumQueries(0):
+            response = self.post_contains(ids)
+
+        favorited = json.loads(response.content)["favorited"]
+        self.assertEqual(len(favorited), 500)
+        self.assertEqual(sum(favorited.values()), 1)
+
+    def test_contains_follows_favorite_toggles(self):
+        self.assertFalse(self.is_favorited(self.other.id))
+
+        self.client.post(
+            f'/api/favorites/user2/{self.other.id}/favorite',
+            headers={AUTH_KEY: self.user2_token},
+        )
+        self.assertTrue(self.is_favorited(self.other.id))
+
+        self.client.post(
+            f'/api/favorites/user2/{self.other.id}/unfavorite',
+            headers={AUTH_KEY: self.user2_token},
+        )
+        self.assertFalse(self.is_favorited(self.other.id))
+
+    def test_contains_follows_edits_outside_api(self):
+        self.assertFalse(self.is_favorited(self.other.id))
+
+        self.other.favorited_by.add(self.user_2)
+        self.assertTrue(self.is_favorited(self.other.id))
+
+        self.user_2.favorites.remove(self.other)
+        self.assertFalse(self.is_favorited(self.other.id))
+
+    def test_contains_follows_story_delete(self):
+        self.assertTrue(self.is_favorited(self.favorited.id))
+
+        self.client.delete(
+            f'/api/stories/{self.favorited.id}',
+            headers={AUTH_KEY: self.user_token},
+        )
+
+        self.assertFalse(self.is_favorited(self.favorited.id))
+
+    def test_contains_ok_as_staff(self):
+        response = self.post_contains(
+            [self.favorited.id], token=self.staff_user_token
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {"favorited": {self.favorited.id: True}}
+        )
+
+    def test_contains_fail_unauthorized_as_different_user(self):
+        response = self.post_contains(
+            [self.favorited.id], token=self.user_token
+        )
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_contains_fail_nonexistent_user_as_staff(self):
+        response = self.post_contains(
+            [self.favorited.id],
+            token=self.staff_user_token,
+            username="nonexistent"
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertJSONEqual(response.content, {"detail": "User not found."})
+
+    def test_contains_fail_too_many_ids(self):
+        with self.settings(FAVORITES_CONTAINS_MAX_IDS=1):
+            response = self.post_contains([self.favorited.id, self.other.id])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Too many IDs. Max is 1."}
+        )
+
+
+class APIFavoriteQueryCountTestCase(TestCase):
+    """Test that favorite toggles cost a fixed number of queries regardless of
+    how many stories and favorites the user has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.poster = UserFactory(username="poster")
+
+        cls.user_token = generate_token(cls.user.username)
+
+        for _ in range(10):
+            StoryFactory(user=cls.user)
+            cls.user.favorites.add(StoryFactory(user=cls.poster))
+
+        cls.story = StoryFactory(user=cls.poster)
+
+    def setUp(self):
+        # measure the cold path, including the auth lookup:
+        user_cache.clear()
+
+    def test_add_favorite_query_count(self):
+        # auth, conditional insert + favorite_count update (one statement on
+        # PostgreSQL), user, stories, favorites
+        with self.assertNumQueries(MUTATION_QUERIES + 4):
+            response = self.client.post(
+                f'/api/favorites/user/{self.story.id}/favorite',
+                headers={AUTH_KEY: self.user_token},
+            )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["user"]["favorites"]), 11)
+
+    def test_add_favorite_failure_query_count(self):
+        own_story = StoryFactory(user=self.user)
+
+        # auth, conditional insert, failure diagnosis; nothing else loaded
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                f'/api/favorites/user/{own_story.id}/favorite',
+                headers={AUTH_KEY: self.user_token},
+            )
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_add_favorite_delta_query_count(self):
+        # auth, conditional insert + favorite_count update (one statement on
+        # PostgreSQL), favorite_count; the user's collections aren't loaded
+        with self.assertNumQueries(MUTATION_QUERIES + 2):
+            response = self.client.post(
+                f'/api/favorites/user/{self.story.id}/favorite?delta=true',
+                headers={AUTH_KEY: self.user_token},
+            )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_remove_favorite_query_count(self):
+        self.user.favorites.add(self.story)
+
+        # auth, delete + favorite_count update (one statement on
+        # PostgreSQL), user, stories, favorites
+        with self.assertNumQueries(MUTATION_QUERIES + 4):
+            response = self.client.post(
+                f'/api/favorites/user/{self.story.id}/unfavorite',
+                headers={AUTH_KEY: self.user_token},
+            )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["user"]["favorites"]), 10)
+
+    def test_favorites_batch_query_count(self):
+        stories = [StoryFactory(user=self.poster) for _ in range(5)]
+        own_story = StoryFactory(user=self.user)
+        favorite_ids = list(self.user.favorites.values_list("id", flat=True))
+
+        # auth, insert + count update, delete + count update (one statement
+        # each on PostgreSQL), diagnosis of the failed add
+        with self.assertNumQueries(2 * MUTATION_QUERIES + 2):
+            response = self.client.post(
+                '/api/favorites/user/batch?delta=true',
+                data=json.dumps({
+                    "add": [story.id for story in stories] + [own_story.id],
+                    "remove": favorite_ids,
+                }),
+                content_type="application/json",
+                headers={AUTH_KEY: self.user_token},
+            )
+
+        self.assertEqual(response.status_code, 200)
@@ -4,7 +4,13 @@ from stories.api import router as stories_router
 from users.api import router as users_router
 from favorites.api import router as favorites_router
 
-from hack_or_snooze.exceptions import InvalidUsernameException
+from hack_or_snooze.renderers import FastJSONRenderer
+from hack_or_snooze.exceptions import (
+    InvalidUsernameException,
+    InvalidCursorException,
+    InvalidFieldsException,
+    PasswordHashingBusyException,
+)
 
 description = """
 How to Use This API
@@ -42,8 +48,8 @@ of this documentation for usage in these interactive endpoints.
 
 api = NinjaAPI(
     title="Hack Or Snooze API",
-    description=description
-
+    description=description,
+    renderer=FastJSONRenderer(),
 )
 
 
@@ -61,3 +67,35 @@ def on_invalid_username(request, exc):
         {"detail": exc.message},
         status=400
     )
+
+
+@api.exception_handler(InvalidCursorException)
+def on_invalid_cursor(request, exc):
+    """Custom exception handler for an undecodable pagination cursor."""
+    return api.create_response(
+        request,
+        {"detail": exc.message},
+        status=400
+    )
+
+
+@api.exception_handler(InvalidFieldsException)
+def on_invalid_fields(request, exc):
+    """Custom exception handler for a sparse fieldset naming unknown fields."""
+    return api.create_response(
+        request,
+        {"detail": exc.message},
+        status=400
+    )
+
+
+@api.exception_handler(PasswordHashingBusyException)
+def on_password_hashing_busy(request, exc):
+    """Custom exception handler for a saturated password hashing pool."""
+    response = api.create_response(
+        request,
+        {"detail": exc.message},
+        status=503
+    )
+    response["Retry-After"] = "1"
+    return response
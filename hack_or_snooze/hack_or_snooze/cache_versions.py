@@ -0,0 +1,59 @@
+import uuid
+
+from django.db import transaction
+
+
+###############################################################################
+# Versioned cache keys
+#
+# A family of cache keys (eg. every page of the story feed) is invalidated at
+# once by building each key around a shared "version" and replacing the
+# version, which orphans every key built on the old one. Orphans age out via
+# the cache's TIMEOUT.
+#
+# The version is a random token rather than a counter so that, if the version
+# key itself is evicted, a fresh one can never collide with orphaned keys.
+
+class CacheVersion:
+    """
+    The current version of a family of keys, stored under key in the cache
+    get_cache() returns.
+
+    get_cache is called on every use (rather than once) so the cache alias
+    can come from settings that tests override.
+    """
+
+    def __init__(self, get_cache, key):
+        self.get_cache = get_cache
+        self.key = key
+
+    def get(self):
+        """Return the current version, starting a new one if none is set."""
+
+        cache = self.get_cache()
+        version = cache.get(self.key)
+
+        if version is None:
+            # add() is a no-op if another process won the race; re-read to
+            # agree with it:
+            cache.add(self.key, uuid.uuid4().hex, timeout=None)
+            version = cache.get(self.key)
+
+        return version
+
+    def replace(self):
+        """Start a new version, orphaning every key built on the old one."""
+
+        self.get_cache().set(self.key, uuid.uuid4().hex, timeout=None)
+
+
+def invalidate_on_write(invalidate):
+    """
+    Call invalidate() for a database write in progress.
+
+    Calls it now, so the writing request sees its own change, and again on
+    commit, in case another request re-cached the pre-commit data meanwhile.
+    """
+
+    invalidate()
+    transaction.on_commit(invalidate)
@@ -0,0 +1,131 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Django's GZipMiddleware pads gzip output with up to this many random bytes,
+# to blunt BREACH-style length attacks; do the same:
+GZIP_MAX_RANDOM_BYTES = 100
+
+# Brotli's default (11) is far too slow to run per response:
+BROTLI_QUALITY = 5
+
+
+###############################################################################
+# Response compression
+#
+# API responses of at least API_COMPRESSION_MIN_SIZE bytes are compressed
+# with the best content coding the client accepts: brotli if the `brotli`
+# package is installed, otherwise gzip. CompressionMiddleware handles this
+# for every response. Cached responses (see stories/cache.py) can also
+# cache their compressed variants and serve them already encoded; the
+# middleware leaves those alone.
+
+def supported_encodings():
+    """Return the content codings we can produce, most preferred first."""
+
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def accepted_encoding(request):
+    """
+    Return the preferred content coding that the request's Accept-Encoding
+    allows, or None to send the response uncompressed.
+
+    EX: "gzip, deflate, br" -> "br" (or "gzip" without brotli installed)
+    """
+
+    accepted = {}
+
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        if coding:
+            accepted[coding.lower()] = quality
+
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+
+    return None
+
+
+def compressible(request, response):
+    """Return whether response is an API response worth compressing."""
+
+    return (
+        request.path.startswith(settings.API_COMPRESSION_PATH_PREFIX)
+        and not response.streaming
+        and not response.has_header("Content-Encoding")
+        and len(response.content) >= settings.API_COMPRESSION_MIN_SIZE
+    )
+
+
+def compress(content, encoding):
+    """Return content (bytes) compressed with encoding ("br" or "gzip")."""
+
+    if encoding == "br":
+        return brotli.compress(content, quality=BROTLI_QUALITY)
+
+    return compress_string(content, max_random_bytes=GZIP_MAX_RANDOM_BYTES)
+
+
+def encode_response(response, encoding, compressed):
+    """
+    Replace response's body with compressed, its encoding-compressed form,
+    and set the matching headers. Returns response.
+    """
+
+    response.content = compressed
+    response.headers["Content-Length"] = str(len(compressed))
+    response.headers["Content-Encoding"] = encoding
+    patch_vary_headers(response, ("Accept-Encoding",))
+
+    return response
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress API responses for clients that accept it (see above).
+
+    Like Django's GZipMiddleware, but limited to the API, with a higher size
+    threshold, and with brotli support.
+    """
+
+    def process_response(self, request, response):
+        if compressible(request, response):
+            patch_vary_headers(response, ("Accept-Encoding",))
+            encoding = accepted_encoding(request)
+
+            if encoding is not None:
+                compressed = compress(response.content, encoding)
+
+                # Only if it actually saves bytes:
+                if len(compressed) < len(response.content):
+                    encode_response(response, encoding, compressed)
+
+        # Compressed bodies differ byte for byte from the uncompressed one,
+        # so a strong ETag must become weak (RFC 9110 8.8.1). Weak matching
+        # still answers If-None-Match. Covers responses compressed here and
+        # those served precompressed from a cache:
+        etag = response.get("ETag")
+        encoded = response.get("Content-Encoding") in supported_encodings()
+
+        if encoded and etag and etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+
+        return response
@@ -0,0 +1,58 @@
+from hashlib import md5
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+###############################################################################
+# Helpers for conditional GET (ETag / Last-Modified)
+#
+# Routes compute their validators from a cheap query (or a cached value) and
+# answer a matching If-None-Match/If-Modified-Since with a 304 before doing
+# the expensive load and serialization.
+
+def make_etag(*parts):
+    """
+    Return a quoted ETag built from a hash of parts.
+
+    parts should include everything the response body depends on, including
+    any query params that change it.
+
+    EX: make_etag("abc", datetime(2020, 1, 1)) -> '"3f8e5a..."'
+    """
+
+    return quote_etag(md5(repr(parts).encode()).hexdigest())
+
+
+def set_validators(response, etag, last_modified=None):
+    """Set ETag (and Last-Modified, if given) headers on response."""
+
+    response.headers["ETag"] = etag
+
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified.timestamp())
+
+    return response
+
+
+def not_modified_response(request, etag, last_modified=None):
+    """
+    Return a 304 Not Modified response (or 412 for a failed If-Match) if the
+    request's conditional headers match the validators, otherwise None.
+
+    If-None-Match takes precedence over If-Modified-Since.
+    """
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=(
+            int(last_modified.timestamp()) if last_modified is not None
+            else None
+        ),
+    )
+
+    if response is None:
+        return None
+
+    return set_validators(response, etag, last_modified)
@@ -6,3 +6,34 @@ class InvalidUsernameException(Exception):
 
     def __str__(self):
         return self.message
+
+
+class InvalidCursorException(Exception):
+    """Exception for a pagination cursor that cannot be decoded."""
+
+    def __init__(self, message="Invalid cursor."):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class InvalidFieldsException(Exception):
+    """Exception for a ?fields= value naming fields the response lacks."""
+
+    def __init__(self, message="Invalid fields."):
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+class PasswordHashingBusyException(Exception):
+    """Exception for a password hash refused because the hashing pool's
+    queue is full."""
+
+    def __init__(self, message="Server busy. Try again shortly."):
+        self.message = message
+
+    def __str__(self):
+        return self.message
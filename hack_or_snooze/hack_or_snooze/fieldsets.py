@@ -0,0 +1,117 @@
+import copy
+
+from functools import lru_cache
+from typing import List, get_origin
+
+from pydantic import create_model
+
+from ninja import Schema
+
+from hack_or_snooze.exceptions import InvalidFieldsException
+
+
+###############################################################################
+# Sparse fieldset helpers (?fields=id,title,url)
+#
+# A route taking `fields` parses it against its output schema, narrows its
+# queryset to the matching columns with .only(), and serializes through a
+# narrowed copy of the schema, so omitted fields are neither loaded nor
+# serialized. Narrowed output no longer satisfies the route's declared
+# response schema (which still documents the full shape), so it is rendered
+# directly with schema_response().
+
+def parse_fields(value, schema):
+    """
+    Return the field names of schema requested in a comma-separated value,
+    in schema order, or None (meaning every field) if value is None.
+
+    EX: parse_fields("url,id", StorySchema) -> ("id", "url")
+
+    Raises InvalidFieldsException if no fields or unknown fields are named.
+    """
+
+    if value is None:
+        return None
+
+    requested = {name.strip() for name in value.split(",")} - {""}
+    unknown = sorted(requested - set(schema.model_fields))
+
+    if not requested or unknown:
+        problem = (
+            f"Unknown fields: {', '.join(unknown)}." if unknown
+            else "No fields requested."
+        )
+        raise InvalidFieldsException(
+            f"{problem} Valid fields are: {', '.join(schema.model_fields)}."
+        )
+
+    return tuple(name for name in schema.model_fields if name in requested)
+
+
+@lru_cache(maxsize=None)
+def narrow_schema(schema, fields=None, **nested_schemas):
+    """
+    Return a copy of schema keeping only fields (every field if None).
+
+    Any kept field named in nested_schemas is retyped to that schema (or a
+    List of it, for list fields), to narrow nested objects too.
+
+    EX: narrow_schema(StoryGetAllOutput, stories=narrow_schema(StorySchema,
+        ("id", "url")))
+
+    Cached, so each combination of fields builds its schema once.
+    """
+
+    if fields is None:
+        fields = tuple(schema.model_fields)
+
+    definitions = {}
+
+    for name in fields:
+        # create_model() updates the FieldInfo it is given; don't let it
+        # touch schema's own:
+        field = copy.copy(schema.model_fields[name])
+        annotation = field.annotation
+
+        if name in nested_schemas:
+            annotation = nested_schemas[name]
+            if get_origin(field.annotation) is list:
+                annotation = List[annotation]
+
+        definitions[name] = (annotation, field)
+
+    unchanged = fields == tuple(schema.model_fields) and all(
+        annotation == schema.model_fields[name].annotation
+        for name, (annotation, _) in definitions.items()
+    )
+
+    if unchanged:
+        return schema
+
+    return create_model(
+        f"{schema.__name__}_{'_'.join(fields)}",
+        __base__=Schema,
+        **definitions
+    )
+
+
+def source_fields(schema, fields):
+    """
+    Return the model attributes that fields of schema are read from, for
+    .only().
+
+    EX: source_fields(StorySchema, ("id", "username")) -> ["id", "user_id"]
+    """
+
+    return [schema.model_fields[name].alias or name for name in fields]
+
+
+def schema_response(request, api, schema, data, status=200):
+    """Serialize data through schema and return it rendered as an
+    HttpResponse."""
+
+    return api.create_response(
+        request,
+        schema.from_orm(data).dict(),
+        status=status
+    )
@@ -0,0 +1,140 @@
+import json
+import base64
+import binascii
+
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from hack_or_snooze.exceptions import InvalidCursorException
+
+
+###############################################################################
+# Keyset (cursor) pagination helpers
+#
+# Pages are ordered newest first by (created, id). A cursor is an opaque,
+# url-safe encoding of the (created, id) pair of the last row on a page; the
+# next page is every row strictly "older" than that pair. Unlike OFFSET, this
+# stays an index range scan no matter how deep the client pages.
+
+def encode_cursor(created, pk):
+    """
+    Encode the (created, pk) position of a row as an opaque cursor string.
+
+    EX: (datetime(2020, 1, 1, tzinfo=utc), "abc") -> "WyIyMDIwLTAx..."
+    """
+
+    raw = json.dumps([created.isoformat(), pk]).encode()
+
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor string back into a (created, pk) tuple.
+
+    Raises InvalidCursorException if the cursor was not produced by
+    encode_cursor.
+    """
+
+    try:
+        created, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created), pk
+    # Bad base64 raises binascii.Error, bad JSON raises ValueError, and a
+    # payload of the wrong shape raises TypeError/ValueError on unpacking
+    except (binascii.Error, ValueError, TypeError, UnicodeError):
+        raise InvalidCursorException()
+
+
+async def apaginate_keyset(queryset, limit, cursor=None,
+                           created_field="created", pk_field="id"):
+    """
+    Return (rows, next_cursor) for one newest-first page of queryset.
+
+    Fetches one row past limit to learn whether another page exists without
+    a separate COUNT query. next_cursor is None on the last page.
+
+    Raises InvalidCursorException on an undecodable cursor.
+    """
+
+    queryset = queryset.order_by(f"-{created_field}", f"-{pk_field}")
+
+    if cursor:
+        created, pk = decode_cursor(cursor)
+        # A cursor from another listing may carry a pk of the wrong type (eg.
+        # a story's UUID for a favorite's integer ID), which would otherwise
+        # fail only once the query runs:
+        pk_output_field = queryset.query.resolve_ref(pk_field).output_field
+        try:
+            pk = pk_output_field.to_python(pk)
+        except ValidationError:
+            raise InvalidCursorException()
+        queryset = queryset.filter(
+            Q(**{f"{created_field}__lt": created})
+            | Q(**{created_field: created, f"{pk_field}__lt": pk})
+        )
+
+    rows = [row async for row in queryset[:limit + 1]]
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor(
+        getattr(last, created_field),
+        getattr(last, pk_field)
+    )
+
+    return rows, next_cursor
+
+
+###############################################################################
+# Offset pagination helpers
+#
+# For orderings with no stable, unique key to seek on (eg. search rank),
+# cursors encode a row offset instead. Same opaque-cursor contract as above.
+
+def encode_offset_cursor(offset):
+    """Encode a row offset as an opaque cursor string."""
+
+    raw = json.dumps({"offset": offset}).encode()
+
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_offset_cursor(cursor):
+    """
+    Decode a cursor string back into a row offset.
+
+    Raises InvalidCursorException if the cursor was not produced by
+    encode_offset_cursor.
+    """
+
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor.encode()))["offset"]
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeError):
+        raise InvalidCursorException()
+
+    if not isinstance(offset, int) or offset < 0:
+        raise InvalidCursorException()
+
+    return offset
+
+
+async def apaginate_offset(queryset, limit, cursor=None):
+    """
+    Return (rows, next_cursor) for one page of an already ordered queryset.
+
+    next_cursor is None on the last page. Raises InvalidCursorException on an
+    undecodable cursor.
+    """
+
+    offset = decode_offset_cursor(cursor) if cursor else 0
+    rows = [row async for row in queryset[offset:offset + limit + 1]]
+
+    if len(rows) <= limit:
+        return rows, None
+
+    return rows[:limit], encode_offset_cursor(offset + limit)
@@ -0,0 +1,198 @@
+import inspect
+import random
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+
+from users.auth_utils import AUTH_KEY
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Replica alias the current request's reads go to; None means the primary:
+_read_alias = ContextVar("read_alias", default=None)
+
+
+###############################################################################
+# Read replicas
+#
+# Writes always go to the primary ("default"). Reads go to the primary too,
+# except inside views opted in with @reads_from_replica (and admin
+# changelists, via ReplicaChangelistAdmin), which read from a random alias in
+# DATABASE_REPLICAS.
+#
+# Replicas lag behind the primary, so after a client writes, it is "pinned"
+# to the primary for REPLICA_PIN_SECONDS: its replica-eligible reads go to the
+# primary and it always sees its own writes. Clients are told apart by their
+# auth token (or, for the admin, their session); signup and login, which
+# carry no token, pin the one they issue. Pins live in the default
+# cache, which must be shared between worker processes for pins to hold
+# across them.
+
+def client_key(request):
+    """Return a cache key identifying the client making request, or None for
+    an anonymous client."""
+
+    token = request.headers.get(AUTH_KEY)
+    session = getattr(request, "session", None)
+
+    if token:
+        client = f"token:{token}"
+    elif session is not None and session.session_key:
+        client = f"session:{session.session_key}"
+    else:
+        return None
+
+    return pin_key(client)
+
+
+def pin_key(client):
+    """Return the pin's cache key for a client ("token:<token>" or
+    "session:<session key>")."""
+
+    return f"replicas:pin:{md5(client.encode()).hexdigest()}"
+
+
+def pin_to_primary(request):
+    """Send this client's reads to the primary for the next
+    REPLICA_PIN_SECONDS."""
+
+    key = client_key(request)
+
+    if key is not None:
+        cache.set(key, True, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def pin_token_to_primary(token):
+    """
+    Pin the client that will send token to the primary, like
+    pin_to_primary().
+
+    For writes that issue the token (signup, login): the request itself
+    carried none, so the middleware can't tell who to pin.
+    """
+
+    cache.set(
+        pin_key(f"token:{token}"),
+        True,
+        timeout=settings.REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned(request):
+    """Return whether this client wrote recently enough to be pinned to the
+    primary."""
+
+    key = client_key(request)
+
+    return key is not None and cache.get(key, False)
+
+
+def choose_read_alias(request):
+    """Return the replica alias to serve request's reads from, or None for
+    the primary."""
+
+    if not settings.DATABASE_REPLICAS or is_pinned(request):
+        return None
+
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+@contextmanager
+def replica_reads(request):
+    """Send reads made inside this block to a replica, unless the client is
+    pinned to the primary."""
+
+    token = _read_alias.set(choose_read_alias(request))
+
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """Send reads made inside this block to the primary, even within a
+    replica_reads() block (eg. to fill a cache shared with every client)."""
+
+    token = _read_alias.set(None)
+
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def reads_from_replica(view):
+    """
+    Decorate a read-only view so its queries may be served by a replica.
+
+    The view must finish its reads before returning (eg. return evaluated
+    data, not lazy querysets). Works on sync and async views alike; async
+    views' ORM calls run in threads that inherit the choice of replica.
+    """
+
+    if inspect.iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            with replica_reads(request):
+                return await view(request, *args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(request):
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Database router implementing the above; see DATABASE_ROUTERS."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # Explicitly, so that saving an instance read from a replica doesn't
+        # write back to the replica:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary:
+        return True
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """Pin a client to the primary after each successful write request."""
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+
+        return response
+
+
+class ReplicaChangelistAdmin(admin.ModelAdmin):
+    """ModelAdmin whose changelist pages read from a replica."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method not in SAFE_METHODS:
+            return super().changelist_view(request, extra_context)
+
+        with replica_reads(request):
+            response = super().changelist_view(request, extra_context)
+            # The changelist queryset is evaluated while rendering:
+            if hasattr(response, "render"):
+                response.render()
+
+        return response
@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 AUTH_USER_MODEL = 'users.User'
 
 MIDDLEWARE = [
+    # First, so it compresses the body every other middleware has produced:
+    'hack_or_snooze.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +55,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'hack_or_snooze.replicas.ReplicaPinningMiddleware',
 ]
 
 ROOT_URLCONF = 'hack_or_snooze.urls'
@@ -83,9 +86,30 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
         "NAME": "hack_or_snooze",
-    }
+    },
+    # Read replica of "default" (see hack_or_snooze/replicas.py). Locally this
+    # is the same database; in production, point it at a streaming replica.
+    # Tests get a separate, empty copy, standing in for a replica that hasn't
+    # caught up yet.
+    "replica": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": "hack_or_snooze",
+        "TEST": {
+            "NAME": "test_hack_or_snooze_replica",
+        },
+    },
 }
 
+DATABASE_ROUTERS = ["hack_or_snooze.replicas.ReplicaRouter"]
+
+# Aliases that replica-eligible reads are spread across. Empty sends every
+# read to "default"; add "replica" once it points at a real replica:
+DATABASE_REPLICAS = []
+
+# How long a client reads only from "default" after it writes, to always see
+# its own writes despite replication lag:
+REPLICA_PIN_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -139,3 +163,107 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Django Ninja configuration keywords
 
 FORBID_EXTRA_FIELDS_KEYWORD = "forbid"
+
+
+#######################################
+# Pagination
+
+# Page size used by paginated list routes when the client sends no `limit`,
+# and the largest `limit` a client may request:
+PAGINATION_DEFAULT_LIMIT = 25
+PAGINATION_MAX_LIMIT = 100
+
+
+#######################################
+# Authenticated-user cache (see users/auth_utils.py)
+
+# Per-process count of verified tokens to remember, and how many seconds a
+# remembered user stays valid. Set the max size to 0 to disable the cache.
+AUTH_USER_CACHE_MAXSIZE = 10000
+AUTH_USER_CACHE_TTL = 60
+
+
+#######################################
+# Password hashing pool (see users/hashing.py)
+
+# Threads hashing passwords for login, signup and password changes, and how
+# many more hashes may wait for one before requests get a 503:
+PASSWORD_HASHING_WORKERS = 4
+PASSWORD_HASHING_MAX_QUEUE = 16
+
+
+#######################################
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# Cache alias holding rendered pages of the public story feed (see
+# stories/cache.py):
+STORIES_FEED_CACHE_ALIAS = "stories_feed"
+
+# Cache alias holding each user's set of favorite story IDs (see
+# favorites/cache.py):
+FAVORITE_IDS_CACHE_ALIAS = "favorite_ids"
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Per-process memory; right for a single worker process:
+    STORIES_FEED_CACHE_ALIAS: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "stories-feed",
+        "TIMEOUT": 300,
+    },
+    FAVORITE_IDS_CACHE_ALIAS: {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "favorite-ids",
+        "TIMEOUT": 300,
+    },
+}
+
+# With several worker processes on one host, share the feed cache on disk so
+# an invalidation in one process is seen by all of them:
+
+# CACHES[STORIES_FEED_CACHE_ALIAS] = {
+#     "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+#     "LOCATION": BASE_DIR / ".cache" / "stories_feed",
+#     "TIMEOUT": 300,
+# }
+#
+# (Likewise for CACHES[FAVORITE_IDS_CACHE_ALIAS].)
+
+
+#######################################
+# Bulk endpoints
+
+# Most stories POST /stories/bulk accepts in one request:
+STORIES_BULK_MAX_BATCH_SIZE = 100
+
+# Most IDs GET/POST /stories/batch resolves in one request:
+STORIES_BATCH_MAX_IDS = 100
+
+# Most story IDs (add and remove together) POST /favorites/{username}/batch
+# accepts in one request:
+FAVORITES_BATCH_MAX_IDS = 100
+
+# Most story IDs POST /favorites/{username}/contains checks in one request:
+FAVORITES_CONTAINS_MAX_IDS = 500
+
+
+#######################################
+# Response compression (see hack_or_snooze/compression.py)
+
+# Responses under this path are gzip/brotli compressed when the client
+# accepts it and they are at least API_COMPRESSION_MIN_SIZE bytes long:
+API_COMPRESSION_PATH_PREFIX = "/api/"
+API_COMPRESSION_MIN_SIZE = 1024
+
+
+#######################################
+# Trending stories (see stories/trending.py)
+
+# How many stories the recompute job keeps in the ranking table:
+STORIES_TRENDING_TOP_K = 500
+
+# How fast a story's score decays with age; HN's default is 1.8:
+STORIES_TRENDING_GRAVITY = 1.8
@@ -0,0 +1,38 @@
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import TestCase
+
+from hack_or_snooze.cache_versions import CacheVersion, invalidate_on_write
+
+
+class CacheVersionTestCase(TestCase):
+    """Test versioned cache keys."""
+
+    def setUp(self):
+        self.cache = LocMemCache("test-cache-versions", {})
+        self.version = CacheVersion(lambda: self.cache, "test:version")
+
+    def test_version_kept_until_replaced(self):
+        version = self.version.get()
+        self.assertEqual(self.version.get(), version)
+
+        self.version.replace()
+
+        self.assertNotEqual(self.version.get(), version)
+
+    def test_new_version_after_eviction(self):
+        version = self.version.get()
+
+        self.cache.delete("test:version")
+
+        self.assertNotEqual(self.version.get(), version)
+
+    def test_invalidate_on_write_now_and_on_commit(self):
+        invalidate = mock.Mock()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_on_write(invalidate)
+            self.assertEqual(invalidate.call_count, 1)
+
+        self.assertEqual(invalidate.call_count, 2)
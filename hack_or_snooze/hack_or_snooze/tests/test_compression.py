@@ -0,0 +1,94 @@
+import gzip
+import json
+
+from unittest import mock, skipIf
+
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from hack_or_snooze import compression
+from hack_or_snooze.compression import accepted_encoding
+from users.auth_utils import generate_token
+from users.factories import UserFactory
+from stories.factories import StoryFactory
+
+
+class AcceptedEncodingTestCase(SimpleTestCase):
+    """Test Accept-Encoding negotiation."""
+
+    def negotiate(self, accept_encoding):
+        request = RequestFactory().get(
+            "/api/stories/",
+            headers={"Accept-Encoding": accept_encoding}
+        )
+        return accepted_encoding(request)
+
+    def test_gzip_without_brotli(self):
+        with mock.patch.object(compression, "brotli", None):
+            self.assertEqual(self.negotiate("gzip, deflate, br"), "gzip")
+            self.assertEqual(self.negotiate("br"), None)
+
+    @skipIf(compression.brotli is None, "brotli is not installed")
+    def test_brotli_preferred(self):
+        self.assertEqual(self.negotiate("gzip, deflate, br"), "br")
+        self.assertEqual(self.negotiate("gzip, br;q=0"), "gzip")
+
+    def test_quality_zero_and_wildcard(self):
+        with mock.patch.object(compression, "brotli", None):
+            self.assertEqual(self.negotiate("gzip;q=0"), None)
+            self.assertEqual(self.negotiate("identity"), None)
+            self.assertEqual(self.negotiate(""), None)
+            self.assertEqual(self.negotiate("*"), "gzip")
+            self.assertEqual(self.negotiate("*, gzip;q=0"), None)
+
+
+@mock.patch.object(compression, "brotli", None)
+class CompressionMiddlewareTestCase(TestCase):
+    """Test that API responses are gzip compressed when accepted."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_token = generate_token(cls.user.username)
+
+        for _ in range(20):
+            StoryFactory(user=cls.user)
+
+    def get_user(self, **headers):
+        return self.client.get(
+            '/api/users/user',
+            headers={"token": self.user_token, **headers}
+        )
+
+    def test_compresses_large_api_response(self):
+        plain = self.get_user()
+        compressed = self.get_user(**{"Accept-Encoding": "gzip"})
+
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", compressed["Vary"])
+        self.assertLess(len(compressed.content), len(plain.content))
+        self.assertEqual(
+            json.loads(gzip.decompress(compressed.content)),
+            json.loads(plain.content)
+        )
+
+    def test_compressed_etag_is_weak_and_still_matches(self):
+        compressed = self.get_user(**{"Accept-Encoding": "gzip"})
+        etag = compressed["ETag"]
+
+        self.assertTrue(etag.startswith('W/"'))
+
+        not_modified = self.get_user(**{
+            "Accept-Encoding": "gzip",
+            "If-None-Match": etag,
+        })
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_skips_small_responses(self):
+        response = self.client.get(
+            '/api/stories/nonexistent',
+            headers={"Accept-Encoding": "gzip"}
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("Content-Encoding"))
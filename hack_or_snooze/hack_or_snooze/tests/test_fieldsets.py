@@ -0,0 +1,58 @@
+from django.test import SimpleTestCase
+
+from hack_or_snooze.exceptions import InvalidFieldsException
+from hack_or_snooze.fieldsets import parse_fields, narrow_schema, source_fields
+from stories.models import Story
+from stories.schemas import StorySchema, StoryGetAllOutput
+
+
+class FieldsetsTestCase(SimpleTestCase):
+    """Test sparse fieldset parsing and schema narrowing."""
+
+    def test_parse_fields_in_schema_order(self):
+        self.assertEqual(
+            parse_fields(" url,id,url, ", StorySchema),
+            ("id", "url")
+        )
+        self.assertIsNone(parse_fields(None, StorySchema))
+
+    def test_parse_fields_fail_unknown_or_empty(self):
+        with self.assertRaises(InvalidFieldsException):
+            parse_fields("id,nope", StorySchema)
+
+        with self.assertRaises(InvalidFieldsException):
+            parse_fields("", StorySchema)
+
+    def test_source_fields_follow_aliases(self):
+        self.assertEqual(
+            source_fields(StorySchema, ("id", "username")),
+            ["id", "user_id"]
+        )
+
+    def test_narrow_schema(self):
+        story_schema = narrow_schema(StorySchema, ("id", "username"))
+        output_schema = narrow_schema(StoryGetAllOutput, stories=story_schema)
+
+        story = Story(id="story-1", user_id="user", title="test_title")
+
+        self.assertEqual(
+            output_schema.from_orm({"stories": [story], "next": None}).dict(),
+            {"stories": [{"username": "user", "id": "story-1"}], "next": None}
+        )
+
+    def test_narrow_schema_leaves_original_alone(self):
+        narrow_schema(
+            StoryGetAllOutput,
+            stories=narrow_schema(StorySchema, ("title",))
+        )
+
+        self.assertIs(narrow_schema(StorySchema), StorySchema)
+        self.assertIs(
+            narrow_schema(StoryGetAllOutput, stories=StorySchema),
+            StoryGetAllOutput
+        )
+        self.assertEqual(
+            set(StoryGetAllOutput.model_fields["stories"].annotation.__args__[0]
+                .model_fields),
+            set(StorySchema.model_fields)
+        )
@@ -0,0 +1,126 @@
+import json
+import uuid
+import decimal
+import datetime
+
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ninja.renderers import JSONRenderer
+
+from hack_or_snooze import renderers
+from hack_or_snooze.renderers import FastJSONRenderer
+from stories.models import Story
+from stories.schemas import StoryGetAllOutput
+from users.models import User
+from users.schemas import UserOutput
+
+# Pass empty dictionary to simulate request object:
+REQUEST_MOCK = {}
+
+
+def build_story(i, microsecond=0):
+    """Build an unsaved story with distinctive timestamps."""
+
+    return Story(
+        id=f"story-{i}",
+        user_id="user",
+        author="test_author",
+        title="test_title",
+        url="http://test.com",
+        created=datetime.datetime(
+            2020, 1, 1, 0, 0, 0, microsecond,
+            tzinfo=datetime.timezone.utc
+        ),
+        modified=datetime.datetime(
+            2020, 1, 1, 12, 30, 0, microsecond,
+            tzinfo=datetime.timezone(datetime.timedelta(hours=-5))
+        ),
+    )
+
+
+class FastJSONRendererTestCase(SimpleTestCase):
+    """Tests that FastJSONRenderer matches Ninja's default renderer."""
+
+    def assert_same_output(self, data):
+        fast = FastJSONRenderer().render(REQUEST_MOCK, data, response_status=200)
+        stdlib = JSONRenderer().render(REQUEST_MOCK, data, response_status=200)
+
+        # object_pairs_hook=list compares key order as well as values:
+        self.assertEqual(
+            json.loads(fast, object_pairs_hook=list),
+            json.loads(stdlib, object_pairs_hook=list)
+        )
+
+    def test_story_feed_matches_stdlib(self):
+        data = StoryGetAllOutput.from_orm({
+            "stories": [build_story(1), build_story(2, microsecond=123456)],
+            "next": None,
+        }).dict()
+
+        self.assert_same_output(data)
+
+    def test_datetime_format_matches_stdlib(self):
+        data = StoryGetAllOutput.from_orm({
+            "stories": [build_story(1, microsecond=123456)],
+            "next": None,
+        }).dict()
+
+        fast = json.loads(
+            FastJSONRenderer().render(REQUEST_MOCK, data, response_status=200)
+        )
+
+        self.assertEqual(
+            fast["stories"][0]["created"],
+            "2020-01-01T00:00:00.123Z"
+        )
+        self.assertEqual(
+            fast["stories"][0]["modified"],
+            "2020-01-01T12:30:00.123-05:00"
+        )
+
+    def test_user_payload_matches_stdlib(self):
+        user = User(
+            username="user",
+            first_name="userFirst",
+            last_name="userLast",
+            date_joined=datetime.datetime(
+                2020, 1, 1, 0, 0, 0, 0,
+                tzinfo=datetime.timezone.utc
+            ),
+        )
+        data = UserOutput.from_orm({
+            "user": {
+                "username": user.username,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "date_joined": user.date_joined,
+                "stories": [build_story(1)],
+                "favorites": [build_story(2, microsecond=5000)],
+            }
+        }).dict()
+
+        self.assert_same_output(data)
+
+    def test_other_types_match_stdlib(self):
+        self.assert_same_output({
+            "naive": datetime.datetime(2020, 1, 1, 0, 0, 0, 999),
+            "date": datetime.date(2020, 1, 1),
+            "decimal": decimal.Decimal("1.50"),
+            "uuid": uuid.UUID("725ff2f9-2cc4-4e29-abab-95b9921f5a6b"),
+            1: "non-string key",
+        })
+
+    def test_falls_back_to_stdlib_without_orjson(self):
+        data = {"key": "value"}
+
+        with mock.patch.object(renderers, "orjson", None):
+            rendered = FastJSONRenderer().render(
+                REQUEST_MOCK, data, response_status=200
+            )
+
+        self.assertEqual(
+            rendered,
+            JSONRenderer().render(REQUEST_MOCK, data, response_status=200)
+        )
@@ -0,0 +1,219 @@
+import json
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from hack_or_snooze.replicas import ReplicaRouter, replica_reads
+from stories.cache import afeed_validators, feed_cache, invalidate_feed
+from stories.factories import StoryFactory
+from stories.models import Story
+from users.auth_utils import generate_token, user_cache
+from users.factories import UserFactory, FACTORY_USER_DEFAULT_PASSWORD
+from users.models import User
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class ReplicaRoutingTestCase(TestCase):
+    """
+    Test read-replica routing and read-your-writes pinning.
+
+    The "replica" test database is separate from "default" and only gets
+    the rows a test copies into it, so it behaves like a replica that is
+    lagging behind.
+    """
+
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_token = generate_token(cls.user.username)
+
+        # "replicated" rows:
+        cls.story = StoryFactory(user=cls.user)
+        cls.user.save(using="replica")
+        cls.story.save(using="replica")
+
+    def setUp(self):
+        cache.clear()
+        feed_cache().clear()
+        user_cache.clear()
+
+    def post_story(self):
+        response = self.client.post(
+            '/api/stories/',
+            data=json.dumps({
+                "author": "test_author",
+                "title": "new_title",
+                "url": "http://test.com",
+            }),
+            content_type="application/json",
+            headers={"token": self.user_token},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        return json.loads(response.content)["story"]["id"]
+
+    def test_reads_from_replica(self):
+        unreplicated = StoryFactory(user=self.user)
+
+        replicated_response = self.client.get(f'/api/stories/{self.story.id}')
+        unreplicated_response = self.client.get(
+            f'/api/stories/{unreplicated.id}'
+        )
+
+        self.assertEqual(replicated_response.status_code, 200)
+        self.assertEqual(unreplicated_response.status_code, 404)
+
+    def test_writes_go_to_primary(self):
+        story_id = self.post_story()
+
+        self.assertTrue(Story.objects.using("default").filter(id=story_id).exists())
+        self.assertFalse(Story.objects.using("replica").filter(id=story_id).exists())
+
+    def test_writer_pinned_to_primary(self):
+        story_id = self.post_story()
+
+        as_writer = self.client.get(
+            f'/api/stories/{story_id}',
+            headers={"token": self.user_token}
+        )
+        as_anonymous = self.client.get(f'/api/stories/{story_id}')
+
+        self.assertEqual(as_writer.status_code, 200)
+        self.assertEqual(as_anonymous.status_code, 404)
+
+    def test_feed_cache_filled_from_primary(self):
+        unreplicated = StoryFactory(user=self.user)
+
+        # the first read fills the cache, the second is served from it:
+        for _ in range(2):
+            response = self.client.get('/api/stories/')
+
+            self.assertCountEqual(
+                [story["id"] for story in json.loads(response.content)["stories"]],
+                [self.story.id, unreplicated.id]
+            )
+
+        invalidate_feed()
+        with replica_reads(RequestFactory().get('/')):
+            validators = async_to_sync(afeed_validators)()
+
+        self.assertEqual(validators[1], 2)
+
+    def test_pinned_writer_skips_cached_feed(self):
+        # an anonymous read caches the pre-write page:
+        self.client.get('/api/stories/')
+
+        story_id = self.post_story()
+        self.client.get('/api/stories/')
+
+        as_writer = self.client.get(
+            '/api/stories/',
+            headers={"token": self.user_token}
+        )
+
+        self.assertIn(
+            story_id,
+            [story["id"] for story in json.loads(as_writer.content)["stories"]]
+        )
+
+    def test_get_user_reads_from_replica_until_write(self):
+        User.objects.using("default").filter(
+            username=self.user.username
+        ).update(first_name="primaryFirst")
+
+        before_write = self.client.get(
+            '/api/users/user',
+            {"fields": "first_name"},
+            headers={"token": self.user_token}
+        )
+        self.assertEqual(
+            json.loads(before_write.content)["user"]["first_name"],
+            self.user.first_name
+        )
+
+        self.post_story()
+
+        after_write = self.client.get(
+            '/api/users/user',
+            {"fields": "first_name"},
+            headers={"token": self.user_token}
+        )
+        self.assertEqual(
+            json.loads(after_write.content)["user"]["first_name"],
+            "primaryFirst"
+        )
+
+    def test_new_user_pinned_to_primary(self):
+        response = self.client.post(
+            '/api/users/signup',
+            data=json.dumps({
+                "username": "newUser",
+                "password": "password",
+                "first_name": "newFirst",
+                "last_name": "newLast",
+            }),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        token = json.loads(response.content)["token"]
+
+        response = self.client.get(
+            '/api/users/newUser',
+            headers={"token": token}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_logged_in_user_pinned_to_primary(self):
+        User.objects.using("default").filter(
+            username=self.user.username
+        ).update(first_name="primaryFirst")
+
+        response = self.client.post(
+            '/api/users/login',
+            data=json.dumps({
+                "username": self.user.username,
+                "password": FACTORY_USER_DEFAULT_PASSWORD,
+            }),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(
+            '/api/users/user',
+            {"fields": "first_name"},
+            headers={"token": json.loads(response.content)["token"]}
+        )
+
+        self.assertEqual(
+            json.loads(response.content)["user"]["first_name"],
+            "primaryFirst"
+        )
+
+    def test_admin_changelist_reads_from_replica(self):
+        admin = UserFactory(
+            username="admin",
+            is_staff=True,
+            is_superuser=True
+        )
+        StoryFactory(user=self.user, title="unreplicated_title")
+        self.client.force_login(admin)
+
+        response = self.client.get('/admin/stories/story/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, self.story.title)
+        self.assertNotContains(response, "unreplicated_title")
+
+    def test_saving_replica_read_instance_writes_primary(self):
+        with replica_reads(RequestFactory().get('/')):
+            story = Story.objects.get(id=self.story.id)
+
+        self.assertEqual(story._state.db, "replica")
+        self.assertEqual(
+            ReplicaRouter().db_for_write(Story, instance=story),
+            "default"
+        )
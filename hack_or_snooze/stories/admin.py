@@ -1,7 +1,9 @@
 from django.contrib import admin
 
+from hack_or_snooze.replicas import ReplicaChangelistAdmin
+
 from .models import Story
 
 # Register your models here.
 
-admin.site.register(Story)
\ No newline at end of file
+admin.site.register(Story, ReplicaChangelistAdmin)
@@ -1,18 +1,60 @@
-from django.shortcuts import get_object_or_404
+import pydantic
 
-from ninja import Router
+from asgiref.sync import sync_to_async
 
-from hack_or_snooze.error_schemas import Unauthorized
+from django.conf import settings
+from django.http import Http404
+from django.shortcuts import aget_object_or_404
+from django.utils.cache import patch_vary_headers
 
-from users.auth_utils import token_header
+from typing import List
+
+from ninja import Router, Query
+
+from hack_or_snooze.error_schemas import BadRequest, Unauthorized
+from hack_or_snooze.pagination import apaginate_keyset, apaginate_offset
+from hack_or_snooze.fieldsets import (
+    parse_fields,
+    narrow_schema,
+    schema_response,
+)
+from hack_or_snooze.replicas import reads_from_replica, is_pinned
+from hack_or_snooze.conditional import (
+    make_etag,
+    set_validators,
+    not_modified_response,
+)
+
+from favorites.queries import annotate_is_favorited
+from users.auth_utils import AUTH_KEY, arequest_user, token_header
 
 from .models import Story
+from .queries import (
+    adelete_story,
+    aget_stories_by_ids,
+    bulk_create_stories,
+    only_story_fields,
+)
+from .search import search_stories
+from .cache import (
+    favorite_counts_version,
+    feed_page_key,
+    afeed_validators,
+    acached_response,
+)
 from .schemas import (
+    StoryBatchInput,
+    StoryBatchOutput,
     StoryPostInput,
     StoryPostOutput,
+    StoryBulkPostInput,
+    StoryBulkPostOutput,
     StoryGetAllOutput,
     StoryGetOutput,
     StoryDeleteOutput,
+    StorySchema,
+    FavoritedStorySchema,
+    StoryTrendingOutput,
 )
 
 router = Router()
@@ -23,7 +65,7 @@ router = Router()
     response=StoryPostOutput,
     auth=token_header
 )
-def create_story(request, data: StoryPostInput):
+async def create_story(request, data: StoryPostInput):
     """
     Create a story.
 
@@ -36,6 +78,7 @@ def create_story(request, data: StoryPostInput):
                 "title": "testtitle",
                 "author": "testauthor",
                 "url": "test.com",
+                "favorite_count": 0,
                 "created": "2000-01-01T00:00:00Z",
                 "modified": "2000-01-01T00:00:00Z"
             }
@@ -49,23 +92,129 @@ def create_story(request, data: StoryPostInput):
     curr_user = request.auth
     story_data = data.dict()
 
-    story = Story.objects.create(user=curr_user, **story_data)
+    story = await Story.objects.acreate(user=curr_user, **story_data)
 
     return {"story": story}
 
 
+@router.post(
+    '/bulk',
+    response={200: StoryBulkPostOutput, 400: StoryBulkPostOutput},
+    auth=token_header
+)
+async def create_stories_bulk(
+    request,
+    data: StoryBulkPostInput,
+    all_or_nothing: bool = True,
+):
+    """
+    Create many stories in one request. User must send:
+
+        {
+            "stories": [
+                {"author": "testauthor", "title": "testtitle", "url": "test.com"},
+                ...
+            ]
+        }
+
+    Every item is validated like a POST /stories body before anything is
+    inserted. The valid ones are then inserted in a single transaction.
+
+    On success, returns the created stories (in request order) and a list of
+    per-item validation errors, where "index" is the item's position in the
+    request:
+
+        {
+            "stories": [Story, Story...],
+            "errors": [
+                {
+                    "index": 1,
+                    "detail": [
+                        {
+                            "type": "missing",
+                            "loc": ["title"],
+                            "msg": "Field required"
+                        }
+                    ]
+                }
+            ]
+        }
+
+    By default (**all_or_nothing=true**), any invalid item fails the whole
+    batch with a 400, the same body with "stories" empty, and nothing is
+    created. With **all_or_nothing=false**, valid items are created and
+    invalid ones are only reported.
+
+    A batch larger than the configured maximum (100 by default) fails with
+    a 400 and a single error at index -1.
+
+    **Authentication: token**
+
+    **Authorization: all users**
+    """
+
+    curr_user = request.auth
+    max_batch_size = settings.STORIES_BULK_MAX_BATCH_SIZE
+
+    if len(data.stories) > max_batch_size:
+        return 400, {
+            "stories": [],
+            "errors": [{
+                "index": -1,
+                "detail": [{
+                    "type": "too_long",
+                    "loc": ["stories"],
+                    "msg": f"Batch may contain at most {max_batch_size} stories",
+                }],
+            }],
+        }
+
+    stories = []
+    errors = []
+
+    for index, item in enumerate(data.stories):
+        try:
+            story_data = StoryPostInput.model_validate(item).dict()
+        except pydantic.ValidationError as e:
+            errors.append({
+                "index": index,
+                "detail": [
+                    # match the shape of Ninja's own 422 error details:
+                    {"type": error["type"], "loc": error["loc"], "msg": error["msg"]}
+                    for error in e.errors(include_url=False)
+                ],
+            })
+        else:
+            stories.append(Story(user=curr_user, **story_data))
+
+    if errors and all_or_nothing:
+        return 400, {"stories": [], "errors": errors}
+
+    stories = await sync_to_async(bulk_create_stories)(stories)
+
+    return {"stories": stories, "errors": errors}
+
+
 @router.get(
     '/',
-    response=StoryGetAllOutput,
+    response={200: StoryGetAllOutput, 400: BadRequest},
 )
-def get_stories(request):
+@reads_from_replica
+async def get_stories(
+    request,
+    limit: int = Query(settings.PAGINATION_DEFAULT_LIMIT, ge=1),
+    cursor: str = None,
+    legacy: bool = False,
+    fields: str = None,
+):
     """
-    Get all stories.
+    Get stories, newest first, one page at a time.
 
-    On success, returns list of stories:
+    On success, returns a page of stories and a cursor for the next page:
 
         {
-            "stories": [Story, Story...]
+            "stories": [Story, Story...],
+            "next": "WyIyMDIwLTAxLTAxVDAwOjAwOjAwKzAwOjAwIiwgIjcyNWZmMmY5Il0="
         }
 
     Where "Story" is:
@@ -76,23 +225,364 @@ def get_stories(request):
                 "title": "testtitle",
                 "author": "testauthor",
                 "url": "test.com",
+                "favorite_count": 0,
                 "created": "2000-01-01T00:00:00Z",
                 "modified": "2000-01-01T00:00:00Z"
         }
 
+    Query parameters:
+
+    - **limit**: page size (default 25, capped at 100)
+    - **cursor**: the "next" value from the previous page; omit for the
+      first page. "next" is null on the last page.
+    - **legacy**: if true, ignore limit/cursor and return every story in one
+      response (for clients that predate pagination). "next" is always null.
+    - **fields**: comma-separated Story fields to return, eg.
+      `fields=id,title,url`; omit for all of them.
+
+    On failure for an undecodable cursor or an unknown field, returns error
+    JSON:
+
+        {
+            "detail": "Invalid cursor."
+        }
+
+    With a valid token header, each story also has "is_favorited": whether
+    the logged-in user favorited it. Without one (or with an invalid one),
+    stories are returned without it.
+
+    Anonymous pages are cached, as read from the primary database, until the
+    next story is created, edited or deleted (or, for pages with
+    favorite_count, favorited or unfavorited). Other reads may be served from
+    a read replica, except for a client that wrote in the last few seconds,
+    which skips both the replica and the cache.
+
+    Responses carry an ETag built from the newest "modified" timestamp, the
+    story count, the latest favorite toggle and the query parameters. Send
+    it back in If-None-Match to get an empty 304 Not Modified while nothing
+    has changed. (There is no Last-Modified: deleting an older story would
+    not move it.)
+
+    **Authentication: none (token optional)**
+    """
+
+    if legacy:
+        limit = cursor = None
+    else:
+        limit = min(limit, settings.PAGINATION_MAX_LIMIT)
+
+    story_fields = parse_fields(fields, StorySchema)
+    user = await arequest_user(request)
+    username = user.username if user is not None else None
+
+    # A client that just wrote must see its write, which neither a lagging
+    # replica nor a page cached from one is guaranteed to show:
+    refresh = is_pinned(request)
+
+    # Favorite toggles don't move "modified"; responses showing their effect
+    # (favorite_count, or is_favorited) also depend on the counts version:
+    shows_favorites = (
+        user is not None
+        or story_fields is None
+        or "favorite_count" in story_fields
+    )
+    counts_version = favorite_counts_version() if shows_favorites else None
+
+    max_modified, count = await afeed_validators(refresh)
+    etag = make_etag(
+        max_modified,
+        count,
+        counts_version,
+        limit,
+        cursor,
+        legacy,
+        story_fields,
+        username
+    )
+
+    response = not_modified_response(request, etag)
+    if response is not None:
+        return response
+
+    # keyset pagination reads "created" and "id" off the last story:
+    stories, story_schema = story_list(
+        Story.objects.all(), story_fields, user, "created", "id"
+    )
+
+    async def build_response_data():
+
+        if legacy:
+            page = [
+                story async for story in stories.order_by("-created", "-id")
+            ]
+            next_cursor = None
+        else:
+            page, next_cursor = await apaginate_keyset(stories, limit, cursor)
+
+        output_schema = narrow_schema(
+            StoryGetAllOutput,
+            stories=story_schema,
+        )
+
+        return output_schema.from_orm(
+            {"stories": page, "next": next_cursor}
+        ).dict()
+
+    if user is None:
+        response = await acached_response(
+            request,
+            router.api,
+            feed_page_key(
+                limit=limit,
+                cursor=cursor,
+                legacy=legacy,
+                fields=story_fields,
+                favorite_counts=counts_version,
+            ),
+            build_response_data,
+            refresh
+        )
+    else:
+        # is_favorited is per user; only anonymous pages are shared:
+        response = router.api.create_response(
+            request,
+            await build_response_data(),
+            status=200
+        )
+
+    patch_vary_headers(response, (AUTH_KEY,))
+
+    return set_validators(response, etag)
+
+
+@router.get(
+    '/search',
+    response={200: StoryGetAllOutput, 400: BadRequest},
+)
+async def get_stories_search(
+    request,
+    q: str = Query(..., min_length=1),
+    limit: int = Query(settings.PAGINATION_DEFAULT_LIMIT, ge=1),
+    cursor: str = None,
+    fields: str = None,
+):
+    """
+    Search story titles and authors, best match first, one page at a time.
+
+    **q** supports web search syntax: "quoted phrases", -excluded words and
+    or. Takes the same **limit**, **cursor** and **fields** query parameters
+    as GET /stories.
+
+    On success, returns a page of matching stories and a cursor for the next
+    page:
+
+        {
+            "stories": [Story, Story...],
+            "next": "eyJvZmZzZXQiOiAyNX0="
+        }
+
+    With a valid token header, stories carry "is_favorited", as in GET
+    /stories.
+
+    **Authentication: none (token optional)**
+    """
+
+    story_fields = parse_fields(fields, StorySchema)
+    stories, story_schema = story_list(
+        search_stories(q), story_fields, await arequest_user(request)
+    )
+
+    limit = min(limit, settings.PAGINATION_MAX_LIMIT)
+    page, next_cursor = await apaginate_offset(stories, limit, cursor)
+
+    response = schema_response(
+        request,
+        router.api,
+        narrow_schema(StoryGetAllOutput, stories=story_schema),
+        {"stories": page, "next": next_cursor}
+    )
+
+    patch_vary_headers(response, (AUTH_KEY,))
+
+    return response
+
+
+@router.get(
+    '/trending',
+    response={200: StoryTrendingOutput, 400: BadRequest},
+)
+async def get_stories_trending(
+    request,
+    limit: int = Query(settings.PAGINATION_DEFAULT_LIMIT, ge=1),
+    fields: str = None,
+):
+    """
+    Get the top trending stories: most favorited, decayed by age.
+
+    Served from a ranking table that `manage.py recompute_trending` refreshes
+    periodically, so rankings lag behind favorites until the next run.
+
+    Returns up to **limit** stories (default 25, capped at 100), best first:
+
+        {
+            "stories": [Story, Story...]
+        }
+
+    Takes the same **fields** query parameter as GET /stories. With a valid
+    token header, stories carry "is_favorited", as in GET /stories.
+
+    **Authentication: none (token optional)**
+    """
+
+    story_fields = parse_fields(fields, StorySchema)
+    stories, story_schema = story_list(
+        Story.objects.filter(trending__isnull=False),
+        story_fields,
+        await arequest_user(request)
+    )
+
+    limit = min(limit, settings.PAGINATION_MAX_LIMIT)
+    stories = stories.order_by("trending__rank")[:limit]
+    stories = [story async for story in stories]
+
+    response = schema_response(
+        request,
+        router.api,
+        narrow_schema(StoryTrendingOutput, stories=story_schema),
+        {"stories": stories}
+    )
+
+    patch_vary_headers(response, (AUTH_KEY,))
+
+    return response
+
+
+@router.get(
+    '/batch',
+    response={200: StoryBatchOutput, 400: BadRequest},
+)
+async def get_stories_batch(
+    request,
+    ids: List[str] = Query(...),
+    fields: str = None,
+):
+    """
+    Get many stories by ID in one request.
+
+    Send IDs as repeated query parameters or comma-separated (or both):
+
+        /stories/batch?ids=725ff2f9-...&ids=a3c1e0b2-...
+        /stories/batch?ids=725ff2f9-...,a3c1e0b2-...
+
+    For long lists, use POST /stories/batch instead. Takes the same
+    **fields** query parameter as GET /stories.
+
+    On success, returns found stories in request order, plus any IDs that do
+    not match a story:
+
+        {
+            "stories": [Story, Story...],
+            "missing": ["nonexistent-id"]
+        }
+
+    On failure for more IDs than the configured maximum (100 by default),
+    returns error JSON:
+
+        {
+            "detail": "Too many IDs. Max is 100."
+        }
+
     **Authentication: none**
     """
 
-    stories = Story.objects.all()
+    ids = [id for value in ids for id in value.split(",") if id]
+
+    if len(ids) > settings.STORIES_BATCH_MAX_IDS:
+        return 400, {
+            "detail": f"Too many IDs. Max is {settings.STORIES_BATCH_MAX_IDS}."
+        }
 
-    return {"stories": stories}
+    return await stories_batch_response(request, ids, fields)
+
+
+@router.post(
+    '/batch',
+    response={200: StoryBatchOutput, 400: BadRequest},
+)
+async def post_stories_batch(request, data: StoryBatchInput, fields: str = None):
+    """
+    Get many stories by ID in one request. User must send:
+
+        {
+            "ids": ["725ff2f9-2cc4-4e29-abab-95b9921f5a6b", ...]
+        }
+
+    Same as GET /stories/batch, for lists too long for a URL. **fields** is
+    still a query parameter.
+
+    **Authentication: none**
+    """
+
+    if len(data.ids) > settings.STORIES_BATCH_MAX_IDS:
+        return 400, {
+            "detail": f"Too many IDs. Max is {settings.STORIES_BATCH_MAX_IDS}."
+        }
+
+    return await stories_batch_response(request, data.ids, fields)
+
+
+async def stories_batch_response(request, ids, fields):
+    """Look up ids and render the GET/POST /stories/batch response, with
+    only the requested story fields."""
+
+    story_fields = parse_fields(fields, StorySchema)
+
+    stories, missing = await aget_stories_by_ids(
+        ids,
+        only_story_fields(Story.objects.all(), story_fields)
+    )
+
+    return schema_response(
+        request,
+        router.api,
+        narrow_schema(
+            StoryBatchOutput,
+            stories=narrow_schema(StorySchema, story_fields),
+        ),
+        {"stories": stories, "missing": missing}
+    )
+
+
+def story_list(stories, story_fields, user, *required):
+    """
+    Prepare a Story queryset for a story list response. Returns (stories,
+    story schema to serialize them with).
+
+    Narrows stories to story_fields (see only_story_fields(); required are
+    extra model fields the caller reads). For a logged-in user, also flags
+    each story with is_favorited, in the same query.
+    """
+
+    stories = only_story_fields(stories, story_fields, *required)
+
+    if user is None:
+        return stories, narrow_schema(StorySchema, story_fields)
+
+    if story_fields is not None:
+        story_fields = (*story_fields, "is_favorited")
+
+    return (
+        annotate_is_favorited(stories, user.username),
+        narrow_schema(FavoritedStorySchema, story_fields),
+    )
 
 
 @router.get(
     '/{str:story_id}',
-    response=StoryGetOutput,
+    response={200: StoryGetOutput, 400: BadRequest},
 )
-def get_story(request, story_id: str):
+@reads_from_replica
+async def get_story(request, story_id: str, fields: str = None):
     """
     Get story by ID.
 
@@ -105,18 +595,60 @@ def get_story(request, story_id: str):
                 "title": "testtitle",
                 "author": "testauthor",
                 "url": "test.com",
+                "favorite_count": 0,
                 "created": "2000-01-01T00:00:00Z",
                 "modified": "2000-01-01T00:00:00Z"
             }
         }
 
+    Takes the same **fields** query parameter as GET /stories.
+
+    Responses carry ETag and Last-Modified headers from the story's
+    "modified" timestamp. Send them back in If-None-Match/If-Modified-Since to
+    get an empty 304 Not Modified while the story is unchanged. Responses
+    with favorite_count carry only the ETag, which also covers the count
+    (favoriting does not move "modified").
+
+    May be served from a read replica (see GET /stories).
 
     **Authentication: none**
     """
 
-    story = get_object_or_404(Story, id=story_id)
-
-    return {"story": story}
+    story_fields = parse_fields(fields, StorySchema)
+
+    # "modified" is read for the validators:
+    story = await aget_object_or_404(
+        only_story_fields(Story.objects.all(), story_fields, "modified"),
+        id=story_id
+    )
+
+    # Favoriting moves favorite_count but not "modified", so a response
+    # showing the count is validated by the count too, and has no
+    # Last-Modified:
+    if story_fields is None or "favorite_count" in story_fields:
+        etag = make_etag(
+            story.id, story.modified, story.favorite_count, story_fields
+        )
+        last_modified = None
+    else:
+        etag = make_etag(story.id, story.modified, story_fields)
+        last_modified = story.modified
+
+    conditional_response = not_modified_response(request, etag, last_modified)
+    if conditional_response is not None:
+        return conditional_response
+
+    response = schema_response(
+        request,
+        router.api,
+        narrow_schema(
+            StoryGetOutput,
+            story=narrow_schema(StorySchema, story_fields),
+        ),
+        {"story": story}
+    )
+
+    return set_validators(response, etag, last_modified)
 
 
 @router.delete(
@@ -124,7 +656,7 @@ def get_story(request, story_id: str):
     response={200: StoryDeleteOutput, 401: Unauthorized},
     auth=token_header
 )
-def delete_story(request, story_id: str):
+async def delete_story(request, story_id: str):
     """
     Delete story by ID.
 
@@ -142,13 +674,13 @@ def delete_story(request, story_id: str):
 
     curr_user = request.auth
 
-    story = get_object_or_404(Story, id=story_id)
-
-    if story.user.username != curr_user.username and curr_user.is_staff is not True:
+    # The DELETE itself checks authorization; only when it deletes nothing
+    # is another query needed, to tell 404 from 401:
+    if not await adelete_story(story_id, curr_user):
+        if not await Story.objects.filter(id=story_id).aexists():
+            raise Http404()
         return 401, {"detail": "Unauthorized."}
 
-    story.delete()
-
     return {
         "deleted": True,
         "id": story_id
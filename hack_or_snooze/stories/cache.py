@@ -0,0 +1,182 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.http import HttpResponse
+
+from hack_or_snooze.cache_versions import CacheVersion, invalidate_on_write
+from hack_or_snooze.compression import (
+    accepted_encoding,
+    compress,
+    compressible,
+    encode_response,
+    supported_encodings,
+)
+from hack_or_snooze.replicas import primary_reads
+
+from .models import Story
+
+
+###############################################################################
+# Public story feed cache
+#
+# Each page of GET /stories is cached as its rendered JSON, keyed by the
+# request's pagination params and a feed "version". Any write to a story
+# replaces the version (see stories/signals.py), which orphans every cached
+# page at once (see hack_or_snooze/cache_versions.py). A new story shifts
+# every newest-first page, so there is no narrower set of pages to drop.
+#
+# Favorite toggles are not story writes: they leave "modified" and the feed
+# version alone, and replace a separate favorite counts version instead. Only
+# pages showing favorite_count are keyed on it too (see GET /stories), so a
+# toggle orphans those and leaves pages without counts cached.
+#
+# Next to each page, its gzip/brotli compressed variants are cached too (under
+# "<page key>:<encoding>", so they are orphaned along with it): a hot page is
+# compressed once per encoding, not once per hit.
+#
+# Everything cached here is read from the primary, even within a view that
+# reads from a replica: a lagging replica would otherwise have its stale
+# pages (and validators) served to every client until the next write.
+#
+# The feed routes are async. Cache calls stay sync: the configured backends
+# are in-process memory, and Django's async cache API would only hop threads
+# to make the same calls.
+
+def feed_cache():
+    """Return the cache backend configured for the story feed."""
+
+    return caches[settings.STORIES_FEED_CACHE_ALIAS]
+
+
+_feed_version = CacheVersion(feed_cache, "stories:feed:version")
+_favorite_counts_version = CacheVersion(
+    feed_cache,
+    "stories:favorite_counts:version"
+)
+
+
+def feed_version():
+    """Return the current feed version."""
+
+    return _feed_version.get()
+
+
+def invalidate_feed():
+    """Orphan every cached feed page."""
+
+    _feed_version.replace()
+
+
+def invalidate_feed_on_write():
+    """Orphan every cached feed page after a story write (see
+    invalidate_on_write())."""
+
+    invalidate_on_write(invalidate_feed)
+
+
+def favorite_counts_version():
+    """Return the current favorite counts version."""
+
+    return _favorite_counts_version.get()
+
+
+def invalidate_favorite_counts():
+    """Orphan every cached feed page showing favorite counts."""
+
+    _favorite_counts_version.replace()
+
+
+def invalidate_favorite_counts_on_write():
+    """Orphan cached pages showing favorite counts after a favorites write
+    (see invalidate_on_write())."""
+
+    invalidate_on_write(invalidate_favorite_counts)
+
+
+def feed_page_key(**params):
+    """
+    Return the cache key for one page of the feed under the current version.
+
+    Tuple values (eg. a fieldset) are joined with commas, so keys hold no
+    spaces or quotes, which memcached-compatible backends reject.
+
+    EX: feed_page_key(limit=25, fields=("id", "url"))
+        -> "stories:feed:<version>:fields=id,url:limit=25"
+    """
+
+    param_str = ":".join(
+        f"{name}={','.join(value) if isinstance(value, tuple) else value}"
+        for name, value in sorted(params.items())
+    )
+
+    return f"stories:feed:{feed_version()}:{param_str}"
+
+
+async def afeed_validators(refresh=False):
+    """
+    Return (max modified, row count) over all stories, for ETags.
+
+    Cached under the current feed version, so this is one aggregate query per
+    feed write rather than one per request. refresh=True skips the cached
+    value (and replaces it).
+    """
+
+    cache = feed_cache()
+    key = f"stories:feed:{feed_version()}:validators"
+    validators = None if refresh else cache.get(key)
+
+    if validators is None:
+        with primary_reads():
+            aggregates = await Story.objects.aaggregate(
+                max_modified=Max("modified"),
+                count=Count("id"),
+            )
+        validators = (aggregates["max_modified"], aggregates["count"])
+        cache.set(key, validators)
+
+    return validators
+
+
+async def acached_response(request, api, key, build_response_data,
+                           refresh=False):
+    """
+    Return an HttpResponse for key, rendering and caching it on a miss.
+    refresh=True skips the cached page (and replaces it).
+
+    If the client accepts compression, the response is served compressed,
+    from the cached compressed variant when there is one.
+
+    build_response_data() is a coroutine function that must return the
+    response data already serialized through its output schema (ie. a plain
+    dict ready for the renderer). Its reads go to the primary.
+    """
+
+    cache = feed_cache()
+    content = None if refresh else cache.get(key)
+
+    if content is None:
+        with primary_reads():
+            response_data = await build_response_data()
+        response = api.create_response(request, response_data, status=200)
+        cache.set(key, response.content)
+        # Compressed variants of a refreshed (or evicted) page are stale:
+        cache.delete_many([
+            f"{key}:{encoding}" for encoding in supported_encodings()
+        ])
+    else:
+        response = HttpResponse(content, content_type=api.get_content_type())
+
+    encoding = accepted_encoding(request)
+
+    if encoding is not None and compressible(request, response):
+        encoded_key = f"{key}:{encoding}"
+        compressed = cache.get(encoded_key)
+
+        if compressed is None:
+            compressed = compress(response.content, encoding)
+            cache.set(encoded_key, compressed)
+
+        if len(compressed) < len(response.content):
+            encode_response(response, encoding, compressed)
+
+    return response
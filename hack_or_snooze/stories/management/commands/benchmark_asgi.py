@@ -0,0 +1,249 @@
+import io
+import time
+import asyncio
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db.backends.signals import connection_created
+
+from stories.models import Story
+from users.auth_utils import AUTH_KEY, generate_token
+from users.models import User
+
+BENCHMARK_USERNAME = "benchmark-asgi-user"
+
+# Allowed by Django while DEBUG is on and ALLOWED_HOSTS is empty:
+HOST = "localhost"
+
+
+def percentile(sorted_values, fraction):
+    """Return the value at fraction (0-1) of sorted_values (nearest rank)."""
+
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare throughput and tail latency of the API served by the ASGI "
+        "application (async views on one event loop) and by the WSGI "
+        "application (a thread pool, as with threaded gunicorn workers). "
+        "Requests are driven in-process, so HTTP server overhead is left "
+        "out. Creates benchmark stories, committed so that every worker "
+        "thread sees them, and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2_000)
+        parser.add_argument("--concurrency", type=int, default=200)
+        parser.add_argument(
+            "--wsgi-threads", type=int, default=16,
+            help="WSGI worker threads (default 16)."
+        )
+        parser.add_argument("--stories", type=int, default=200)
+        parser.add_argument(
+            "--db-latency-ms", type=float, default=0,
+            help=(
+                "Sleep this long before every query, to stand in for the "
+                "network round trip to a remote database."
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options["db_latency_ms"]:
+            delay = options["db_latency_ms"] / 1000
+
+            def add_latency(execute, sql, params, many, context):
+                time.sleep(delay)
+                return execute(sql, params, many, context)
+
+            def on_connection_created(connection, **kwargs):
+                connection.execute_wrappers.append(add_latency)
+
+            # Worker threads open their own connections; wrap each one:
+            connection_created.connect(on_connection_created, weak=False)
+
+        user = self.create_data(options["stories"])
+
+        try:
+            paths = self.request_paths(user)
+            token = generate_token(user.username)
+
+            results = {
+                "WSGI": asyncio.run(self.run_wsgi(paths, token, options)),
+                "ASGI": asyncio.run(self.run_asgi(paths, token, options)),
+            }
+        finally:
+            self.delete_data()
+
+        self.stdout.write(
+            f"{options['requests']} requests, concurrency "
+            f"{options['concurrency']}, {options['wsgi_threads']} WSGI "
+            f"threads, {options['db_latency_ms']} ms added per query"
+        )
+
+        for name, (elapsed, latencies, errors) in results.items():
+            latencies.sort()
+            self.stdout.write(
+                f"{name}: {len(latencies) / elapsed:8.1f} req/s, "
+                f"p50 {percentile(latencies, 0.50) * 1000:7.1f} ms, "
+                f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms, "
+                f"max {latencies[-1] * 1000:7.1f} ms, "
+                f"{errors} errors"
+            )
+
+    def create_data(self, count):
+        self.delete_data()
+        user = User.objects.create_user(
+            username=BENCHMARK_USERNAME,
+            password="password",
+        )
+        Story.objects.bulk_create(
+            Story(
+                user=user,
+                author="benchmark",
+                title=f"benchmark story {i}",
+                url="http://test.com",
+            )
+            for i in range(count)
+        )
+
+        return user
+
+    def delete_data(self):
+        # Story.user is RESTRICT:
+        Story.objects.filter(user_id=BENCHMARK_USERNAME).delete()
+        User.objects.filter(username=BENCHMARK_USERNAME).delete()
+
+    def request_paths(self, user):
+        """Return the mix of GET paths to cycle through: the feed, single
+        stories, and the (authenticated) user payload."""
+
+        story_ids = Story.objects.filter(user=user).values_list(
+            "id", flat=True
+        )[:20]
+
+        return [
+            "/api/stories/?limit=25",
+            *(f"/api/stories/{id}" for id in story_ids),
+            f"/api/users/{user.username}?stories_limit=10",
+        ]
+
+    async def run_wsgi(self, paths, token, options):
+        """Benchmark the WSGI app; see drive()."""
+
+        application = get_wsgi_application()
+
+        def request(i):
+            path, _, query = paths[i % len(paths)].partition("?")
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path,
+                "QUERY_STRING": query,
+                "SERVER_NAME": HOST,
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": HOST,
+                f"HTTP_{AUTH_KEY.upper()}": token,
+                "wsgi.input": io.BytesIO(),
+                "wsgi.errors": io.StringIO(),
+                "wsgi.url_scheme": "http",
+                "wsgi.version": (1, 0),
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+            }
+            statuses = []
+
+            body = application(
+                environ,
+                lambda status, headers, exc_info=None: statuses.append(status)
+            )
+            b"".join(body)
+            body.close()
+
+            return statuses[0].startswith("200")
+
+        loop = asyncio.get_running_loop()
+
+        with ThreadPoolExecutor(max_workers=options["wsgi_threads"]) as pool:
+            return await self.drive(
+                lambda i: loop.run_in_executor(pool, request, i),
+                options
+            )
+
+    async def run_asgi(self, paths, token, options):
+        """Benchmark the ASGI app; see drive()."""
+
+        application = get_asgi_application()
+
+        async def request(i):
+            path, _, query = paths[i % len(paths)].partition("?")
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query.encode(),
+                "root_path": "",
+                "headers": [
+                    (b"host", HOST.encode()),
+                    (AUTH_KEY.encode(), token.encode()),
+                ],
+                "server": (HOST, 80),
+                "client": ("127.0.0.1", 0),
+            }
+            messages = []
+            request_sent = False
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {"type": "http.request", "body": b""}
+                # The client never disconnects; wait to be cancelled:
+                await asyncio.Future()
+
+            async def send(message):
+                messages.append(message)
+
+            await application(scope, receive, send)
+
+            return messages[0]["status"] == 200
+
+        return await self.drive(request, options)
+
+    async def drive(self, request, options):
+        """
+        Send options["requests"] requests, keeping options["concurrency"] in
+        flight, and return (elapsed seconds, latencies, errors).
+
+        request(i) returns an awaitable of whether request i succeeded. Its
+        latency includes any time spent queued for a worker thread.
+        """
+
+        semaphore = asyncio.Semaphore(options["concurrency"])
+
+        async def timed(i):
+            async with semaphore:
+                start = time.perf_counter()
+                ok = await request(i)
+                return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(timed(i) for i in range(options["requests"]))
+        )
+        elapsed = time.perf_counter() - start
+
+        latencies = [latency for latency, _ in outcomes]
+        errors = sum(1 for _, ok in outcomes if not ok)
+
+        return elapsed, latencies, errors
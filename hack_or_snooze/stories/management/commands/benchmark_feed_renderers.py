@@ -0,0 +1,66 @@
+import timeit
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from ninja.renderers import JSONRenderer
+
+from hack_or_snooze import renderers
+from hack_or_snooze.renderers import FastJSONRenderer
+from stories.models import Story
+from stories.schemas import StoryGetAllOutput
+
+
+def build_story(i):
+    """Build an unsaved story; timestamps carry microseconds like DB rows."""
+
+    timestamp = datetime.datetime(
+        2020, 1, 1, 0, 0, 0, i % 1_000_000,
+        tzinfo=datetime.timezone.utc
+    )
+
+    return Story(
+        id=f"story-{i}",
+        user_id="user",
+        author="test_author",
+        title="test_title",
+        url="http://test.com",
+        created=timestamp,
+        modified=timestamp,
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare Ninja's stdlib JSON renderer with FastJSONRenderer on a "
+        "serialized story feed. Builds stories in memory; needs no database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stories", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        data = StoryGetAllOutput.from_orm({
+            "stories": [
+                build_story(i) for i in range(options["stories"])
+            ],
+            "next": None,
+        }).dict()
+
+        candidates = [("stdlib", JSONRenderer())]
+        if renderers.orjson is not None:
+            candidates.append(("orjson", FastJSONRenderer()))
+        else:
+            self.stdout.write("orjson is not installed; timing stdlib only.")
+
+        for name, renderer in candidates:
+            best = min(timeit.repeat(
+                lambda: renderer.render({}, data, response_status=200),
+                number=1,
+                repeat=options["repeat"],
+            ))
+            self.stdout.write(
+                f"{name:>8}: {best * 1000:8.1f} ms "
+                f"for {options['stories']} stories (best of {options['repeat']})"
+            )
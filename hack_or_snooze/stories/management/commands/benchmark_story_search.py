@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from stories.models import Story
+from stories.search import search_stories
+from users.models import User
+
+WORDS = (
+    "python django postgres rust async cache index query search vector "
+    "scaling latency memory compiler kernel network browser database "
+    "release security startup hiring remote design testing deploy cloud"
+).split()
+
+QUERIES = ["django", "postgres index", '"async rust"', "cache -memory"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time GET /stories/search queries against a large story table. "
+        "Stories are inserted inside a transaction that is rolled back, so "
+        "the database is left as it was."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stories", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=25)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Database vendor: {connection.vendor}")
+
+        with transaction.atomic():
+            self.insert_stories(options["stories"], options["batch_size"])
+
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE stories_story")
+
+            for q in QUERIES:
+                self.time_query(q, options["limit"], options["repeat"])
+
+            transaction.set_rollback(True)
+
+    def insert_stories(self, count, batch_size):
+        """Bulk insert count stories with random titles and authors."""
+
+        rng = random.Random(0)
+        user = User.objects.create(username="benchmark-search-user")
+
+        start = time.perf_counter()
+
+        for batch_start in range(0, count, batch_size):
+            Story.objects.bulk_create(
+                Story(
+                    user=user,
+                    title=" ".join(rng.choices(WORDS, k=8)),
+                    author=" ".join(rng.choices(WORDS, k=2)),
+                    url="http://test.com",
+                )
+                for _ in range(min(batch_size, count - batch_start))
+            )
+
+        self.stdout.write(
+            f"Inserted {count} stories in {time.perf_counter() - start:.1f} s"
+        )
+
+    def time_query(self, q, limit, repeat):
+        """Time fetching the first page of results for q."""
+
+        timings = []
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(search_stories(q)[:limit])
+            timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+
+        self.stdout.write(
+            f"{q!r:>20}: median {statistics.median(timings) * 1000:8.1f} ms, "
+            f"p95 {p95 * 1000:8.1f} ms"
+        )
@@ -0,0 +1,152 @@
+import random
+import datetime
+import time
+
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from favorites.models import Favorite
+from stories import trending
+from stories.models import Story
+from stories.trending import recompute_trending, score_stories, top_scores
+from users.models import User
+
+
+def synthetic_stories(count, favorites, rng):
+    """
+    Return (ids, created timestamps, favorite counts) for count stories
+    posted over the last 30 days, sharing roughly favorites favorites with
+    a long tail (a few stories get most of them).
+    """
+
+    now = time.time()
+    ids = [f"story-{i}" for i in range(count)]
+    created = [now - rng.uniform(0, 30 * 24 * 3600) for _ in range(count)]
+
+    weights = [rng.paretovariate(1.2) for _ in range(count)]
+    scale = favorites / sum(weights)
+    favorite_counts = [round(weight * scale) for weight in weights]
+
+    return ids, created, favorite_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the trending recompute. Scores synthetic arrays with NumPy and "
+        "with pure Python, then (unless --scoring-only) runs full and "
+        "incremental recomputes against stories inserted in a transaction "
+        "that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stories", type=int, default=1_000_000)
+        parser.add_argument("--favorites", type=int, default=10_000_000)
+        parser.add_argument("--top-k", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument("--scoring-only", action="store_true")
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        ids, created, favorite_counts = synthetic_stories(
+            options["stories"], options["favorites"], rng
+        )
+
+        self.stdout.write(
+            f"{len(ids)} stories, {sum(favorite_counts)} favorites"
+        )
+
+        self.time_scoring(ids, created, favorite_counts, options)
+
+        if not options["scoring_only"]:
+            self.time_recompute(ids, created, favorite_counts, options)
+
+    def time_scoring(self, ids, created, favorite_counts, options):
+        """Time score + top K in memory, with and without NumPy."""
+
+        now = time.time()
+
+        def run():
+            scores = score_stories(created, favorite_counts, now, 1.8)
+            top_scores(ids, scores, options["top_k"])
+
+        results = {}
+
+        with mock.patch.object(trending, "np", None):
+            results["pure Python"] = self.best_of(run, options["repeat"])
+
+        if trending.np is not None:
+            results["NumPy"] = self.best_of(run, options["repeat"])
+        else:
+            self.stdout.write("NumPy is not installed; skipping.")
+
+        for name, seconds in results.items():
+            self.stdout.write(f"{name:>12} scoring: {seconds * 1000:8.1f} ms")
+
+    def time_recompute(self, ids, created, favorite_counts, options):
+        """Time full and incremental recomputes against the database."""
+
+        self.stdout.write(f"Database vendor: {connection.vendor}")
+
+        with transaction.atomic():
+            user = User.objects.create(username="benchmark-trending-user")
+            self.insert_stories(user, ids, created, favorite_counts, options)
+
+            start = time.perf_counter()
+            scored, _ = recompute_trending(full=True, top_k=options["top_k"])
+            self.stdout.write(
+                f"Full recompute: {scored} stories in "
+                f"{time.perf_counter() - start:.2f} s"
+            )
+
+            # Favorite 1% of stories since the last run:
+            Favorite.objects.bulk_create(
+                Favorite(user=user, story_id=id) for id in ids[::100]
+            )
+
+            start = time.perf_counter()
+            scored, _ = recompute_trending(top_k=options["top_k"])
+            self.stdout.write(
+                f"Incremental recompute: {scored} stories in "
+                f"{time.perf_counter() - start:.2f} s"
+            )
+
+            transaction.set_rollback(True)
+
+    def insert_stories(self, user, ids, created, favorite_counts, options):
+        batch_size = options["batch_size"]
+        start = time.perf_counter()
+
+        for batch_start in range(0, len(ids), batch_size):
+            batch = range(batch_start, min(batch_start + batch_size, len(ids)))
+            Story.objects.bulk_create(
+                Story(
+                    id=ids[i],
+                    user=user,
+                    title="benchmark story",
+                    author="benchmark",
+                    url="http://test.com",
+                    created=datetime.datetime.fromtimestamp(
+                        created[i], tz=datetime.timezone.utc
+                    ),
+                    favorite_count=favorite_counts[i],
+                )
+                for i in batch
+            )
+
+        self.stdout.write(
+            f"Inserted {len(ids)} stories in "
+            f"{time.perf_counter() - start:.1f} s"
+        )
+
+    def best_of(self, func, repeat):
+        timings = []
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+
+        return min(timings)
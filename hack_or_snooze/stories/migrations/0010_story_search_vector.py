@@ -0,0 +1,65 @@
+# Generated by Django 5.0 on 2026-10-17 02:26
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# Title matches (weight A) rank above author matches (weight B). The trigger
+# only fires on writes to those columns, so the frequent favorite_count
+# updates don't re-run to_tsvector():
+CREATE_SEARCH_VECTOR_TRIGGER = """
+CREATE FUNCTION stories_story_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('pg_catalog.english', coalesce(NEW.author, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER stories_story_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, author ON stories_story
+    FOR EACH ROW EXECUTE FUNCTION stories_story_search_vector_update();
+
+UPDATE stories_story SET title = title;
+
+CREATE INDEX stories_story_search_vector_gin
+    ON stories_story USING gin (search_vector);
+"""
+
+DROP_SEARCH_VECTOR_TRIGGER = """
+DROP INDEX IF EXISTS stories_story_search_vector_gin;
+DROP TRIGGER IF EXISTS stories_story_search_vector_trigger ON stories_story;
+DROP FUNCTION IF EXISTS stories_story_search_vector_update();
+"""
+
+
+def create_search_vector_trigger(apps, schema_editor):
+    """Keep search_vector up to date in the database (PostgreSQL only)."""
+
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(CREATE_SEARCH_VECTOR_TRIGGER)
+
+
+def drop_search_vector_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SEARCH_VECTOR_TRIGGER)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0009_story_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(
+            create_search_vector_trigger,
+            drop_search_vector_trigger,
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0 on 2026-10-17 02:30
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_favorites(apps, schema_editor):
+    """Fill in favorite_count for stories favorited before it existed."""
+
+    Story = apps.get_model("stories", "Story")
+    User = apps.get_model("users", "User")
+    Favorite = User._meta.get_field("favorites").remote_field.through
+
+    db_alias = schema_editor.connection.alias
+    favorites = Favorite.objects.using(db_alias).filter(
+        story_id=OuterRef("pk")
+    )
+
+    Story.objects.using(db_alias).update(
+        favorite_count=Coalesce(
+            Subquery(
+                favorites.order_by()
+                .values("story_id")
+                .annotate(count=Count("id"))
+                .values("count")[:1]
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0010_story_search_vector'),
+        ('users', '0010_alter_user_favorites_alter_user_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='story',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            count_existing_favorites,
+            migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-17 02:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stories', '0011_story_favorite_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingStory',
+            fields=[
+                ('story', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='stories.story')),
+                ('rank', models.PositiveIntegerField(db_index=True)),
+                ('score', models.FloatField()),
+                ('computed', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'Trending stories',
+                'ordering': ['rank'],
+            },
+        ),
+    ]
@@ -2,6 +2,7 @@ import uuid
 
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 
 from model_utils.models import TimeStampedModel
 
@@ -10,11 +11,30 @@ def generate_uuid():
     """Return a stringified UUID to use for story IDs."""
     return str(uuid.uuid4())
 
+class StoryManager(models.Manager):
+    """Default manager for stories."""
+
+    def get_queryset(self):
+        # search_vector is only ever read inside the database by search
+        # queries; don't ship it to Python with every story:
+        return super().get_queryset().defer("search_vector")
+
+
 class Story(TimeStampedModel, models.Model):
     """Story model."""
 
+    objects = StoryManager()
+
     class Meta:
         verbose_name_plural = 'Stories'
+        indexes = [
+            # Backs keyset pagination of the story feed, which orders and
+            # filters on (created, id):
+            models.Index(
+                fields=["created", "id"],
+                name="stories_created_id_idx",
+            ),
+        ]
 
     # The goal of using CharField instead of UUIDField here is to ensure that
     # the students *can* encounter a 404 without a lot of jumping through hoops
@@ -40,5 +60,54 @@ class Story(TimeStampedModel, models.Model):
 
     url = models.URLField()
 
+    # Denormalized count of users who favorited this story, so popularity
+    # doesn't need a COUNT over the favorites table. Kept in step by the
+    # Favorite receivers (see favorites/signals.py); repair drift with
+    # `manage.py rebuild_favorite_counts`.
+    favorite_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+    )
+
+    # Full-text search document over title and author. On PostgreSQL, a
+    # trigger (see migration 0010) fills this in on every insert and every
+    # update of those columns, and a GIN index backs it. Elsewhere it stays
+    # NULL and search falls back to substring matching (see stories/search.py).
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+    )
+
     def __str__(self):
         return self.title
+
+
+class TrendingStory(models.Model):
+    """
+    One row of the precomputed trending ranking (see stories/trending.py).
+
+    Rewritten wholesale by each recompute; holds only the top stories.
+    """
+
+    class Meta:
+        verbose_name_plural = 'Trending stories'
+        ordering = ["rank"]
+
+    story = models.OneToOneField(
+        Story,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="trending",
+    )
+
+    rank = models.PositiveIntegerField(
+        db_index=True,
+    )
+
+    score = models.FloatField()
+
+    # When the recompute that wrote this row started:
+    computed = models.DateTimeField()
+
+    def __str__(self):
+        return f"#{self.rank} {self.story_id}"
@@ -0,0 +1,188 @@
+from asgiref.sync import sync_to_async
+
+from django.db import connections, router, transaction
+from django.db.models import CASCADE, Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from favorites.cache import invalidate_favorite_ids_on_write
+from hack_or_snooze.fieldsets import source_fields
+
+from .cache import invalidate_feed_on_write
+from .models import Story
+from .schemas import StorySchema
+
+
+def only_story_fields(stories, fields, *required):
+    """
+    Narrow a Story queryset to the columns StorySchema reads for fields,
+    plus any required model fields the caller reads itself (eg. pagination
+    keys). Returns stories unchanged if fields is None.
+    """
+
+    if fields is None:
+        return stories
+
+    return stories.only(*source_fields(StorySchema, fields), *required)
+
+
+async def aget_stories_by_ids(ids, stories=None):
+    """
+    Return (stories, missing IDs) for ids, in request order, with one query.
+
+    stories is the queryset to look in (default: every story). Duplicate IDs
+    are resolved once, at their first position.
+    """
+
+    if stories is None:
+        stories = Story.objects.all()
+
+    unique_ids = list(dict.fromkeys(ids))
+    stories_by_id = await stories.ain_bulk(unique_ids)
+
+    stories = [stories_by_id[id] for id in unique_ids if id in stories_by_id]
+    missing = [id for id in unique_ids if id not in stories_by_id]
+
+    return stories, missing
+
+
+def bulk_create_stories(stories):
+    """
+    Insert stories in one transaction and orphan the cached feed.
+
+    Transactions are sync-only; async callers run this via sync_to_async().
+    Returns the created stories.
+    """
+
+    with transaction.atomic():
+        stories = Story.objects.bulk_create(stories)
+        # bulk_create() doesn't send post_save:
+        invalidate_feed_on_write()
+
+    return stories
+
+
+def favorite_count_subquery():
+    """
+    Return an expression counting favorites rows for the outer story, for
+    checking or rebuilding Story.favorite_count.
+    """
+
+    favorites = Story.favorited_by.through.objects.filter(
+        story_id=OuterRef("pk")
+    )
+
+    return Coalesce(
+        Subquery(
+            favorites.order_by()
+            .values("story_id")
+            .annotate(count=Count("id"))
+            .values("count")[:1]
+        ),
+        0,
+    )
+
+
+def adjust_favorite_counts(story_ids, delta):
+    """
+    Add delta to favorite_count on every story in story_ids, in one UPDATE.
+
+    The F() expression is applied by the database, so concurrent adjustments
+    don't overwrite each other. Counts are clamped at zero so that drift
+    can't violate the column's check constraint. Leaves "modified" alone:
+    favoriting isn't an edit of the story (see stories/cache.py for how
+    cached pages keep up with counts).
+    """
+
+    return Story.objects.filter(pk__in=story_ids).update(
+        favorite_count=Greatest(F("favorite_count") + delta, Value(0)),
+    )
+
+
+def story_cascades():
+    """
+    Return [(model, foreign key column)] for every CASCADE relation to Story,
+    from the model's own metadata, or None if some relation needs more than
+    a plain DELETE of the rows pointing at the story (another on_delete, or
+    rows that other rows point at in turn).
+    """
+
+    cascades = []
+
+    for relation in Story._meta.related_objects:
+        # Deleted through the foreign key on the through model, which is a
+        # relation of its own:
+        if relation.many_to_many:
+            continue
+
+        if (relation.on_delete is not CASCADE
+                or relation.related_model._meta.related_objects):
+            return None
+
+        cascades.append((relation.related_model, relation.field.column))
+
+    return cascades
+
+
+def delete_story_sql(connection, cascades):
+    """
+    Return SQL deleting one story and the rows of cascades (see
+    story_cascades()) pointing at it, in one statement. Takes the story ID,
+    the requester's username and whether they are staff as parameters, and
+    returns the deleted story's ID, if any.
+
+    Foreign keys are deferred on PostgreSQL, so the order doesn't matter.
+    """
+
+    quote = connection.ops.quote_name
+    statements = [
+        f"story AS (DELETE FROM {quote(Story._meta.db_table)}"
+        f" WHERE id = %s AND (user_id = %s OR %s) RETURNING id)"
+    ]
+
+    for i, (model, column) in enumerate(cascades):
+        statements.append(
+            f"cascade_{i} AS (DELETE FROM {quote(model._meta.db_table)}"
+            f" WHERE {quote(column)} IN (SELECT id FROM story))"
+        )
+
+    return f"WITH {', '.join(statements)} SELECT id FROM story"
+
+
+def delete_story(story_id, user):
+    """
+    Delete story story_id if user (the requester) posted it or is staff,
+    with a single conditional DELETE on PostgreSQL. Returns whether a story
+    was deleted; if not, it doesn't exist or user may not delete it.
+    """
+
+    connection = connections[router.db_for_write(Story)]
+    cascades = story_cascades()
+
+    if connection.vendor != "postgresql" or cascades is None:
+        stories = Story.objects.filter(id=story_id)
+        if not user.is_staff:
+            stories = stories.filter(user_id=user.username)
+
+        # Sends post_delete, which invalidates the feed:
+        deleted, _ = stories.delete()
+        return bool(deleted)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            delete_story_sql(connection, cascades),
+            [story_id, user.username, user.is_staff is True]
+        )
+        deleted = bool(cursor.fetchall())
+
+    # Raw SQL sends no post_delete; do its upkeep:
+    if deleted:
+        invalidate_feed_on_write()
+        invalidate_favorite_ids_on_write()
+
+    return deleted
+
+
+async def adelete_story(story_id, user):
+    """Async version of delete_story()."""
+
+    return await sync_to_async(delete_story)(story_id, user)
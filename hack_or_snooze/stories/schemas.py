@@ -1,4 +1,4 @@
-from typing import List
+from typing import Any, List, Optional
 
 from ninja import Schema, ModelSchema, Field
 
@@ -9,7 +9,9 @@ from .models import Story
 class StorySchema(ModelSchema):
     """Story Schema"""
 
-    username: str = Field(..., alias="user.username")
+    # User.username is the primary key, so the story's user_id column already
+    # holds it. Reading "user.username" would lazily load one User per story.
+    username: str = Field(..., alias="user_id")
 
     class Meta:
         model = Story
@@ -20,11 +22,19 @@ class StorySchema(ModelSchema):
             "title",
             "author",
             "url",
+            "favorite_count",
             "created",
             "modified",
         ]
 
 
+class FavoritedStorySchema(StorySchema):
+    """StorySchema plus whether the requesting user favorited the story, for
+    story lists served to a logged-in client."""
+
+    is_favorited: bool
+
+
 class StoryGetOutput(Schema):
     """Schema for GET /stories/{id} response body"""
 
@@ -35,6 +45,29 @@ class StoryGetAllOutput(Schema):
     """Schema for GET /stories response body"""
 
     stories: List[StorySchema]
+    next: Optional[str] = None
+
+
+class StoryTrendingOutput(Schema):
+    """Schema for GET /stories/trending response body"""
+
+    stories: List[StorySchema]
+
+
+class StoryBatchInput(Schema):
+    """Schema for POST /stories/batch request body"""
+
+    ids: List[str]
+
+    class Config:
+        extra = FORBID_EXTRA_FIELDS_KEYWORD
+
+
+class StoryBatchOutput(Schema):
+    """Schema for GET/POST /stories/batch response body"""
+
+    stories: List[StorySchema]
+    missing: List[str]
 
 
 class StoryPostInput(ModelSchema):
@@ -54,6 +87,31 @@ class StoryPostOutput(Schema):
     story: StorySchema
 
 
+class StoryBulkPostInput(Schema):
+    """Schema for POST /stories/bulk request body"""
+
+    # Items are validated one at a time against StoryPostInput in the route,
+    # so that errors can be reported per item rather than failing the batch:
+    stories: List[Any]
+
+    class Config:
+        extra = FORBID_EXTRA_FIELDS_KEYWORD
+
+
+class StoryBulkItemError(Schema):
+    """Validation errors for one item of a POST /stories/bulk batch"""
+
+    index: int
+    detail: List[dict]
+
+
+class StoryBulkPostOutput(Schema):
+    """Schema for POST /stories/bulk response body"""
+
+    stories: List[StorySchema]
+    errors: List[StoryBulkItemError]
+
+
 class StoryDeleteOutput(ModelSchema):
     """Schema for DELETE /stories/{id} response body"""
 
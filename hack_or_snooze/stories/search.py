@@ -0,0 +1,73 @@
+from functools import reduce
+from operator import add, and_
+
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.contrib.postgres.search import SearchQuery, SearchRank
+
+from .models import Story
+
+SEARCH_CONFIG = "english"
+
+
+###############################################################################
+# Story search
+#
+# On PostgreSQL, stories are matched against the trigger-maintained
+# search_vector column (GIN indexed) with websearch syntax ("quoted phrases",
+# -excluded, or) and ranked with ts_rank; title matches weigh more than author
+# matches. Other databases (ie. SQLite in local test settings) fall back to
+# case-insensitive substring matching of every search term, ranked by how many
+# terms hit the title (2 points) and the author (1 point).
+
+def search_stories(q):
+    """Return a Story queryset matching q, best match first, annotated with
+    "rank"."""
+
+    stories = Story.objects.all()
+
+    if connections[stories.db].vendor == "postgresql":
+        return search_stories_postgres(stories, q)
+
+    return search_stories_fallback(stories, q)
+
+
+def search_stories_postgres(stories, q):
+    """Full-text search over the search_vector column."""
+
+    query = SearchQuery(q, search_type="websearch", config=SEARCH_CONFIG)
+
+    return stories.filter(search_vector=query).annotate(
+        rank=SearchRank(F("search_vector"), query),
+    ).order_by("-rank", "-created", "-id")
+
+
+def search_stories_fallback(stories, q):
+    """Substring search for databases without full-text search."""
+
+    terms = q.split()
+
+    if not terms:
+        return stories.none()
+
+    matches = reduce(and_, (
+        Q(title__icontains=term) | Q(author__icontains=term)
+        for term in terms
+    ))
+
+    rank = reduce(add, (
+        Case(
+            When(title__icontains=term, then=Value(2)),
+            default=Value(0),
+            output_field=IntegerField(),
+        ) + Case(
+            When(author__icontains=term, then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        for term in terms
+    ))
+
+    return stories.filter(matches).annotate(
+        rank=rank,
+    ).order_by("-rank", "-created", "-id")
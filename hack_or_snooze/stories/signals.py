@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from favorites.cache import invalidate_favorite_ids_on_write
+
+from .models import Story
+from .cache import invalidate_feed_on_write
+
+
+@receiver(post_save, sender=Story)
+@receiver(post_delete, sender=Story)
+def invalidate_cached_feed(sender, instance, **kwargs):
+    """Drop cached feed pages when a story is created, edited or deleted."""
+
+    invalidate_feed_on_write()
+
+
+@receiver(post_delete, sender=Story)
+def invalidate_cached_favorite_ids(sender, instance, **kwargs):
+    """Drop cached favorite ID sets when a story is deleted, which takes its
+    favorites rows with it."""
+
+    invalidate_favorite_ids_on_write()
@@ -1,10 +1,25 @@
+import gzip
 import json
+import datetime
+import warnings
 
+from unittest import mock
+
+from django.core.cache import CacheKeyWarning
+from django.db import connection
+from django.db.models.deletion import Collector
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
+from hack_or_snooze import compression
 from users.factories import UserFactory
-from users.auth_utils import generate_token
+from users.auth_utils import generate_token, user_cache
 from stories.factories import StoryFactory
+from stories.cache import feed_cache
+from stories.models import Story, TrendingStory
+from stories.queries import story_cascades
+from stories.trending import recompute_trending
+from favorites.models import Favorite
 
 AUTH_KEY = 'token'
 EMPTY_TOKEN_VALUE = ''
@@ -56,6 +71,7 @@ class APIStoriesPostTestCase(TestCase):
                     "title": self.valid_data["title"],
                     "author": self.valid_data["author"],
                     "url": self.valid_data["url"],
+                    "favorite_count": 0,
                     "created": response_date_created,
                     "modified": response_date_modified
                 }
@@ -87,6 +103,7 @@ class APIStoriesPostTestCase(TestCase):
                     "title": self.valid_data["title"],
                     "author": self.valid_data["author"],
                     "url": self.valid_data["url"],
+                    "favorite_count": 0,
                     "created": response_date_created,
                     "modified": response_date_modified
                 }
@@ -320,12 +337,154 @@ class APIStoriesPostTestCase(TestCase):
         )
 
 
+class APIStoriesBulkPostTestCase(TestCase):
+    """Test POST /stories/bulk endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_token = generate_token(cls.user.username)
+
+        cls.valid_data = {
+            "author": "post_test_author",
+            "title": "post_test_title",
+            "url": "post_test_url"
+        }
+
+    def post_bulk(self, stories, **params):
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+
+        return self.client.post(
+            f'/api/stories/bulk?{query}',
+            data=json.dumps({"stories": stories}),
+            headers={AUTH_KEY: self.user_token},
+            content_type="application/json"
+        )
+
+    def test_post_bulk_ok(self):
+        stories = [
+            {**self.valid_data, "title": f"bulk_title_{i}"} for i in range(3)
+        ]
+
+        response = self.post_bulk(stories)
+
+        self.assertEqual(response.status_code, 200)
+        response_json = json.loads(response.content)
+        self.assertEqual(response_json["errors"], [])
+        self.assertEqual(
+            [story["title"] for story in response_json["stories"]],
+            ["bulk_title_0", "bulk_title_1", "bulk_title_2"]
+        )
+        self.assertEqual(
+            {story["username"] for story in response_json["stories"]},
+            {"user"}
+        )
+        self.assertEqual(Story.objects.count(), 3)
+
+    def test_post_bulk_single_insert(self):
+        stories = [self.valid_data] * 10
+
+        # auth, insert (plus savepoint and release inside the test's
+        # transaction)
+        with self.assertNumQueries(4):
+            user_cache.clear()
+            self.post_bulk(stories)
+
+        self.assertEqual(Story.objects.count(), 10)
+
+    def test_post_bulk_all_or_nothing_rejects_batch(self):
+        stories = [
+            self.valid_data,
+            {"author": "post_test_author", "url": "post_test_url"},
+            {**self.valid_data, "extra_field": "post_test_extra"},
+        ]
+
+        response = self.post_bulk(stories)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(
+            response.content,
+            {
+                "stories": [],
+                "errors": [
+                    {
+                        "index": 1,
+                        "detail": [{
+                            "type": "missing",
+                            "loc": ["title"],
+                            "msg": "Field required"
+                        }]
+                    },
+                    {
+                        "index": 2,
+                        "detail": [{
+                            "type": "extra_forbidden",
+                            "loc": ["extra_field"],
+                            "msg": "Extra inputs are not permitted"
+                        }]
+                    }
+                ]
+            }
+        )
+        self.assertEqual(Story.objects.count(), 0)
+
+    def test_post_bulk_best_effort_creates_valid_items(self):
+        stories = [self.valid_data, {"title": 2}, self.valid_data]
+
+        response = self.post_bulk(stories, all_or_nothing="false")
+
+        self.assertEqual(response.status_code, 200)
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["stories"]), 2)
+        self.assertEqual(
+            [error["index"] for error in response_json["errors"]],
+            [1]
+        )
+        self.assertEqual(Story.objects.count(), 2)
+
+    def test_post_bulk_fail_batch_too_large(self):
+        with self.settings(STORIES_BULK_MAX_BATCH_SIZE=2):
+            response = self.post_bulk([self.valid_data] * 3)
+
+        self.assertEqual(response.status_code, 400)
+        response_json = json.loads(response.content)
+        self.assertEqual(response_json["errors"][0]["index"], -1)
+        self.assertEqual(Story.objects.count(), 0)
+
+    def test_post_bulk_invalidates_feed_cache(self):
+        self.client.get('/api/stories/')
+
+        self.post_bulk([self.valid_data])
+
+        response = self.client.get('/api/stories/')
+        self.assertEqual(len(json.loads(response.content)["stories"]), 1)
+
+    def test_post_bulk_fail_unauthorized_no_token_header(self):
+        response = self.client.post(
+            '/api/stories/bulk',
+            data=json.dumps({"stories": [self.valid_data]}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Unauthorized"}
+        )
+
+
 class APIStoriesGETAllTestCase(TestCase):
     """Test GET /stories endpoint."""
 
     @classmethod
     def setUpTestData(cls):
-        cls.story_1 = StoryFactory()
+        # stories are returned newest first, so story_1 is posted later:
+        cls.story_1 = StoryFactory(
+            created=datetime.datetime(
+                2020, 1, 2, 0, 0, 0, 0,
+                tzinfo=datetime.timezone.utc
+            )
+        )
         cls.story_2 = StoryFactory()
 
     def test_get_all_stories_works(self):
@@ -342,8 +501,8 @@ class APIStoriesGETAllTestCase(TestCase):
             "modified": response_json["stories"][0]["modified"]
         }
         response_dates_story2 = {
-            "created": response_json["stories"][0]["created"],
-            "modified": response_json["stories"][0]["modified"]
+            "created": response_json["stories"][1]["created"],
+            "modified": response_json["stories"][1]["modified"]
         }
 
         self.assertEqual(response.status_code, 200)
@@ -357,6 +516,7 @@ class APIStoriesGETAllTestCase(TestCase):
                         "title": self.story_1.title,
                         "author": self.story_1.author,
                         "url": self.story_1.url,
+                        "favorite_count": 0,
                         "created": response_dates_story1["created"],
                         "modified": response_dates_story1["modified"]
                     },
@@ -366,15 +526,270 @@ class APIStoriesGETAllTestCase(TestCase):
                         "title": self.story_2.title,
                         "author": self.story_2.author,
                         "url": self.story_2.url,
+                        "favorite_count": 0,
                         "created": response_dates_story2["created"],
                         "modified": response_dates_story2["modified"]
                     }
 
-                ]
+                ],
+                "next": None
             }
         )
 
 
+class APIStoriesGETPaginatedTestCase(TestCase):
+    """Test cursor pagination on GET /stories endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # five stories, one day apart; story 0 is the oldest. Two stories share
+        # the newest timestamp so that ties are broken by id:
+        cls.stories = [
+            StoryFactory(
+                created=datetime.datetime(
+                    2020, 1, min(day, 4) + 1, 0, 0, 0, 0,
+                    tzinfo=datetime.timezone.utc
+                )
+            )
+            for day in range(5)
+        ]
+
+        cls.expected_order = [
+            story.id for story in
+            sorted(cls.stories, key=lambda s: (s.created, s.id), reverse=True)
+        ]
+
+    def test_get_stories_pages_through_all_stories_newest_first(self):
+        seen_ids = []
+        cursor = None
+
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+
+            response = self.client.get('/api/stories/', params)
+            self.assertEqual(response.status_code, 200)
+
+            response_json = json.loads(response.content)
+            self.assertLessEqual(len(response_json["stories"]), 2)
+            seen_ids.extend(story["id"] for story in response_json["stories"])
+
+            cursor = response_json["next"]
+            if cursor is None:
+                break
+
+        self.assertEqual(seen_ids, self.expected_order)
+
+    def test_get_stories_last_page_has_no_next(self):
+        response = self.client.get('/api/stories/', {"limit": 5})
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["stories"]), 5)
+        self.assertIsNone(response_json["next"])
+
+    def test_get_stories_limit_capped_at_max(self):
+        with self.settings(PAGINATION_MAX_LIMIT=3):
+            response = self.client.get('/api/stories/', {"limit": 50})
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["stories"]), 3)
+        self.assertIsNotNone(response_json["next"])
+
+    def test_get_stories_legacy_returns_all_stories(self):
+        response = self.client.get(
+            '/api/stories/',
+            {"legacy": "true", "limit": 1}
+        )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(
+            [story["id"] for story in response_json["stories"]],
+            self.expected_order
+        )
+        self.assertIsNone(response_json["next"])
+
+    def test_get_stories_fail_invalid_cursor(self):
+        response = self.client.get('/api/stories/', {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Invalid cursor."}
+        )
+
+    def test_get_stories_fail_limit_below_one(self):
+        response = self.client.get('/api/stories/', {"limit": 0})
+
+        self.assertEqual(response.status_code, 422)
+
+
+class APIStoriesGETQueryCountTestCase(TestCase):
+    """Test that GET /stories costs the same number of queries regardless of
+    how many stories (and posting users) are on the page."""
+
+    def assert_feed_queries(self, num_stories):
+        for i in range(num_stories):
+            StoryFactory(user=UserFactory(username=f"poster{i}"))
+
+        # feed validators, page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/stories/', {"limit": 100})
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["stories"]), num_stories)
+
+    def test_get_stories_query_count_few_stories(self):
+        self.assert_feed_queries(2)
+
+    def test_get_stories_query_count_many_stories(self):
+        self.assert_feed_queries(20)
+
+    def test_get_stories_username_from_foreign_key(self):
+        story = StoryFactory(user=UserFactory(username="poster"))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/stories/{story.id}')
+
+        self.assertEqual(
+            json.loads(response.content)["story"]["username"],
+            "poster"
+        )
+
+
+class APIStoriesGETCacheTestCase(TestCase):
+    """Test caching of GET /stories pages."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_token = generate_token(cls.user.username)
+
+        cls.story = StoryFactory(user=cls.user)
+
+    def setUp(self):
+        feed_cache().clear()
+
+    def get_feed_ids(self, **params):
+        response = self.client.get('/api/stories/', params)
+        self.assertEqual(response.status_code, 200)
+
+        return [story["id"] for story in json.loads(response.content)["stories"]]
+
+    def test_get_stories_cache_hit_skips_database(self):
+        first_response = self.client.get('/api/stories/')
+
+        with self.assertNumQueries(0):
+            second_response = self.client.get('/api/stories/')
+
+        self.assertEqual(second_response.status_code, 200)
+        self.assertEqual(second_response.content, first_response.content)
+        self.assertEqual(
+            second_response["Content-Type"],
+            first_response["Content-Type"]
+        )
+
+    def test_get_stories_pages_cached_separately(self):
+        StoryFactory(user=self.user)
+
+        self.assertEqual(len(self.get_feed_ids(limit=1)), 1)
+        self.assertEqual(len(self.get_feed_ids(limit=2)), 2)
+        self.assertEqual(len(self.get_feed_ids(legacy="true")), 2)
+
+    def test_create_story_invalidates_cache(self):
+        self.get_feed_ids()
+
+        response = self.client.post(
+            '/api/stories/',
+            data=json.dumps({
+                "author": "post_test_author",
+                "title": "post_test_title",
+                "url": "post_test_url"
+            }),
+            headers={AUTH_KEY: self.user_token},
+            content_type="application/json"
+        )
+        new_story_id = json.loads(response.content)["story"]["id"]
+
+        self.assertIn(new_story_id, self.get_feed_ids())
+
+    def test_delete_story_invalidates_cache(self):
+        self.get_feed_ids()
+
+        self.client.delete(
+            f'/api/stories/{self.story.id}',
+            headers={AUTH_KEY: self.user_token},
+        )
+
+        self.assertNotIn(self.story.id, self.get_feed_ids())
+
+    def test_story_edit_invalidates_cache(self):
+        """Edits made outside the API (eg. in the admin) also invalidate."""
+
+        self.get_feed_ids()
+
+        self.story.title = "edited_title"
+        self.story.save()
+
+        response = self.client.get('/api/stories/')
+        self.assertEqual(
+            json.loads(response.content)["stories"][0]["title"],
+            "edited_title"
+        )
+
+
+class APIStoriesGETCompressionTestCase(TestCase):
+    """Test that cached feed pages cache their compressed variants."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for _ in range(20):
+            StoryFactory()
+
+    def setUp(self):
+        feed_cache().clear()
+
+    def get_stories(self, **headers):
+        return self.client.get('/api/stories/', headers=headers)
+
+    @mock.patch.object(compression, "brotli", None)
+    def test_feed_compressed_once_per_page(self):
+        plain = self.get_stories()
+
+        with mock.patch(
+            "stories.cache.compress",
+            wraps=compression.compress
+        ) as compress:
+            first = self.get_stories(**{"Accept-Encoding": "gzip"})
+            second = self.get_stories(**{"Accept-Encoding": "gzip"})
+
+        compress.assert_called_once()
+
+        for response in (first, second):
+            self.assertEqual(response["Content-Encoding"], "gzip")
+            self.assertIn("Accept-Encoding", response["Vary"])
+            self.assertEqual(response["ETag"], "W/" + plain["ETag"])
+            self.assertEqual(
+                json.loads(gzip.decompress(response.content)),
+                json.loads(plain.content)
+            )
+
+    @mock.patch.object(compression, "brotli", None)
+    def test_feed_compressed_variant_invalidated_with_page(self):
+        self.get_stories(**{"Accept-Encoding": "gzip"})
+
+        StoryFactory(
+            title="new_story",
+            created=datetime.datetime(2021, 1, 1, tzinfo=datetime.timezone.utc)
+        )
+
+        response = self.get_stories(**{"Accept-Encoding": "gzip"})
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content))["stories"][0]["title"],
+            "new_story"
+        )
+
+
 class APIStoriesGETOneTestCase(TestCase):
     """Test GET /stories/{story_id} endpoint."""
 
@@ -407,6 +822,7 @@ class APIStoriesGETOneTestCase(TestCase):
                     "title": self.story_1.title,
                     "author": self.story_1.author,
                     "url": self.story_1.url,
+                    "favorite_count": 0,
                     "created": response_dates_story1["created"],
                     "modified": response_dates_story1["modified"]
                 }
@@ -429,6 +845,642 @@ class APIStoriesGETOneTestCase(TestCase):
         )
 
 
+class APIStoriesConditionalGETTestCase(TestCase):
+    """Test ETag/Last-Modified handling on GET /stories endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.story = StoryFactory()
+
+    def setUp(self):
+        feed_cache().clear()
+
+    def test_get_stories_not_modified_with_matching_etag(self):
+        response = self.client.get('/api/stories/')
+        etag = response["ETag"]
+
+        # validators are cached with the feed, so a 304 needs no query:
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                '/api/stories/',
+                headers={"If-None-Match": etag}
+            )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_get_stories_etag_differs_per_page(self):
+        etag = self.client.get('/api/stories/')["ETag"]
+
+        response = self.client.get(
+            '/api/stories/',
+            {"limit": 1},
+            headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_stories_modified_after_new_story(self):
+        etag = self.client.get('/api/stories/')["ETag"]
+
+        StoryFactory()
+
+        response = self.client.get(
+            '/api/stories/',
+            headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_get_stories_modified_after_favorite(self):
+        etag = self.client.get('/api/stories/')["ETag"]
+
+        UserFactory(username="fan").favorites.add(self.story)
+
+        response = self.client.get(
+            '/api/stories/',
+            headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        story = json.loads(response.content)["stories"][0]
+        self.assertEqual(story["favorite_count"], 1)
+        # favoriting isn't an edit of the story:
+        self.assertEqual(story["modified"], "2020-01-01T00:00:00Z")
+
+    def test_get_stories_without_counts_kept_after_favorite(self):
+        params = {"fields": "id,title"}
+        etag = self.client.get('/api/stories/', params)["ETag"]
+
+        UserFactory(username="fan").favorites.add(self.story)
+
+        # neither the validators nor the page are invalidated:
+        with self.assertNumQueries(0):
+            not_modified = self.client.get(
+                '/api/stories/',
+                params,
+                headers={"If-None-Match": etag}
+            )
+            cached = self.client.get('/api/stories/', params)
+
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(cached.status_code, 200)
+
+    def test_get_stories_modified_after_story_deleted(self):
+        other_story = StoryFactory()
+        etag = self.client.get('/api/stories/')["ETag"]
+
+        other_story.delete()
+
+        response = self.client.get(
+            '/api/stories/',
+            headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_story_not_modified_with_matching_etag(self):
+        response = self.client.get(f'/api/stories/{self.story.id}')
+        etag = response["ETag"]
+
+        response = self.client.get(
+            f'/api/stories/{self.story.id}',
+            headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_get_story_not_modified_since_last_modified(self):
+        response = self.client.get(
+            f'/api/stories/{self.story.id}',
+            {"fields": "id,title"}
+        )
+        last_modified = response["Last-Modified"]
+
+        response = self.client.get(
+            f'/api/stories/{self.story.id}',
+            {"fields": "id,title"},
+            headers={"If-Modified-Since": last_modified}
+        )
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_get_story_no_last_modified_with_favorite_count(self):
+        response = self.client.get(f'/api/stories/{self.story.id}')
+
+        self.assertNotIn("Last-Modified", response)
+
+    def test_get_story_modified_after_favorite(self):
+        etag = self.client.get(f'/api/stories/{self.story.id}')["ETag"]
+
+        UserFactory(username="fan").favorites.add(self.story)
+
+        response = self.client.get(
+            f'/api/stories/{self.story.id}',
+            headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            json.loads(response.content)["story"]["favorite_count"],
+            1
+        )
+
+    def test_get_story_modified_after_edit(self):
+        etag = self.client.get(f'/api/stories/{self.story.id}')["ETag"]
+
+        self.story.title = "edited_title"
+        self.story.save()
+
+        response = self.client.get(
+            f'/api/stories/{self.story.id}',
+            headers={"If-None-Match": etag}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+
+class APIStoriesSearchTestCase(TestCase):
+    """Test GET /stories/search endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.title_and_author_match = StoryFactory(
+            title="Learning django the hard way",
+            author="django fan",
+        )
+        cls.author_match = StoryFactory(
+            title="Web frameworks compared",
+            author="django fan",
+        )
+        cls.title_match = StoryFactory(
+            title="Why Django scales",
+            author="someone",
+        )
+        cls.no_match = StoryFactory(
+            title="Rust for pythonistas",
+            author="someone",
+        )
+
+    def search_ids(self, **params):
+        response = self.client.get('/api/stories/search', params)
+        self.assertEqual(response.status_code, 200)
+
+        return [story["id"] for story in json.loads(response.content)["stories"]]
+
+    def test_search_matches_title_and_author(self):
+        ids = self.search_ids(q="django")
+
+        self.assertEqual(
+            set(ids),
+            {
+                self.title_and_author_match.id,
+                self.author_match.id,
+                self.title_match.id,
+            }
+        )
+
+    def test_search_ranks_best_match_first(self):
+        ids = self.search_ids(q="django")
+
+        self.assertEqual(ids[0], self.title_and_author_match.id)
+
+    def test_search_requires_every_term(self):
+        ids = self.search_ids(q="django scales")
+
+        self.assertEqual(ids, [self.title_match.id])
+
+    def test_search_paginates(self):
+        first_page = json.loads(self.client.get(
+            '/api/stories/search', {"q": "django", "limit": 2}
+        ).content)
+        second_page = json.loads(self.client.get(
+            '/api/stories/search',
+            {"q": "django", "limit": 2, "cursor": first_page["next"]}
+        ).content)
+
+        ids = [story["id"] for story in first_page["stories"]]
+        ids += [story["id"] for story in second_page["stories"]]
+
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertIsNone(second_page["next"])
+
+    def test_search_no_results(self):
+        self.assertEqual(self.search_ids(q="haskell"), [])
+
+    def test_search_fail_missing_query(self):
+        response = self.client.get('/api/stories/search')
+
+        self.assertEqual(response.status_code, 422)
+
+    def test_search_fail_invalid_cursor(self):
+        response = self.client.get(
+            '/api/stories/search',
+            {"q": "django", "cursor": "not-a-cursor"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class APIStoriesTrendingTestCase(TestCase):
+    """Test GET /stories/trending endpoint and the recompute job behind it."""
+
+    NOW = datetime.datetime(2020, 1, 2, 0, 0, 0, tzinfo=datetime.timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        # 24 hours old, 10 favorites: 10 / 26 ** 1.8 ~= 0.028
+        cls.old_popular = cls.favorited_story(
+            created=cls.NOW - datetime.timedelta(hours=24),
+            favorite_count=10,
+        )
+        # 2 hours old, 2 favorites: 2 / 4 ** 1.8 ~= 0.165
+        cls.fresh = cls.favorited_story(
+            created=cls.NOW - datetime.timedelta(hours=2),
+            favorite_count=2,
+        )
+        cls.unfavorited = StoryFactory(created=cls.NOW)
+
+    @classmethod
+    def favorited_story(cls, created, favorite_count):
+        story = StoryFactory(created=created)
+        Story.objects.filter(id=story.id).update(
+            favorite_count=favorite_count,
+        )
+
+        return story
+
+    def trending_ids(self, **params):
+        response = self.client.get('/api/stories/trending', params)
+        self.assertEqual(response.status_code, 200)
+
+        return [story["id"] for story in json.loads(response.content)["stories"]]
+
+    def test_trending_empty_before_first_recompute(self):
+        self.assertEqual(self.trending_ids(), [])
+
+    def test_trending_ranks_favorites_decayed_by_age(self):
+        recompute_trending(now=self.NOW)
+
+        self.assertEqual(
+            self.trending_ids(),
+            [self.fresh.id, self.old_popular.id]
+        )
+
+    def test_trending_limit(self):
+        recompute_trending(now=self.NOW)
+
+        self.assertEqual(self.trending_ids(limit=1), [self.fresh.id])
+
+    def test_trending_keeps_top_k(self):
+        self.assertEqual(recompute_trending(top_k=1, now=self.NOW), (2, 1))
+
+        self.assertEqual(self.trending_ids(), [self.fresh.id])
+
+    def test_incremental_recompute_scores_touched_and_ranked_stories(self):
+        recompute_trending(top_k=1, now=self.NOW)
+
+        # nothing touched since: only the ranked story is rescored
+        later = self.NOW + datetime.timedelta(hours=1)
+        self.assertEqual(recompute_trending(top_k=1, now=later), (1, 1))
+
+        # a story favorited since the last run is picked up
+        just_favorited = self.favorited_story(
+            created=later,
+            favorite_count=5,
+        )
+        Favorite.objects.create(
+            user=UserFactory(username="fan"),
+            story=just_favorited,
+            created=later,
+        )
+        self.assertEqual(recompute_trending(top_k=1, now=later), (2, 1))
+        self.assertEqual(self.trending_ids(), [just_favorited.id])
+
+        # a full run rescores everything
+        self.assertEqual(
+            recompute_trending(top_k=1, full=True, now=later),
+            (3, 1)
+        )
+
+
+class APIStoriesFieldsTestCase(TestCase):
+    """Test ?fields= sparse fieldsets on story endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.story = StoryFactory()
+
+    def setUp(self):
+        feed_cache().clear()
+
+    def test_get_all_stories_fields(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/stories/', {"fields": "id,title,url"}
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {
+                "stories": [{
+                    "id": self.story.id,
+                    "title": self.story.title,
+                    "url": self.story.url,
+                }],
+                "next": None,
+            }
+        )
+
+        # omitted columns aren't loaded either:
+        page_sql = queries.captured_queries[-1]["sql"]
+        self.assertNotIn('"author"', page_sql)
+        self.assertNotIn('"favorite_count"', page_sql)
+
+    def test_get_all_stories_cached_per_fieldset(self):
+        self.client.get('/api/stories/')
+        response = self.client.get('/api/stories/', {"fields": "id"})
+
+        self.assertJSONEqual(
+            response.content,
+            {"stories": [{"id": self.story.id}], "next": None}
+        )
+
+    def test_get_all_stories_fieldset_cache_key_is_portable(self):
+        # LocMemCache warns about keys memcached would reject:
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", CacheKeyWarning)
+            response = self.client.get(
+                '/api/stories/', {"fields": "id,title,url"}
+            )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_story_fields(self):
+        response = self.client.get(
+            f'/api/stories/{self.story.id}', {"fields": "username,url"}
+        )
+
+        self.assertJSONEqual(
+            response.content,
+            {"story": {"username": "user", "url": self.story.url}}
+        )
+        self.assertNotEqual(
+            response["ETag"],
+            self.client.get(f'/api/stories/{self.story.id}')["ETag"]
+        )
+
+    def test_batch_and_search_and_trending_fields(self):
+        batch = self.client.post(
+            '/api/stories/batch?fields=id',
+            data=json.dumps({"ids": [self.story.id, "nonexistent"]}),
+            content_type="application/json"
+        )
+        search = self.client.get(
+            '/api/stories/search', {"q": "test", "fields": "id"}
+        )
+        trending = self.client.get('/api/stories/trending', {"fields": "id"})
+
+        self.assertJSONEqual(
+            batch.content,
+            {"stories": [{"id": self.story.id}], "missing": ["nonexistent"]}
+        )
+        self.assertJSONEqual(
+            search.content,
+            {"stories": [{"id": self.story.id}], "next": None}
+        )
+        self.assertJSONEqual(trending.content, {"stories": []})
+
+    def test_fields_fail_unknown_or_empty(self):
+        unknown = self.client.get('/api/stories/', {"fields": "id,secret"})
+        empty = self.client.get('/api/stories/', {"fields": ","})
+
+        self.assertEqual(unknown.status_code, 400)
+        self.assertEqual(
+            json.loads(unknown.content)["detail"],
+            "Unknown fields: secret. Valid fields are: username, id, title, "
+            "author, url, favorite_count, created, modified."
+        )
+        self.assertEqual(empty.status_code, 400)
+        self.assertTrue(
+            json.loads(empty.content)["detail"].startswith(
+                "No fields requested."
+            )
+        )
+
+
+class APIStoriesIsFavoritedTestCase(TestCase):
+    """Test "is_favorited" on story lists for a logged-in client."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.poster = UserFactory(username="poster")
+        cls.user_token = generate_token(cls.user.username)
+
+        cls.favorited = StoryFactory(user=cls.poster, title="favorited")
+        cls.not_favorited = StoryFactory(user=cls.poster, title="other")
+        cls.user.favorites.add(cls.favorited)
+
+    def setUp(self):
+        feed_cache().clear()
+        user_cache.clear()
+
+    def get_flags(self, url, params=None, token=None):
+        headers = {AUTH_KEY: token} if token else {}
+        response = self.client.get(url, params or {}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+
+        return {
+            story["id"]: story.get("is_favorited")
+            for story in json.loads(response.content)["stories"]
+        }
+
+    def test_get_stories_flags_favorites_with_token(self):
+        flags = self.get_flags('/api/stories/', token=self.user_token)
+
+        self.assertEqual(
+            flags,
+            {self.favorited.id: True, self.not_favorited.id: False}
+        )
+
+    def test_get_stories_no_flags_without_valid_token(self):
+        for token in (None, INVALID_TOKEN_VALUE):
+            flags = self.get_flags('/api/stories/', token=token)
+
+            self.assertEqual(set(flags.values()), {None})
+
+    def test_get_stories_flags_kept_with_fields(self):
+        response = self.client.get(
+            '/api/stories/',
+            {"fields": "id"},
+            headers={AUTH_KEY: self.user_token}
+        )
+
+        self.assertEqual(
+            set(json.loads(response.content)["stories"][0]),
+            {"id", "is_favorited"}
+        )
+
+    def test_get_stories_flagged_pages_not_shared(self):
+        self.get_flags('/api/stories/', token=self.user_token)
+        self.assertEqual(set(self.get_flags('/api/stories/').values()), {None})
+
+        flags = self.get_flags('/api/stories/', token=self.user_token)
+        self.assertEqual(flags[self.favorited.id], True)
+
+    def test_get_stories_etag_and_vary_per_user(self):
+        anonymous = self.client.get('/api/stories/')
+        logged_in = self.client.get(
+            '/api/stories/',
+            headers={AUTH_KEY: self.user_token}
+        )
+
+        self.assertNotEqual(anonymous["ETag"], logged_in["ETag"])
+        self.assertIn(AUTH_KEY, logged_in["Vary"])
+        self.assertIn(AUTH_KEY, anonymous["Vary"])
+
+    def test_get_stories_favorite_toggle_changes_etag(self):
+        response = self.client.get(
+            '/api/stories/',
+            headers={AUTH_KEY: self.user_token}
+        )
+
+        self.client.post(
+            f'/api/favorites/user/{self.not_favorited.id}/favorite',
+            headers={AUTH_KEY: self.user_token},
+        )
+
+        response = self.client.get(
+            '/api/stories/',
+            headers={
+                AUTH_KEY: self.user_token,
+                "If-None-Match": response["ETag"],
+            }
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+        stories = json.loads(response.content)["stories"]
+        self.assertTrue(all(story["is_favorited"] for story in stories))
+
+    def test_get_stories_query_count_with_token(self):
+        for _ in range(10):
+            self.user.favorites.add(StoryFactory(user=self.poster))
+
+        # auth, feed validators, page (flags included)
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                '/api/stories/',
+                {"limit": 100},
+                headers={AUTH_KEY: self.user_token}
+            )
+
+        self.assertEqual(len(json.loads(response.content)["stories"]), 12)
+
+    def test_search_and_trending_flag_favorites_with_token(self):
+        recompute_trending(full=True)
+
+        for url, params in (
+            ('/api/stories/search', {"q": "favorited"}),
+            ('/api/stories/trending', {}),
+        ):
+            flags = self.get_flags(url, params, token=self.user_token)
+
+            self.assertEqual(flags[self.favorited.id], True)
+
+
+class APIStoriesBatchTestCase(TestCase):
+    """Test GET/POST /stories/batch endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.stories = [StoryFactory() for _ in range(3)]
+
+    def test_get_batch_returns_request_order_and_missing(self):
+        ids = [
+            self.stories[2].id,
+            "nonexistent-id",
+            self.stories[0].id,
+        ]
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/stories/batch', {"ids": ids})
+
+        self.assertEqual(response.status_code, 200)
+        response_json = json.loads(response.content)
+        self.assertEqual(
+            [story["id"] for story in response_json["stories"]],
+            [self.stories[2].id, self.stories[0].id]
+        )
+        self.assertEqual(response_json["missing"], ["nonexistent-id"])
+
+    def test_get_batch_comma_separated_ids(self):
+        ids = f"{self.stories[1].id},{self.stories[0].id}"
+
+        response = self.client.get('/api/stories/batch', {"ids": ids})
+
+        response_json = json.loads(response.content)
+        self.assertEqual(
+            [story["id"] for story in response_json["stories"]],
+            [self.stories[1].id, self.stories[0].id]
+        )
+
+    def test_get_batch_duplicate_ids_returned_once(self):
+        ids = [self.stories[0].id, self.stories[0].id]
+
+        response = self.client.get('/api/stories/batch', {"ids": ids})
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["stories"]), 1)
+
+    def test_get_batch_fail_too_many_ids(self):
+        with self.settings(STORIES_BATCH_MAX_IDS=2):
+            response = self.client.get(
+                '/api/stories/batch',
+                {"ids": [story.id for story in self.stories]}
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Too many IDs. Max is 2."}
+        )
+
+    def test_post_batch_ok(self):
+        ids = [self.stories[1].id, "nonexistent-id"]
+
+        response = self.client.post(
+            '/api/stories/batch',
+            data=json.dumps({"ids": ids}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        response_json = json.loads(response.content)
+        self.assertEqual(
+            [story["id"] for story in response_json["stories"]],
+            [self.stories[1].id]
+        )
+        self.assertEqual(response_json["missing"], ["nonexistent-id"])
+
+    def test_post_batch_fail_too_many_ids(self):
+        with self.settings(STORIES_BATCH_MAX_IDS=2):
+            response = self.client.post(
+                '/api/stories/batch',
+                data=json.dumps({"ids": ["a", "b", "c"]}),
+                content_type="application/json"
+            )
+
+        self.assertEqual(response.status_code, 400)
+
+
 class APIStoriesDELETETestCase(TestCase):
     """Test DELETE /stories endpoint."""
 
@@ -553,6 +1605,42 @@ class APIStoriesDELETETestCase(TestCase):
             response.content,
             {"detail": "Unauthorized."}
         )
+        self.assertTrue(Story.objects.filter(id=self.story_1.id).exists())
+
+    def test_delete_story_removes_favorites_and_trending_rows(self):
+        self.user_2.favorites.add(self.story_1)
+        recompute_trending(full=True)
+
+        response = self.client.delete(
+            f'/api/stories/{self.story_1.id}',
+            headers={AUTH_KEY: self.user_token},
+            content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Story.objects.filter(id=self.story_1.id).exists())
+        self.assertFalse(self.user_2.favorites.exists())
+        self.assertFalse(TrendingStory.objects.exists())
+
+    def test_story_cascades_match_orm_delete(self):
+        # The single-statement delete on PostgreSQL must take every row the
+        # ORM's delete() would:
+        self.user_2.favorites.add(self.story_1)
+        recompute_trending(full=True)
+
+        collector = Collector(using="default")
+        collector.collect([self.story_1])
+        orm_models = set(collector.data) | {
+            queryset.model for queryset in collector.fast_deletes
+        }
+
+        cascades = story_cascades()
+
+        self.assertIsNotNone(cascades)
+        self.assertEqual(
+            {Story} | {model for model, _ in cascades},
+            orm_models
+        )
 
     def test_delete_story_fails_not_found(self):
         response = self.client.delete(
@@ -569,6 +1657,69 @@ class APIStoriesDELETETestCase(TestCase):
             }
         )
 
+
+class APIStoriesAsyncClientTestCase(TestCase):
+    """Test the (async) story routes driven from an event loop, as under
+    ASGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_token = generate_token(cls.user.username)
+
+    def setUp(self):
+        user_cache.clear()
+        feed_cache().clear()
+
+    async def test_create_read_delete_story(self):
+        response = await self.async_client.post(
+            '/api/stories/',
+            data=json.dumps({
+                "author": "async_author",
+                "title": "async_title",
+                "url": "http://async.com",
+            }),
+            content_type="application/json",
+            headers={AUTH_KEY: self.user_token},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        story_id = response.json()["story"]["id"]
+
+        response = await self.async_client.get('/api/stories/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [story["id"] for story in response.json()["stories"]],
+            [story_id]
+        )
+
+        response = await self.async_client.get(f'/api/stories/{story_id}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["story"]["title"], "async_title")
+
+        response = await self.async_client.delete(
+            f'/api/stories/{story_id}',
+            headers={AUTH_KEY: self.user_token},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(await Story.objects.filter(id=story_id).aexists())
+
+    async def test_unauthorized_without_token(self):
+        response = await self.async_client.post(
+            '/api/stories/',
+            data=json.dumps({
+                "author": "async_author",
+                "title": "async_title",
+                "url": "http://async.com",
+            }),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 401)
+
 # POST /
 # works ok w/ user token ✅
 # works ok w/ staff token ✅
@@ -581,12 +1732,65 @@ class APIStoriesDELETETestCase(TestCase):
 # 422 no data✅
 # 422 data wrong type✅
 
+# POST /bulk
+# works ok, single insert✅
+# all-or-nothing rejects batch with per-item errors✅
+# best-effort creates valid items✅
+# 400 batch too large✅
+# invalidates feed cache✅
+# 401 unauthorized if no token (authentication)✅
+
 # GET /
 # works ok✅
+# pages through all stories newest first✅
+# last page has no next cursor✅
+# limit capped at max✅
+# legacy mode returns all stories✅
+# 400 invalid cursor✅
+# 422 limit below one✅
+# constant query count however many stories✅
+# cache hit skips database✅
+# create/delete/edit invalidate cache✅
+# 304 on matching If-None-Match, per page✅
+# gzip variant cached with the page, compressed once✅
 
 # GET /{story_id}
 # works ok✅
 # 404 if user not found✅
+# 304 on matching If-None-Match/If-Modified-Since✅
+
+# GET /search
+# matches title and author, best match first✅
+# every term required✅
+# paginates✅
+# 422 missing query, 400 invalid cursor✅
+
+# GET /trending
+# empty before first recompute✅
+# ranks favorites decayed by age✅
+# limit, top K✅
+# incremental recompute scores touched + ranked stories only✅
+
+# ?fields= (GET /, /{story_id}, /search, /trending, /batch)
+# returns only named fields, omitted columns not loaded✅
+# feed cached per fieldset, ETag per fieldset✅
+# 400 unknown or empty fields✅
+
+# is_favorited (GET /, /search, /trending)
+# flags favorites with a valid token, absent without one✅
+# kept with ?fields=✅
+# flagged pages not cached, ETag and Vary per user✅
+# favorite toggle changes ETag✅
+# one extra query (auth), however many favorites✅
+
+# GET/POST /batch
+# works ok, request order, missing listed✅
+# comma-separated and duplicate ids✅
+# 400 too many ids✅
+
+# async client (as under ASGI)
+# create, read feed and story, delete✅
+# 401 without token✅
 
 # DELETE /stores/{story_id}
 # works ok w/ user token✅
@@ -597,3 +1801,4 @@ class APIStoriesDELETETestCase(TestCase):
 # 401 unauthorized if different non-staff user's token (authorization)✅
 # OTHER TESTS:
 # 404 if story_id not found✅
+# favorites and trending rows deleted with the story✅
@@ -1,6 +1,12 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
+from favorites.models import Favorite
 from stories.factories import StoryFactory
+from stories.models import Story
+from users.factories import UserFactory
 
 
 class StoryModelTestCase(TestCase):
@@ -16,3 +22,103 @@ class StoryModelTestCase(TestCase):
         self.test_story = StoryFactory()
 
         self.assertEqual(str(self.test_story), self.test_story.title)
+
+
+class StoryFavoriteCountTestCase(TestCase):
+    """Test that Story.favorite_count follows every kind of favorites edit."""
+
+    def setUp(self):
+        self.poster = UserFactory(username="poster")
+        self.user = UserFactory(username="user")
+        self.user_2 = UserFactory(username="user2")
+
+        self.story = StoryFactory(user=self.poster)
+        self.story_2 = StoryFactory(user=self.poster)
+
+    def assertFavoriteCounts(self, story_count, story_2_count):
+        self.story.refresh_from_db()
+        self.story_2.refresh_from_db()
+
+        self.assertEqual(self.story.favorite_count, story_count)
+        self.assertEqual(self.story_2.favorite_count, story_2_count)
+
+    def test_add_and_remove_from_user(self):
+        self.user.favorites.add(self.story, self.story_2)
+        self.user_2.favorites.add(self.story)
+        self.assertFavoriteCounts(2, 1)
+
+        self.user.favorites.remove(self.story)
+        self.assertFavoriteCounts(1, 1)
+
+    def test_add_existing_favorite_is_not_counted_twice(self):
+        self.user.favorites.add(self.story)
+        self.user.favorites.add(self.story)
+
+        self.assertFavoriteCounts(1, 0)
+
+    def test_remove_missing_favorite_is_not_counted(self):
+        self.user.favorites.add(self.story)
+        self.user.favorites.remove(self.story_2)
+
+        self.assertFavoriteCounts(1, 0)
+
+    def test_set_and_clear_from_user(self):
+        """set() is what admin form saves use."""
+
+        self.user.favorites.set([self.story])
+        self.user.favorites.set([self.story_2])
+        self.assertFavoriteCounts(0, 1)
+
+        self.user.favorites.clear()
+        self.assertFavoriteCounts(0, 0)
+
+    def test_add_remove_and_clear_from_story(self):
+        self.story.favorited_by.add(self.user, self.user_2)
+        self.assertFavoriteCounts(2, 0)
+
+        self.story.favorited_by.remove(self.user, self.poster)
+        self.assertFavoriteCounts(1, 0)
+
+        self.story.favorited_by.clear()
+        self.assertFavoriteCounts(0, 0)
+
+    def test_deleting_user_releases_their_favorites(self):
+        self.user.favorites.add(self.story, self.story_2)
+        self.user_2.favorites.add(self.story)
+
+        self.user.delete()
+
+        self.assertFavoriteCounts(1, 0)
+
+    def test_create_move_and_delete_favorite_rows(self):
+        """Favorite rows edited directly, as admin inlines do."""
+
+        favorite = Favorite.objects.create(user=self.user, story=self.story)
+        self.assertFavoriteCounts(1, 0)
+
+        favorite.story = self.story_2
+        favorite.save()
+        self.assertFavoriteCounts(0, 1)
+
+        favorite.delete()
+        self.assertFavoriteCounts(0, 0)
+
+    def test_deleting_story_keeps_other_counts(self):
+        self.user.favorites.add(self.story, self.story_2)
+
+        self.story.delete()
+
+        self.story_2.refresh_from_db()
+        self.assertEqual(self.story_2.favorite_count, 1)
+
+    def test_rebuild_favorite_counts_fixes_drift(self):
+        self.user.favorites.add(self.story)
+        self.user_2.favorites.add(self.story)
+        Story.objects.filter(id=self.story.id).update(favorite_count=7)
+        Story.objects.filter(id=self.story_2.id).update(favorite_count=3)
+
+        out = StringIO()
+        call_command("rebuild_favorite_counts", chunk_size=1, stdout=out)
+
+        self.assertFavoriteCounts(2, 0)
+        self.assertIn("Checked 2 stories, fixed 2.", out.getvalue())
@@ -0,0 +1,47 @@
+from unittest import mock, skipIf
+
+from django.test import SimpleTestCase
+
+from stories import trending
+from stories.trending import score_stories, top_scores
+
+NOW = 1_600_000_000.0
+HOUR = 3600.0
+
+
+class TrendingScoreTestCase(SimpleTestCase):
+    """Test trending scoring, with and without NumPy."""
+
+    created = [NOW - 24 * HOUR, NOW - 2 * HOUR, NOW, NOW + HOUR]
+    favorite_counts = [10, 2, 0, 1]
+
+    def ranked(self, k):
+        scores = score_stories(self.created, self.favorite_counts, NOW, 1.8)
+        return top_scores(["old", "fresh", "none", "future"], scores, k)
+
+    def test_scores_decay_with_age(self):
+        with mock.patch.object(trending, "np", None):
+            ranked = self.ranked(k=4)
+
+        # a future timestamp (clock skew) counts as brand new:
+        self.assertEqual(
+            [id for id, score in ranked],
+            ["future", "fresh", "old", "none"]
+        )
+        self.assertAlmostEqual(ranked[1][1], 2 / 4 ** 1.8)
+        self.assertAlmostEqual(ranked[2][1], 10 / 26 ** 1.8)
+
+    @skipIf(trending.np is None, "NumPy is not installed")
+    def test_numpy_matches_pure_python(self):
+        for k in (1, 2, 4, 10):
+            with mock.patch.object(trending, "np", None):
+                expected = self.ranked(k)
+
+            ranked = self.ranked(k)
+
+            self.assertEqual(
+                [id for id, score in ranked],
+                [id for id, score in expected]
+            )
+            for (_, score), (_, expected_score) in zip(ranked, expected):
+                self.assertAlmostEqual(score, expected_score)
@@ -0,0 +1,122 @@
+import heapq
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from favorites.models import Favorite
+
+from .models import Story, TrendingStory
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+###############################################################################
+# Trending stories
+#
+# Stories are scored HN-style: favorites decay with age,
+#
+#     score = favorite_count / (age_in_hours + 2) ** gravity
+#
+# GET /stories/trending reads the TrendingStory table, which holds the top K
+# stories and is rewritten by recompute_trending() (run it periodically with
+# `manage.py recompute_trending`). Scoring runs over plain arrays, with NumPy
+# when it is installed and in pure Python otherwise.
+#
+# A full recompute scores every favorited story. An incremental one scores
+# only the stories favorited since the last run, plus the current top K
+# (unfavoriting only lowers a score, which matters only inside the top K).
+# Untouched stories only decay, but they don't all decay at the same rate, so
+# an incremental run can miss an older untouched story overtaking a newer
+# one, or a count repaired by rebuild_favorite_counts; schedule occasional
+# full runs.
+
+def score_stories(created, favorite_counts, now, gravity):
+    """
+    Return trending scores for parallel sequences of created timestamps
+    (POSIX seconds) and favorite counts, as of now (POSIX seconds).
+    """
+
+    if np is None:
+        return [
+            count / ((max(now - ts, 0) / 3600 + 2) ** gravity)
+            for ts, count in zip(created, favorite_counts)
+        ]
+
+    created = np.asarray(created, dtype=np.float64)
+    favorite_counts = np.asarray(favorite_counts, dtype=np.float64)
+    age_hours = np.maximum(now - created, 0) / 3600
+
+    return favorite_counts / np.power(age_hours + 2, gravity)
+
+
+def top_scores(ids, scores, k):
+    """Return [(id, score), ...] for the k highest scores, best first."""
+
+    if np is None:
+        best = heapq.nlargest(k, range(len(ids)), key=scores.__getitem__)
+        return [(ids[i], scores[i]) for i in best]
+
+    if k < len(scores):
+        # Partial sort: only the top k need ordering
+        best = np.argpartition(-scores, k)[:k]
+    else:
+        best = np.arange(len(scores))
+
+    best = best[np.argsort(-scores[best], kind="stable")]
+
+    return [(ids[i], float(scores[i])) for i in best]
+
+
+def recompute_trending(full=False, top_k=None, gravity=None, now=None):
+    """
+    Rescore stories and rewrite the trending table with the top K.
+
+    Runs incrementally (see above) unless full is true or the table is empty.
+    Returns (stories scored, rows written).
+    """
+
+    top_k = settings.STORIES_TRENDING_TOP_K if top_k is None else top_k
+    gravity = (
+        settings.STORIES_TRENDING_GRAVITY if gravity is None else gravity
+    )
+    now = timezone.now() if now is None else now
+
+    last_run = TrendingStory.objects.aggregate(last=Max("computed"))["last"]
+
+    stories = Story.objects.filter(favorite_count__gt=0)
+
+    if not full and last_run is not None:
+        favorited = Favorite.objects.filter(
+            created__gte=last_run
+        ).values("story_id")
+        stories = stories.filter(
+            Q(id__in=favorited) | Q(trending__isnull=False)
+        )
+
+    ids = []
+    created = []
+    favorite_counts = []
+
+    for id, created_at, favorite_count in stories.values_list(
+        "id", "created", "favorite_count"
+    ).iterator(chunk_size=10_000):
+        ids.append(id)
+        created.append(created_at.timestamp())
+        favorite_counts.append(favorite_count)
+
+    scores = score_stories(created, favorite_counts, now.timestamp(), gravity)
+    ranked = top_scores(ids, scores, top_k)
+
+    with transaction.atomic():
+        TrendingStory.objects.all().delete()
+        TrendingStory.objects.bulk_create(
+            TrendingStory(story_id=id, rank=rank, score=score, computed=now)
+            for rank, (id, score) in enumerate(ranked, start=1)
+        )
+
+    return len(ids), len(ranked)
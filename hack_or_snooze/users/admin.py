@@ -1,6 +1,17 @@
 from django.contrib import admin
 
+from favorites.admin import FavoriteInline
+from hack_or_snooze.replicas import ReplicaChangelistAdmin
+
 from .models import User
 
+
+class UserAdmin(ReplicaChangelistAdmin):
+    """User admin, with the user's favorites inline (the favorites field
+    itself has a through model, so the form leaves it out)."""
+
+    inlines = [FavoriteInline]
+
+
 # Register your models here.
-admin.site.register(User)
\ No newline at end of file
+admin.site.register(User, UserAdmin)
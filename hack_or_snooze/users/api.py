@@ -1,19 +1,40 @@
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.shortcuts import get_object_or_404
-from django.db import transaction
-from django.contrib.auth import authenticate
+from django.shortcuts import aget_object_or_404
+from django.http import HttpResponse
 
-from ninja import Router
+from ninja import Router, Query
 
 from hack_or_snooze.error_schemas import (
     BadRequest,
     Unauthorized,
     ObjectNotFound,
+    ServiceUnavailable,
+)
+from hack_or_snooze.pagination import apaginate_keyset
+from hack_or_snooze.replicas import pin_token_to_primary, reads_from_replica
+from hack_or_snooze.fieldsets import (
+    parse_fields,
+    narrow_schema,
+    schema_response,
+)
+from hack_or_snooze.conditional import (
+    make_etag,
+    set_validators,
+    not_modified_response,
 )
+from stories.cache import favorite_counts_version
 from stories.models import Story
+from stories.queries import only_story_fields
+from stories.schemas import StoryGetAllOutput, StorySchema
 
 from .schemas import (
+    UserSchema,
     UserOutput,
+    UserPayloadLimits,
+    UserFavoritesOutput,
     UserPatchInput,
     SignupInput,
     LoginInput,
@@ -21,6 +42,14 @@ from .schemas import (
 )
 from .models import User
 from .auth_utils import AUTH_KEY, token_header, generate_token
+from .hashing import ahash_password, aauthenticate_user
+from .queries import (
+    favorites_by_recency,
+    user_payload_queryset,
+    ainsert_user,
+    aprefetch_user_payload,
+    auser_payload_validators,
+)
 
 router = Router()
 
@@ -29,9 +58,9 @@ router = Router()
 
 @router.post(
     '/signup',
-    response={201: AuthOutput, 400: BadRequest}
+    response={201: AuthOutput, 400: BadRequest, 503: ServiceUnavailable}
 )
-def signup(request, data: SignupInput):
+async def signup(request, data: SignupInput, response: HttpResponse):
     """
     Handles user signup. User must send:
 
@@ -62,20 +91,35 @@ def signup(request, data: SignupInput):
             "detail": "Username already exists."
         }
 
+    On failure when the server is too busy hashing passwords, returns error
+    JSON with status 503 and a Retry-After header:
+
+        {
+            "detail": "Server busy. Try again shortly."
+        }
+
+    Responses report the password hash's queueing and run time in a
+    Server-Timing header.
+
     **Authentication: none**
     """
-    if User.objects.filter(username=data.username).exists():
+    # Like User.objects.create_user(), with the password hashed on the
+    # hashing pool and duplicates caught by the INSERT itself:
+    user = await ainsert_user(
+        username=User.normalize_username(data.username),
+        first_name=data.first_name,
+        last_name=data.last_name,
+        password=await ahash_password(data.password, response)
+    )
+
+    if user is None:
         return 400, {"detail": "Username already exists."}
 
-    with transaction.atomic():
-        user = User.objects.create_user(
-            username=data.username,
-            first_name=data.first_name,
-            last_name=data.last_name,
-            password=data.password
-        )
+    await aprefetch_user_payload(user)
 
     token = generate_token(user.username)
+    # The new user must be readable with the new token right away:
+    pin_token_to_primary(token)
 
     return 201, {
         AUTH_KEY: token,
@@ -85,9 +129,14 @@ def signup(request, data: SignupInput):
 
 @router.post(
     '/login',
-    response={200: AuthOutput, 401: Unauthorized}
+    response={200: AuthOutput, 401: Unauthorized, 503: ServiceUnavailable}
 )
-def login(request, data: LoginInput):
+async def login(
+    request,
+    data: LoginInput,
+    limits: Query[UserPayloadLimits],
+    response: HttpResponse,
+):
     """
     Handles user login. User must send:
 
@@ -116,15 +165,34 @@ def login(request, data: LoginInput):
             "detail": "Invalid credentials."
         }
 
+    Optional query parameters **stories_limit** and **favorites_limit** keep
+    only the newest N nested stories/favorites. Page through the rest with
+    GET /users/{username}/stories and GET /users/{username}/favorites.
+
+    On failure when the server is too busy hashing passwords, returns error
+    JSON with status 503 and a Retry-After header:
+
+        {
+            "detail": "Server busy. Try again shortly."
+        }
+
+    Responses report the password hash's queueing and run time in a
+    Server-Timing header.
+
     **Authentication: none**
     """
 
-    user = authenticate(username=data.username, password=data.password)
+    user = await aauthenticate_user(data.username, data.password, response)
 
     if user is None:
         return 401, {"detail": "Invalid credentials."}
 
+    await aprefetch_user_payload(user, **limits.dict())
+
     token = generate_token(user.username)
+    # Logging in may save a rehashed password, and a client that just signed
+    # up elsewhere may not be replicated yet; read from the primary for now:
+    pin_token_to_primary(token)
 
     return {
         AUTH_KEY: token,
@@ -136,10 +204,22 @@ def login(request, data: LoginInput):
 
 @router.get(
     '/{str:username}',
-    response={200: UserOutput, 401: Unauthorized},
+    response={
+        200: UserOutput,
+        400: BadRequest,
+        401: Unauthorized,
+        404: ObjectNotFound
+    },
     auth=token_header
 )
-def get_user(request, username: str):
+@reads_from_replica
+async def get_user(
+    request,
+    username: str,
+    limits: Query[UserPayloadLimits],
+    fields: str = None,
+    story_fields: str = None,
+):
     """
     Get information about a single user.
 
@@ -156,6 +236,22 @@ def get_user(request, username: str):
             }
         }
 
+    Optional query parameters **stories_limit** and **favorites_limit** keep
+    only the newest N nested stories/favorites. Page through the rest with
+    GET /users/{username}/stories and GET /users/{username}/favorites.
+
+    Optional query parameters **fields** and **story_fields** return only
+    the named user fields (eg. `fields=username,favorites`) and nested story
+    fields (eg. `story_fields=id,title,url`). Collections left out of
+    **fields** are not loaded at all.
+
+    Responses carry an ETag covering the user, their stories and their
+    favorites. Send it back in If-None-Match to get an empty 304 Not Modified
+    while none of those have changed.
+
+    May be served from a read replica, except for a client that wrote in the
+    last few seconds.
+
     **Authentication: token**
 
     **Authorization: same user or admin**
@@ -166,17 +262,81 @@ def get_user(request, username: str):
     if username != curr_user.username and curr_user.is_staff is not True:
         return 401, {"detail": "Unauthorized"}
 
-    user = get_object_or_404(User, username=username)
+    user_fields = parse_fields(fields, UserSchema)
+    nested_story_fields = parse_fields(story_fields, StorySchema)
+
+    validators = await auser_payload_validators(username)
+
+    if validators is None:
+        return 404, {"detail": "Not Found"}
+
+    # Favorite toggles don't move "modified", so nested stories showing
+    # favorite_count also depend on the counts version:
+    if nested_story_fields is None or "favorite_count" in nested_story_fields:
+        counts_version = favorite_counts_version()
+    else:
+        counts_version = None
+
+    etag = make_etag(
+        username,
+        validators,
+        counts_version,
+        limits.dict(),
+        user_fields,
+        nested_story_fields
+    )
+
+    conditional_response = not_modified_response(request, etag)
+    if conditional_response is not None:
+        return conditional_response
+
+    user = await aget_object_or_404(
+        user_payload_queryset(
+            username,
+            **limits.dict(),
+            fields=user_fields,
+            story_fields=nested_story_fields
+        )
+    )
 
-    return {"user": user}
+    story_schema = narrow_schema(StorySchema, nested_story_fields)
+    output_schema = narrow_schema(
+        UserOutput,
+        user=narrow_schema(
+            UserSchema,
+            user_fields,
+            stories=story_schema,
+            favorites=story_schema
+        ),
+    )
+
+    response = schema_response(
+        request,
+        router.api,
+        output_schema,
+        {"user": user}
+    )
+
+    return set_validators(response, etag)
 
 
 @router.patch(
     '/{str:username}',
-    response={200: UserOutput, 400: BadRequest, 401: Unauthorized},
+    response={
+        200: UserOutput,
+        400: BadRequest,
+        401: Unauthorized,
+        503: ServiceUnavailable
+    },
     auth=token_header
 )
-def update_user(request, username: str, data: UserPatchInput):
+async def update_user(
+    request,
+    username: str,
+    data: UserPatchInput,
+    limits: Query[UserPayloadLimits],
+    response: HttpResponse,
+):
     """
     Update a single user.
 
@@ -193,6 +353,12 @@ def update_user(request, username: str, data: UserPatchInput):
             }
         }
 
+    Optional query parameters **stories_limit** and **favorites_limit** keep
+    only the newest N nested stories/favorites. Page through the rest with
+    GET /users/{username}/stories and GET /users/{username}/favorites.
+
+    Changing the password can fail with a 503, as for POST /users/signup.
+
     **Authentication: token**
 
     **Authorization: same user or admin**
@@ -206,13 +372,160 @@ def update_user(request, username: str, data: UserPatchInput):
     # automatically by Django Ninja because the field was not provided
     patch_data = data.dict(exclude_none=True)
 
-    user = get_object_or_404(User, username=username)
+    user = await aget_object_or_404(
+        user_payload_queryset(username, **limits.dict())
+    )
 
-    updated_user = user.update(patch_data)
+    # Hash a new password on the hashing pool rather than in update():
+    if "password" in patch_data:
+        user.password = await ahash_password(
+            patch_data.pop("password"),
+            response
+        )
+
+    updated_user = await sync_to_async(user.update)(patch_data)
 
     return {"user": updated_user}
 
 
+@router.get(
+    '/{str:username}/stories',
+    response={
+        200: StoryGetAllOutput,
+        400: BadRequest,
+        401: Unauthorized,
+        404: ObjectNotFound
+    },
+    auth=token_header
+)
+async def get_user_stories(
+    request,
+    username: str,
+    limit: int = Query(settings.PAGINATION_DEFAULT_LIMIT, ge=1),
+    cursor: str = None,
+    fields: str = None,
+):
+    """
+    Get the stories a user posted, newest first, one page at a time.
+
+    On success, returns a page of stories and a cursor for the next page:
+
+        {
+            "stories": [Story, Story...],
+            "next": "WyIyMDIwLTAxLTAxVDAwOjAwOjAwKzAwOjAwIiwgIjcyNWZmMmY5Il0="
+        }
+
+    Takes the same **limit**, **cursor** and **fields** query parameters as
+    GET /stories.
+
+    **Authentication: token**
+
+    **Authorization: same user or admin**
+    """
+
+    curr_user = request.auth
+
+    if username != curr_user.username and curr_user.is_staff is not True:
+        return 401, {"detail": "Unauthorized"}
+
+    story_fields = parse_fields(fields, StorySchema)
+
+    limit = min(limit, settings.PAGINATION_MAX_LIMIT)
+    page, next_cursor = await apaginate_keyset(
+        only_story_fields(
+            Story.objects.filter(user_id=username),
+            story_fields,
+            "created",
+            "id"
+        ),
+        limit,
+        cursor
+    )
+
+    # Only an empty page needs the extra query to tell "no stories" apart
+    # from "no such user" (a cursor may be valid for any username):
+    if not page and not await User.objects.filter(
+            username=username).aexists():
+        return 404, {"detail": "User not found."}
+
+    return schema_response(
+        request,
+        router.api,
+        narrow_schema(
+            StoryGetAllOutput,
+            stories=narrow_schema(StorySchema, story_fields),
+        ),
+        {"stories": page, "next": next_cursor}
+    )
+
+
+@router.get(
+    '/{str:username}/favorites',
+    response={
+        200: UserFavoritesOutput,
+        400: BadRequest,
+        401: Unauthorized,
+        404: ObjectNotFound
+    },
+    auth=token_header
+)
+async def get_user_favorites(
+    request,
+    username: str,
+    limit: int = Query(settings.PAGINATION_DEFAULT_LIMIT, ge=1),
+    cursor: str = None,
+    fields: str = None,
+):
+    """
+    Get a user's favorite stories, most recently favorited first, one page at
+    a time.
+
+    On success, returns a page of stories and a cursor for the next page:
+
+        {
+            "favorites": [Story, Story...],
+            "next": "WyIyMDIwLTAxLTAxVDAwOjAwOjAwKzAwOjAwIiwgIjcyNWZmMmY5Il0="
+        }
+
+    Takes the same **limit**, **cursor** and **fields** query parameters as
+    GET /stories.
+
+    **Authentication: token**
+
+    **Authorization: same user or admin**
+    """
+
+    curr_user = request.auth
+
+    if username != curr_user.username and curr_user.is_staff is not True:
+        return 401, {"detail": "Unauthorized"}
+
+    story_fields = parse_fields(fields, StorySchema)
+
+    limit = min(limit, settings.PAGINATION_MAX_LIMIT)
+    page, next_cursor = await apaginate_keyset(
+        only_story_fields(favorites_by_recency(username), story_fields),
+        limit,
+        cursor,
+        created_field="favorited",
+        pk_field="favorite_id",
+    )
+
+    if not page and not await User.objects.filter(
+            username=username).aexists():
+        return 404, {"detail": "User not found."}
+
+    return schema_response(
+        request,
+        router.api,
+        narrow_schema(
+            UserFavoritesOutput,
+            favorites=narrow_schema(StorySchema, story_fields),
+        ),
+        {"favorites": page, "next": next_cursor}
+    )
+
+
 ######## FAVORITES ############################################################
 
 # @router.post(
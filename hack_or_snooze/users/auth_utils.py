@@ -1,5 +1,10 @@
+import time
+import threading
+
 from hashlib import md5
+from collections import OrderedDict
 
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
 
 from ninja.security import APIKeyHeader
@@ -8,13 +13,17 @@ from .models import User
 
 AUTH_KEY = "token"
 
+# The only User columns routes read off request.auth; everything else is
+# deferred so a cache miss stays a narrow primary key lookup:
+AUTH_USER_FIELDS = ("username", "is_staff")
+
 
 class ApiKey(APIKeyHeader):
     """Class to provide authentication via token in header."""
 
     param_name = AUTH_KEY
 
-    def authenticate(self, request, token):
+    async def authenticate(self, request, token):
         """
         Parse token submission and check validity.
 
@@ -25,25 +34,146 @@ class ApiKey(APIKeyHeader):
 
         On failure, returns None. Error message JSON is automatically generated:
             {"detail": "Unauthorized"}
+
+        Verified users are kept in user_cache, so a repeat token skips both
+        the hash check and the database. Every route is async, so on a cache
+        miss the user is looked up with the async ORM, which doesn't tie up
+        the event loop.
         """
 
+        user = user_cache.get(token)
+
+        if user is not None:
+            return user
+
         if not check_token(token):
             return None
 
         username = token.split(":")[0]
 
         try:
-            user = User.objects.get(username=username)
+            user = await User.objects.only(*AUTH_USER_FIELDS).aget(
+                username=username
+            )
         except ObjectDoesNotExist:
             return None
 
+        user_cache.set(token, user)
+
         return user
 
 
-# Instantiate token_header to use in API routes:
+class AuthUserCache:
+    """
+    Bounded, per-process LRU cache of verified token -> user snapshot.
+
+    Entries expire ttl seconds after they were stored. Once maxsize entries
+    are held, storing another evicts the least recently used one.
+
+    Snapshots are shared between requests and must be treated as read-only.
+    Entries are invalidated by username (see users/signals.py) whenever a user
+    is saved, which covers User.update and staff flag changes, or deleted.
+    Queryset .update()/.delete() bypass those signals; call invalidate() or
+    clear() after using them on users.
+    """
+
+    def __init__(self, maxsize, ttl, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Return the cached user for token, or None on a miss."""
+
+        with self._lock:
+            entry = self._entries.get(token)
+
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self._entries[token]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, token, user):
+        """Store user under token, evicting the least recently used entry if
+        the cache is full."""
+
+        if self.maxsize <= 0:
+            return
+
+        with self._lock:
+            self._entries[token] = (self.clock() + self.ttl, user)
+            self._entries.move_to_end(token)
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, username):
+        """Drop the entry for username, if any."""
+
+        with self._lock:
+            self._entries.pop(generate_token(username), None)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        Return counters for sizing the cache.
+
+        EX: {"hits": 90, "misses": 10, "size": 10, "maxsize": 10000}
+        """
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+# Instantiate user_cache and token_header to use in API routes:
+user_cache = AuthUserCache(
+    maxsize=settings.AUTH_USER_CACHE_MAXSIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL,
+)
+
 token_header = ApiKey()
 
 
+async def arequest_user(request):
+    """
+    Return the user authenticated by request's token header, or None if it
+    has no token or an invalid one.
+
+    For public routes that add per-user data for a logged-in client; routes
+    that require a user use auth=token_header instead.
+    """
+
+    token = request.headers.get(AUTH_KEY)
+
+    if not token:
+        return None
+
+    return await token_header.authenticate(request, token)
+
+
 ###############################################################################
 # Helper functions to generate and validate tokens
 
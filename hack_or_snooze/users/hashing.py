@@ -0,0 +1,209 @@
+import time
+import asyncio
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+from hack_or_snooze.exceptions import PasswordHashingBusyException
+
+from .models import User
+
+
+###############################################################################
+# Password hashing pool
+#
+# A password hash (PBKDF2, by default) takes hundreds of milliseconds of CPU.
+# Run inline, a burst of signups or logins ties up every request thread and
+# starves the other routes. Instead, hashes run on a small dedicated thread
+# pool: hashlib releases the GIL while hashing, so the pool's threads hash in
+# parallel and everything else keeps being served. Only the hash itself runs
+# on the pool; database work stays with the request.
+#
+# At most PASSWORD_HASHING_WORKERS hashes run at once and at most
+# PASSWORD_HASHING_MAX_QUEUE more wait for a thread. Past that, requests are
+# refused straight away with a 503 rather than queueing work that would
+# finish long after the client gave up.
+#
+# Each response that hashed carries a Server-Timing header reporting how long
+# its hash waited for a thread and how long it took, eg.
+#
+#     Server-Timing: hash-wait;dur=0.1, hash;dur=254.3
+#
+# and hashing_pool.stats() totals those for the process.
+
+class PasswordHashingPool:
+    """
+    Bounded thread pool for password hashing (see above).
+
+    run() is safe to call from any number of event loops and threads.
+    """
+
+    def __init__(self, workers, max_queue, clock=time.perf_counter):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.clock = clock
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="password-hashing",
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._reset_counters()
+
+    async def run(self, func, *args, response=None):
+        """
+        Return func(*args), called on the pool.
+
+        If response (an HttpResponse) is given, the hash's wait and run
+        times are added to its Server-Timing header.
+
+        Raises PasswordHashingBusyException if the pool's queue is full.
+        """
+
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHashingBusyException()
+
+            self._in_flight += 1
+
+        submitted = self.clock()
+        timings = {}
+
+        def timed():
+            started = self.clock()
+            try:
+                return func(*args)
+            finally:
+                timings["wait"] = started - submitted
+                timings["hash"] = self.clock() - started
+                self._record(timings["wait"], timings["hash"])
+
+        future = self._executor.submit(timed)
+        # Frees the slot once the hash is done (or was cancelled before it
+        # started), even if the awaiting request has gone away:
+        future.add_done_callback(self._release)
+
+        result = await asyncio.wrap_future(future)
+
+        if response is not None:
+            add_server_timing(
+                response,
+                ("hash-wait", timings["wait"]),
+                ("hash", timings["hash"]),
+            )
+
+        return result
+
+    def stats(self):
+        """
+        Return counters for sizing the pool, with times in milliseconds.
+
+        EX: {"completed": 90, "rejected": 0, "in_flight": 3,
+             "wait_avg_ms": 1.2, "wait_max_ms": 40.5,
+             "hash_avg_ms": 251.0, "hash_max_ms": 310.2}
+        """
+
+        with self._lock:
+            completed = self.completed or 1
+
+            return {
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "in_flight": self._in_flight,
+                "wait_avg_ms": self.wait_total / completed * 1000,
+                "wait_max_ms": self.wait_max * 1000,
+                "hash_avg_ms": self.hash_total / completed * 1000,
+                "hash_max_ms": self.hash_max * 1000,
+            }
+
+    def clear(self):
+        """Reset the counters (not the work in flight)."""
+
+        with self._lock:
+            self._reset_counters()
+
+    def _reset_counters(self):
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hash_total = 0.0
+        self.hash_max = 0.0
+
+    def _record(self, wait, duration):
+        with self._lock:
+            self.completed += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.hash_total += duration
+            self.hash_max = max(self.hash_max, duration)
+
+    def _release(self, future):
+        with self._lock:
+            self._in_flight -= 1
+
+
+def add_server_timing(response, *metrics):
+    """Append (name, seconds) metrics to response's Server-Timing header."""
+
+    values = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in metrics]
+
+    if response.has_header("Server-Timing"):
+        values.insert(0, response["Server-Timing"])
+
+    response["Server-Timing"] = ", ".join(values)
+
+
+# Instantiate hashing_pool to use in API routes:
+hashing_pool = PasswordHashingPool(
+    workers=settings.PASSWORD_HASHING_WORKERS,
+    max_queue=settings.PASSWORD_HASHING_MAX_QUEUE,
+)
+
+
+###############################################################################
+# Pooled versions of Django's password operations
+
+async def ahash_password(raw_password, response=None):
+    """Return raw_password hashed for User.password, like
+    User.set_password() does."""
+
+    return await hashing_pool.run(make_password, raw_password,
+                                  response=response)
+
+
+async def aauthenticate_user(username, raw_password, response=None):
+    """
+    Return the active user with username and raw_password, or None.
+
+    Does what Django's ModelBackend does, with the hashing on the pool:
+    hashes even for an unknown username (so it takes as long as a wrong
+    password) and upgrades a hash made with outdated settings.
+    """
+
+    try:
+        user = await User.objects.aget(username=username)
+    except User.DoesNotExist:
+        await hashing_pool.run(make_password, raw_password, response=response)
+        return None
+
+    valid, must_update = await hashing_pool.run(
+        verify_password,
+        raw_password,
+        user.password,
+        response=response
+    )
+
+    if not valid or not user.is_active:
+        return None
+
+    if must_update:
+        user.password = await ahash_password(raw_password)
+        await user.asave(update_fields=["password"])
+
+    return user
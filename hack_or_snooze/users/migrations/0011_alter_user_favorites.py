@@ -0,0 +1,26 @@
+# Generated by Django 5.0 on 2026-10-17 03:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """Point User.favorites at the Favorite model, which already owns its
+    table (see favorites 0001); no database changes."""
+
+    dependencies = [
+        ('favorites', '0001_initial'),
+        ('stories', '0012_trendingstory'),
+        ('users', '0010_alter_user_favorites_alter_user_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='favorites',
+                    field=models.ManyToManyField(blank=True, related_name='favorited_by', through='favorites.Favorite', to='stories.story'),
+                ),
+            ],
+        ),
+    ]
@@ -16,6 +16,7 @@ class User(AbstractUser):
 
     favorites = models.ManyToManyField(
         Story,
+        through="favorites.Favorite",
         related_name="favorited_by",
         blank=True,
     )
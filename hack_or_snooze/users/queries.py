@@ -0,0 +1,263 @@
+from contextlib import nullcontext
+
+from asgiref.sync import sync_to_async
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    F,
+    Count,
+    Max,
+    OuterRef,
+    Prefetch,
+    Subquery,
+    Window,
+    prefetch_related_objects,
+)
+from django.db.models.functions import RowNumber
+
+from stories.models import Story
+from stories.queries import only_story_fields
+
+from .models import User
+
+# UserSchema fields loaded by prefetching rather than from the user row:
+USER_COLLECTIONS = ("stories", "favorites")
+
+
+###############################################################################
+# Helpers to load users for UserSchema serialization
+#
+# UserSchema walks user.stories and user.favorites. Without prefetching, each
+# of those is a lazy query issued during serialization. Every route returning
+# UserOutput/AuthOutput should load its user through one of these helpers, so
+# a full user payload costs: the user row + one query per nested collection.
+#
+# All of these load a single user's payload at a time.
+#
+# fields/story_fields are parsed ?fields= values (see
+# hack_or_snooze/fieldsets.py) naming the UserSchema/StorySchema fields to
+# load; None means all of them.
+
+
+def first_rows(queryset, order, limit=None):
+    """
+    Return queryset ordered by order, keeping only the first limit rows if
+    limit is given.
+
+    Prefetch() rejects a sliced queryset unless it uses to_attr, which would
+    hide the collection from UserSchema. Filtering on a row number window
+    keeps the same cut and stays usable as a prefetch queryset. The window
+    is not partitioned, so it is only correct when prefetching for one user.
+    """
+
+    queryset = queryset.order_by(*order)
+
+    if limit is None:
+        return queryset
+
+    return queryset.annotate(
+        row_rank=Window(RowNumber(), order_by=order)
+    ).filter(row_rank__lte=limit)
+
+
+def newest_stories(limit=None, story_fields=None):
+    """
+    Return a Story queryset ordered newest first, keeping only the first
+    limit rows if limit is given, and only the columns for story_fields.
+    """
+
+    # prefetching user.stories groups rows by "user_id":
+    stories = only_story_fields(Story.objects.all(), story_fields, "user_id")
+
+    return first_rows(stories, [F("created").desc(), F("id").desc()], limit)
+
+
+def favorites_by_recency(username):
+    """
+    Return a Story queryset of username's favorites, annotated with when each
+    was favorited ("favorited") and its Favorite row id ("favorite_id"), for
+    newest-first keyset pagination on that pair.
+
+    The annotations reuse the filter's join, so each story appears once; the
+    (user, created, id) index on favorites backs the ordering.
+    """
+
+    return Story.objects.filter(favorite__user_id=username).annotate(
+        favorited=F("favorite__created"),
+        favorite_id=F("favorite__id"),
+    )
+
+
+def newest_favorites(username, limit=None, story_fields=None):
+    """
+    Return username's favorites as a Story queryset, most recently favorited
+    first (the order GET /users/{username}/favorites pages in), keeping only
+    the first limit rows if limit is given, and only the columns for
+    story_fields.
+
+    The window has to rank favorites_by_recency()'s join: prefetching
+    user.favorites adds its own join on favorites only after the queryset
+    is built, too late for the window to use. As (user, story) is unique,
+    that second join matches one row per story.
+    """
+
+    favorites = only_story_fields(
+        favorites_by_recency(username), story_fields, "user_id"
+    )
+
+    return first_rows(
+        favorites, [F("favorited").desc(), F("favorite_id").desc()], limit
+    )
+
+
+def user_payload_prefetches(username, stories_limit=None,
+                            favorites_limit=None, collections=USER_COLLECTIONS,
+                            story_fields=None):
+    """
+    Return the Prefetch lookups UserSchema needs for username: their stories
+    newest first, and their favorites most recently favorited first.
+
+    stories_limit/favorites_limit keep only the first N of each collection;
+    None means the whole collection. Only the named collections are
+    prefetched.
+    """
+
+    querysets = {
+        "stories": newest_stories(stories_limit, story_fields),
+        "favorites": newest_favorites(username, favorites_limit, story_fields),
+    }
+
+    return [
+        Prefetch(name, queryset=querysets[name]) for name in collections
+    ]
+
+
+def user_payload_queryset(username, stories_limit=None, favorites_limit=None,
+                          fields=None, story_fields=None):
+    """
+    Return a queryset of the user username that loads everything UserSchema
+    needs for fields, and no more.
+
+    EX: get_object_or_404(user_payload_queryset("test"))
+    """
+
+    users = User.objects.filter(username=username)
+    collections = USER_COLLECTIONS
+
+    if fields is not None:
+        collections = [name for name in collections if name in fields]
+        users = users.only(
+            "username",
+            *(name for name in fields if name not in USER_COLLECTIONS)
+        )
+
+    return users.prefetch_related(
+        *user_payload_prefetches(
+            username,
+            stories_limit,
+            favorites_limit,
+            collections,
+            story_fields
+        )
+    )
+
+
+async def aprefetch_user_payload(user, stories_limit=None,
+                                 favorites_limit=None):
+    """
+    Prefetch UserSchema's nested collections onto an already loaded user.
+    (Django 5.0 has no async prefetch_related_objects(), so it runs in a
+    thread.)
+
+    Collections that are already prefetched are not fetched again. Returns the
+    same user instance.
+    """
+
+    await sync_to_async(prefetch_related_objects)(
+        [user],
+        *user_payload_prefetches(user.pk, stories_limit, favorites_limit)
+    )
+
+    return user
+
+
+def aggregate_subquery(queryset, group_field, aggregate):
+    """Return a scalar Subquery of aggregate over queryset, which must already
+    be filtered to a single group_field value."""
+
+    return Subquery(
+        queryset.order_by()
+        .values(group_field)
+        .annotate(value=aggregate)
+        .values("value")[:1]
+    )
+
+
+async def auser_payload_validators(username):
+    """
+    Return a tuple that changes whenever the user's UserSchema payload does
+    (but see below), or None if the user does not exist. Costs one query.
+
+    Covers the user's own payload fields, the count and newest "modified" of
+    their stories and of their favorited stories, and the count and highest
+    id of their favorite rows (ids only grow, so any add or remove moves one
+    of the two). The stories' favorite counts are not covered, since
+    favoriting doesn't move "modified"; pair this with
+    stories.cache.favorite_counts_version() where they are shown.
+    """
+
+    stories = Story.objects.filter(user_id=OuterRef("username"))
+    favorited_stories = Story.objects.filter(favorited_by=OuterRef("username"))
+    favorites = User.favorites.through.objects.filter(
+        user_id=OuterRef("username")
+    )
+
+    return await User.objects.filter(username=username).annotate(
+        stories_count=aggregate_subquery(stories, "user_id", Count("id")),
+        stories_modified=aggregate_subquery(
+            stories, "user_id", Max("modified")
+        ),
+        favorites_count=aggregate_subquery(favorites, "user_id", Count("id")),
+        favorites_max_id=aggregate_subquery(favorites, "user_id", Max("id")),
+        favorited_modified=aggregate_subquery(
+            favorited_stories, "favorited_by", Max("modified")
+        ),
+    ).values_list(
+        "first_name",
+        "last_name",
+        "date_joined",
+        "stories_count",
+        "stories_modified",
+        "favorites_count",
+        "favorites_max_id",
+        "favorited_modified",
+    ).afirst()
+
+
+async def ainsert_user(**fields):
+    """
+    Create a user with a single INSERT and return it, or return None if the
+    username is taken.
+
+    Relies on the username primary key to reject duplicates, so concurrent
+    signups for one name can't both succeed and need no existence check
+    first. fields go to User(); the password must already be hashed.
+    """
+
+    @sync_to_async
+    def insert():
+        # A failed INSERT aborts an enclosing transaction (eg. a test's), so
+        # guard it with a savepoint there; in autocommit, adding one would
+        # cost a BEGIN and COMMIT round trip:
+        if transaction.get_connection().in_atomic_block:
+            guard = transaction.atomic()
+        else:
+            guard = nullcontext()
+
+        try:
+            with guard:
+                return User.objects.create(**fields)
+        except IntegrityError:
+            return None
+
+    return await insert()
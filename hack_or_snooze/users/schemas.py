@@ -1,5 +1,5 @@
 import re
-from typing import List
+from typing import Dict, List, Literal, Optional
 
 from pydantic import validator, model_validator
 
@@ -35,6 +35,21 @@ class UserOutput(Schema):
     user: UserSchema
 
 
+class UserPayloadLimits(Schema):
+    """Query parameters to keep only the newest N nested stories/favorites in
+    a user payload. Omitted means the whole collection."""
+
+    stories_limit: Optional[int] = Field(None, ge=0)
+    favorites_limit: Optional[int] = Field(None, ge=0)
+
+
+class UserFavoritesOutput(Schema):
+    """Schema for GET /users/{username}/favorites response body"""
+
+    favorites: List[StorySchema]
+    next: Optional[str] = None
+
+
 class UserPatchInput(ModelSchema):
     """Schema for PATCH /users/{username} response body"""
 
@@ -108,6 +123,62 @@ class UserPatchInput(ModelSchema):
 #     story_id: str
 
 
+class FavoriteToggleOutput(Schema):
+    """Schema for the ?delta=true response of POST
+    /favorites/{username}/{story_id}/favorite (and /unfavorite)"""
+
+    story_id: str
+    favorited: bool
+    favorite_count: int
+
+
+class FavoriteBatchInput(Schema):
+    """Schema for POST /favorites/{username}/batch request body"""
+
+    add: List[str] = []
+    remove: List[str] = []
+
+    class Config:
+        extra = FORBID_EXTRA_FIELDS_KEYWORD
+
+
+class FavoriteBatchResult(Schema):
+    """What a favorites batch did with one story ID."""
+
+    story_id: str
+    outcome: Literal[
+        "added",
+        "already_favorited",
+        "own_story",
+        "not_found",
+        "removed",
+        "not_favorited",
+    ]
+
+
+class FavoriteBatchOutput(Schema):
+    """Schema for POST /favorites/{username}/batch response body. "user" is
+    left out of delta responses."""
+
+    results: List[FavoriteBatchResult]
+    user: Optional[UserSchema] = None
+
+
+class FavoriteContainsInput(Schema):
+    """Schema for POST /favorites/{username}/contains request body"""
+
+    ids: List[str]
+
+    class Config:
+        extra = FORBID_EXTRA_FIELDS_KEYWORD
+
+
+class FavoriteContainsOutput(Schema):
+    """Schema for POST /favorites/{username}/contains response body"""
+
+    favorited: Dict[str, bool]
+
+
 ### AUTH SCHEMAS ###
 
 class SignupInput(ModelSchema):
@@ -1,9 +1,13 @@
 import json
+import asyncio
+import datetime
 
 from django.test import TestCase
 
+from users.models import User
 from users.factories import UserFactory, FACTORY_USER_DEFAULT_PASSWORD
-from users.auth_utils import generate_token
+from users.auth_utils import generate_token, user_cache
+from stories.factories import StoryFactory
 
 AUTH_KEY = 'token'
 EMPTY_TOKEN_VALUE = ''
@@ -208,6 +212,34 @@ class APIAuthTestCase(TestCase):
             }
         )
 
+    async def test_signup_concurrent_same_username(self):
+        """Test parallel signups for one username create it once; the rest
+        get the usual 400, not a 500 from the primary key constraint."""
+
+        responses = await asyncio.gather(*(
+            self.async_client.post(
+                '/api/users/signup',
+                data=json.dumps(self.valid_signup_data),
+                content_type="application/json"
+            )
+            for _ in range(5)
+        ))
+
+        self.assertEqual(
+            sorted(response.status_code for response in responses),
+            [201, 400, 400, 400, 400]
+        )
+        for response in responses:
+            if response.status_code == 400:
+                self.assertEqual(
+                    response.json(),
+                    {"detail": "Username already exists."}
+                )
+        self.assertEqual(
+            await User.objects.filter(username="test").acount(),
+            1
+        )
+
     def test_signup_fail_username_must_be_slugified(self):
         """Test username only contains slugified characters, otherwise token
         generation/validation may break."""
@@ -988,3 +1020,494 @@ class APIUserPatchTestCase(TestCase):
                 ]
             }
         )
+
+
+class APIUserQueryCountTestCase(TestCase):
+    """Test that user payloads cost a fixed number of queries regardless of
+    how many stories and favorites the user has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.poster = UserFactory(username="poster")
+
+        cls.user_token = generate_token(cls.user.username)
+
+        for _ in range(10):
+            StoryFactory(user=cls.user)
+            cls.user.favorites.add(StoryFactory(user=cls.poster))
+
+    def setUp(self):
+        # measure the cold path, including the auth lookup:
+        user_cache.clear()
+
+    def test_get_user_query_count(self):
+        # auth, validators, user, stories, favorites
+        with self.assertNumQueries(5):
+            response = self.client.get(
+                '/api/users/user',
+                headers={AUTH_KEY: self.user_token}
+            )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["user"]["stories"]), 10)
+        self.assertEqual(len(response_json["user"]["favorites"]), 10)
+
+    def test_patch_user_query_count(self):
+        # auth, user, stories, favorites, update
+        with self.assertNumQueries(5):
+            response = self.client.patch(
+                '/api/users/user',
+                data=json.dumps({"first_name": "newFirst"}),
+                headers={AUTH_KEY: self.user_token},
+                content_type="application/json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_query_count(self):
+        # user (via authenticate), stories, favorites
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                '/api/users/login',
+                data=json.dumps({
+                    "username": "user",
+                    "password": FACTORY_USER_DEFAULT_PASSWORD
+                }),
+                content_type="application/json"
+            )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["user"]["stories"]), 10)
+        self.assertEqual(len(response_json["user"]["favorites"]), 10)
+
+
+class APIUserNestedLimitsTestCase(TestCase):
+    """Test stories_limit/favorites_limit on user payloads."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.poster = UserFactory(username="poster")
+
+        cls.user_token = generate_token(cls.user.username)
+
+        for day in range(1, 6):
+            created = datetime.datetime(
+                2020, 1, day, 0, 0, 0, 0,
+                tzinfo=datetime.timezone.utc
+            )
+            StoryFactory(user=cls.user, created=created)
+            cls.user.favorites.add(
+                StoryFactory(user=cls.poster, created=created)
+            )
+
+    def test_get_user_limits_keep_newest(self):
+        response = self.client.get(
+            '/api/users/user',
+            {"stories_limit": 2, "favorites_limit": 0},
+            headers={AUTH_KEY: self.user_token}
+        )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(
+            [story["created"] for story in response_json["user"]["stories"]],
+            ["2020-01-05T00:00:00Z", "2020-01-04T00:00:00Z"]
+        )
+        self.assertEqual(response_json["user"]["favorites"], [])
+
+    def test_get_user_favorites_limit_keeps_most_recently_favorited(self):
+        favorite_ids = list(
+            self.user.favorites.order_by("created").values_list(
+                "id", flat=True
+            )
+        )
+        # re-favorite the oldest story, so it is the newest favorite:
+        self.user.favorites.remove(favorite_ids[0])
+        self.user.favorites.add(favorite_ids[0])
+        # other users' favorites of the same stories must not move the cut:
+        self.poster.favorites.add(*favorite_ids)
+
+        response = self.client.get(
+            '/api/users/user',
+            {"favorites_limit": 2},
+            headers={AUTH_KEY: self.user_token}
+        )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(
+            [story["id"] for story in response_json["user"]["favorites"]],
+            [favorite_ids[0], favorite_ids[-1]]
+        )
+
+    def test_get_user_no_limits_returns_everything(self):
+        response = self.client.get(
+            '/api/users/user',
+            headers={AUTH_KEY: self.user_token}
+        )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["user"]["stories"]), 5)
+        self.assertEqual(len(response_json["user"]["favorites"]), 5)
+
+    def test_login_limits(self):
+        response = self.client.post(
+            '/api/users/login?stories_limit=1&favorites_limit=3',
+            data=json.dumps({
+                "username": "user",
+                "password": FACTORY_USER_DEFAULT_PASSWORD
+            }),
+            content_type="application/json"
+        )
+
+        response_json = json.loads(response.content)
+        self.assertEqual(len(response_json["user"]["stories"]), 1)
+        self.assertEqual(len(response_json["user"]["favorites"]), 3)
+
+    def test_get_user_fail_negative_limit(self):
+        response = self.client.get(
+            '/api/users/user',
+            {"stories_limit": -1},
+            headers={AUTH_KEY: self.user_token}
+        )
+
+        self.assertEqual(response.status_code, 422)
+
+
+class APIUserCollectionsGetTestCase(TestCase):
+    """Test GET /users/{username}/stories and /favorites endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.user_2 = UserFactory(username="user2")
+        cls.staff_user = UserFactory(username="staffUser", is_staff=True)
+
+        cls.user_token = generate_token(cls.user.username)
+        cls.user2_token = generate_token(cls.user_2.username)
+        cls.staff_user_token = generate_token(cls.staff_user.username)
+
+        cls.story_ids = []
+        for day in range(1, 6):
+            created = datetime.datetime(
+                2020, 1, day, 0, 0, 0, 0,
+                tzinfo=datetime.timezone.utc
+            )
+            cls.story_ids.insert(
+                0, StoryFactory(user=cls.user, created=created).id
+            )
+            cls.user_2.favorites.add(
+                StoryFactory(user=cls.staff_user, created=created)
+            )
+
+    def page_through(self, url, key, token):
+        seen_ids = []
+        cursor = None
+
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+
+            response = self.client.get(url, params, headers={AUTH_KEY: token})
+            self.assertEqual(response.status_code, 200)
+
+            response_json = json.loads(response.content)
+            seen_ids.extend(story["id"] for story in response_json[key])
+
+            cursor = response_json["next"]
+            if cursor is None:
+                return seen_ids
+
+    def test_get_user_stories_pages_newest_first(self):
+        seen_ids = self.page_through(
+            '/api/users/user/stories', "stories", self.user_token
+        )
+
+        self.assertEqual(seen_ids, self.story_ids)
+
+    def test_get_user_favorites_pages_newest_first(self):
+        seen_ids = self.page_through(
+            '/api/users/user2/favorites', "favorites", self.user2_token
+        )
+
+        self.assertEqual(len(seen_ids), 5)
+        self.assertEqual(len(set(seen_ids)), 5)
+        self.assertNotIn(self.story_ids[0], seen_ids)
+
+    def test_get_user_favorites_pages_most_recently_favorited_first(self):
+        favorite_ids = list(
+            self.user_2.favorites.order_by("created").values_list(
+                "id", flat=True
+            )
+        )
+        # re-favorite the oldest story, so it is the newest favorite:
+        self.user_2.favorites.remove(favorite_ids[0])
+        self.user_2.favorites.add(favorite_ids[0])
+
+        seen_ids = self.page_through(
+            '/api/users/user2/favorites', "favorites", self.user2_token
+        )
+
+        self.assertEqual(
+            seen_ids,
+            [favorite_ids[0], *reversed(favorite_ids[1:])]
+        )
+
+    def test_get_user_stories_ok_as_staff(self):
+        response = self.client.get(
+            '/api/users/user/stories',
+            headers={AUTH_KEY: self.staff_user_token}
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_user_stories_empty_for_user_without_stories(self):
+        response = self.client.get(
+            '/api/users/user2/stories',
+            headers={AUTH_KEY: self.user2_token}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {"stories": [], "next": None}
+        )
+
+    def test_get_user_favorites_fail_unauthorized_as_different_user(self):
+        response = self.client.get(
+            '/api/users/user2/favorites',
+            headers={AUTH_KEY: self.user_token}
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Unauthorized"}
+        )
+
+    def test_get_user_favorites_fail_nonexistent_user_as_staff(self):
+        response = self.client.get(
+            '/api/users/user3/favorites',
+            headers={AUTH_KEY: self.staff_user_token}
+        )
+
+        self.assertEqual(response.status_code, 404)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "User not found."}
+        )
+
+    def test_get_user_collections_fail_nonexistent_user_with_cursor(self):
+        for username, collection in (("user", "stories"),
+                                     ("user2", "favorites")):
+            response = self.client.get(
+                f'/api/users/{username}/{collection}',
+                {"limit": 1},
+                headers={AUTH_KEY: self.staff_user_token}
+            )
+            cursor = json.loads(response.content)["next"]
+
+            response = self.client.get(
+                f'/api/users/user3/{collection}',
+                {"cursor": cursor},
+                headers={AUTH_KEY: self.staff_user_token}
+            )
+
+            self.assertEqual(response.status_code, 404)
+            self.assertJSONEqual(
+                response.content,
+                {"detail": "User not found."}
+            )
+
+
+    def test_get_user_favorites_fail_stories_cursor(self):
+        response = self.client.get(
+            '/api/users/user/stories',
+            {"limit": 1},
+            headers={AUTH_KEY: self.user_token}
+        )
+        cursor = json.loads(response.content)["next"]
+
+        response = self.client.get(
+            '/api/users/user2/favorites',
+            {"cursor": cursor},
+            headers={AUTH_KEY: self.user2_token}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Invalid cursor."}
+        )
+
+
+class APIUserConditionalGetTestCase(TestCase):
+    """Test ETag handling on GET /users/{username} endpoint."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.poster = UserFactory(username="poster")
+
+        cls.user_token = generate_token(cls.user.username)
+
+        cls.story = StoryFactory(user=cls.user)
+        cls.favorite = StoryFactory(user=cls.poster)
+        cls.user.favorites.add(cls.favorite)
+
+    def get_user(self, etag=None, **params):
+        headers = {AUTH_KEY: self.user_token}
+        if etag:
+            headers["If-None-Match"] = etag
+
+        return self.client.get('/api/users/user', params, headers=headers)
+
+    def test_get_user_not_modified_with_matching_etag(self):
+        etag = self.get_user()["ETag"]
+
+        # auth, validators
+        with self.assertNumQueries(2):
+            user_cache.clear()
+            response = self.get_user(etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+    def test_get_user_etag_differs_per_limits(self):
+        etag = self.get_user()["ETag"]
+
+        response = self.get_user(etag, stories_limit=0)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_get_user_modified_after_patch(self):
+        etag = self.get_user()["ETag"]
+
+        self.user.update({"first_name": "newFirst"})
+
+        self.assertEqual(self.get_user(etag).status_code, 200)
+
+    def test_get_user_modified_after_story_edit(self):
+        etag = self.get_user()["ETag"]
+
+        self.story.title = "edited_title"
+        self.story.save()
+
+        self.assertEqual(self.get_user(etag).status_code, 200)
+
+    def test_get_user_modified_after_favorite_swap(self):
+        etag = self.get_user()["ETag"]
+
+        # same count, same newest "modified", different favorites:
+        self.user.favorites.remove(self.favorite)
+        self.user.favorites.add(self.favorite)
+
+        self.assertEqual(self.get_user(etag).status_code, 200)
+
+    def test_get_user_modified_after_favorite_count_change(self):
+        etag = self.get_user()["ETag"]
+        etag_without_counts = self.get_user(story_fields="id")["ETag"]
+
+        # another user's favorite changes only the story's favorite_count:
+        UserFactory(username="fan").favorites.add(self.favorite)
+
+        self.assertEqual(self.get_user(etag).status_code, 200)
+        self.assertEqual(
+            self.get_user(etag_without_counts, story_fields="id").status_code,
+            304
+        )
+
+    def test_get_user_modified_after_favorited_story_edit(self):
+        etag = self.get_user()["ETag"]
+
+        self.favorite.title = "edited_title"
+        self.favorite.save()
+
+        self.assertEqual(self.get_user(etag).status_code, 200)
+
+
+class APIUserFieldsTestCase(TestCase):
+    """Test ?fields= / ?story_fields= on user endpoints."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory()
+        cls.poster = UserFactory(username="poster")
+
+        cls.user_token = generate_token(cls.user.username)
+
+        cls.story = StoryFactory(user=cls.user)
+        cls.favorite = StoryFactory(user=cls.poster)
+        cls.user.favorites.add(cls.favorite)
+
+    def setUp(self):
+        user_cache.clear()
+
+    def get(self, path, **params):
+        return self.client.get(
+            path,
+            params,
+            headers={AUTH_KEY: self.user_token}
+        )
+
+    def test_get_user_fields_and_story_fields(self):
+        response = self.get(
+            '/api/users/user',
+            fields="username,favorites",
+            story_fields="id,url",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertJSONEqual(
+            response.content,
+            {
+                "user": {
+                    "username": "user",
+                    "favorites": [
+                        {"id": self.favorite.id, "url": self.favorite.url}
+                    ],
+                }
+            }
+        )
+
+    def test_get_user_skips_collections_left_out(self):
+        # auth, validators, user (no stories or favorites queries)
+        with self.assertNumQueries(3):
+            response = self.get('/api/users/user', fields="first_name")
+
+        self.assertJSONEqual(
+            response.content,
+            {"user": {"first_name": self.user.first_name}}
+        )
+
+    def test_get_user_etag_differs_per_fieldset(self):
+        full_etag = self.get('/api/users/user')["ETag"]
+        narrow_etag = self.get('/api/users/user', fields="username")["ETag"]
+
+        self.assertNotEqual(full_etag, narrow_etag)
+
+    def test_get_user_unknown_field(self):
+        response = self.get('/api/users/user', fields="username,password")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(
+            "Unknown fields: password.",
+            json.loads(response.content)["detail"]
+        )
+
+    def test_get_user_collections_fields(self):
+        stories = self.get('/api/users/user/stories', fields="id,title")
+        favorites = self.get('/api/users/user/favorites', fields="username")
+
+        self.assertJSONEqual(
+            stories.content,
+            {
+                "stories": [{"id": self.story.id, "title": self.story.title}],
+                "next": None,
+            }
+        )
+        self.assertJSONEqual(
+            favorites.content,
+            {"favorites": [{"username": "poster"}], "next": None}
+        )
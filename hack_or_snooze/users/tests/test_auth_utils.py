@@ -1,8 +1,16 @@
+from asgiref.sync import async_to_sync
 from django.test import TestCase
 
 from users.models import User
 from users.factories import UserFactory
-from users.auth_utils import generate_token, generate_hash, check_token, ApiKey
+from users.auth_utils import (
+    generate_token,
+    generate_hash,
+    check_token,
+    ApiKey,
+    AuthUserCache,
+    user_cache,
+)
 
 # Pass empty dictionary to simulate request object:
 REQUEST_MOCK = {}
@@ -15,53 +23,62 @@ class ApiKeyTestCase(TestCase):
         self.user_token = generate_token(self.user.username)
 
         self.token_header = ApiKey()
+        user_cache.clear()
 
-    def test_authenticate_ok(self):
+    async def test_authenticate_ok(self):
         """Test authenticate method returns User instance on success."""
 
         # Pass empty dictionary to simulate request object:
-        user = self.token_header.authenticate(REQUEST_MOCK, self.user_token)
+        user = await self.token_header.authenticate(
+            REQUEST_MOCK, self.user_token
+        )
 
         self.assertIsInstance(user, User)
         self.assertEqual(user.username, self.user.username)
 
-    def test_authenticate_fail_token_is_none(self):
+    async def test_authenticate_fail_token_is_none(self):
         """Test authenticate method returns None when passed a None value for
         token."""
 
-        user = self.token_header.authenticate(REQUEST_MOCK, None)
+        user = await self.token_header.authenticate(REQUEST_MOCK, None)
 
         self.assertIsNone(user)
 
-    def test_authenticate_fail_token_is_blank(self):
+    async def test_authenticate_fail_token_is_blank(self):
         """Test authenticate method returns None when passed an empty value for
         token."""
 
-        user = self.token_header.authenticate(REQUEST_MOCK, "")
+        user = await self.token_header.authenticate(REQUEST_MOCK, "")
 
         self.assertIsNone(user)
 
-    def test_authenticate_fail_token_is_malformed(self):
+    async def test_authenticate_fail_token_is_malformed(self):
         """Test authenticate method returns None when token is malformed
         (contains multiple colons)."""
 
-        user = self.token_header.authenticate(REQUEST_MOCK, 'malformed::token')
+        user = await self.token_header.authenticate(
+            REQUEST_MOCK, 'malformed::token'
+        )
 
         self.assertIsNone(user)
 
-    def test_authenticate_fail_token_is_invalid(self):
+    async def test_authenticate_fail_token_is_invalid(self):
         """Test authenticate method returns None when token is invalid
         (username/hash mismatch)."""
 
-        user = self.token_header.authenticate(REQUEST_MOCK, 'user:abcdef123456')
+        user = await self.token_header.authenticate(
+            REQUEST_MOCK, 'user:abcdef123456'
+        )
 
         self.assertIsNone(user)
 
-    def test_authenticate_fail_no_user_matching_token(self):
+    async def test_authenticate_fail_no_user_matching_token(self):
         """Test authenticate method returns None when token is valid, but does
         not coorespond to an existing user."""
 
-        user = self.token_header.authenticate(REQUEST_MOCK, 'nonexistent:357f5c155c9d')
+        user = await self.token_header.authenticate(
+            REQUEST_MOCK, 'nonexistent:357f5c155c9d'
+        )
 
         self.assertIsNone(user)
 
@@ -106,3 +123,106 @@ class AuthUtilsTestCase(TestCase):
 
         self.assertFalse(is_valid)
 
+
+
+class FakeClock:
+    """Clock whose time only moves when told to."""
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+class AuthUserCacheTestCase(TestCase):
+    """Tests for the per-process authenticated-user cache."""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.user_token = generate_token(self.user.username)
+
+        self.authenticate = async_to_sync(ApiKey().authenticate)
+        user_cache.clear()
+
+    def test_authenticate_cache_hit_skips_database(self):
+        self.authenticate(REQUEST_MOCK, self.user_token)
+
+        with self.assertNumQueries(0):
+            user = self.authenticate(
+                REQUEST_MOCK, self.user_token
+            )
+
+        self.assertEqual(user.username, self.user.username)
+        self.assertEqual(user_cache.stats()["hits"], 1)
+        self.assertEqual(user_cache.stats()["misses"], 1)
+
+    def test_authenticate_does_not_cache_failures(self):
+        self.authenticate(REQUEST_MOCK, 'nonexistent:357f5c155c9d')
+
+        self.assertEqual(user_cache.stats()["size"], 0)
+
+    def test_authenticate_loads_only_auth_columns(self):
+        user = self.authenticate(REQUEST_MOCK, self.user_token)
+
+        self.assertEqual(
+            user.get_deferred_fields() & {"username", "is_staff"},
+            set()
+        )
+        self.assertIn("password", user.get_deferred_fields())
+
+    def test_user_update_invalidates_cache(self):
+        self.authenticate(REQUEST_MOCK, self.user_token)
+
+        self.user.update({"first_name": "newFirst"})
+
+        self.assertEqual(user_cache.stats()["size"], 0)
+
+    def test_staff_flag_change_invalidates_cache(self):
+        user = self.authenticate(REQUEST_MOCK, self.user_token)
+        self.assertFalse(user.is_staff)
+
+        self.user.is_staff = True
+        self.user.save()
+
+        user = self.authenticate(REQUEST_MOCK, self.user_token)
+        self.assertTrue(user.is_staff)
+
+    def test_user_delete_invalidates_cache(self):
+        self.authenticate(REQUEST_MOCK, self.user_token)
+
+        self.user.delete()
+
+        user = self.authenticate(REQUEST_MOCK, self.user_token)
+        self.assertIsNone(user)
+
+    def test_cache_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = AuthUserCache(maxsize=10, ttl=60, clock=clock)
+
+        cache.set(self.user_token, self.user)
+        clock.now = 59
+        self.assertIs(cache.get(self.user_token), self.user)
+
+        clock.now = 60
+        self.assertIsNone(cache.get(self.user_token))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = AuthUserCache(maxsize=2, ttl=60)
+
+        cache.set("a", "user_a")
+        cache.set("b", "user_b")
+        cache.get("a")
+        cache.set("c", "user_c")
+
+        self.assertEqual(cache.get("a"), "user_a")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "user_c")
+
+    def test_cache_disabled_with_zero_maxsize(self):
+        cache = AuthUserCache(maxsize=0, ttl=60)
+
+        cache.set("a", "user_a")
+
+        self.assertIsNone(cache.get("a"))
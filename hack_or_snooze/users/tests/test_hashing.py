@@ -0,0 +1,180 @@
+import json
+import asyncio
+import threading
+
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.http import HttpResponse
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from hack_or_snooze.exceptions import PasswordHashingBusyException
+from users.factories import UserFactory
+from users.hashing import (
+    PasswordHashingPool,
+    aauthenticate_user,
+    hashing_pool,
+)
+
+
+class PasswordHashingPoolTestCase(SimpleTestCase):
+    """Tests for the bounded password hashing pool."""
+
+    def setUp(self):
+        self.pool = PasswordHashingPool(workers=1, max_queue=1)
+
+    async def test_run_returns_result_and_records_timings(self):
+        response = HttpResponse()
+
+        result = await self.pool.run(sum, [1, 2], response=response)
+
+        self.assertEqual(result, 3)
+        self.assertRegex(
+            response["Server-Timing"],
+            r"^hash-wait;dur=\d+\.\d, hash;dur=\d+\.\d$"
+        )
+
+        stats = self.pool.stats()
+        self.assertEqual(stats["completed"], 1)
+        self.assertEqual(stats["rejected"], 0)
+        self.assertEqual(stats["in_flight"], 0)
+
+    async def test_run_rejects_when_queue_full(self):
+        release = threading.Event()
+
+        running = asyncio.ensure_future(self.pool.run(release.wait))
+        queued = asyncio.ensure_future(self.pool.run(release.wait))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(PasswordHashingBusyException):
+            await self.pool.run(release.wait)
+
+        self.assertEqual(self.pool.stats()["in_flight"], 2)
+        self.assertEqual(self.pool.stats()["rejected"], 1)
+
+        release.set()
+        await asyncio.gather(running, queued)
+
+        self.assertEqual(self.pool.stats()["in_flight"], 0)
+        self.assertEqual(self.pool.stats()["completed"], 2)
+
+    async def test_run_frees_slot_when_func_raises(self):
+        with self.assertRaises(ZeroDivisionError):
+            await self.pool.run(lambda: 1 / 0)
+
+        self.assertEqual(self.pool.stats()["in_flight"], 0)
+        self.assertEqual(await self.pool.run(abs, -1), 1)
+
+
+class AuthenticateUserTestCase(TestCase):
+    """Tests for aauthenticate_user()."""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.user.set_password("password")
+        self.user.save()
+
+    async def test_authenticate_ok(self):
+        user = await aauthenticate_user(self.user.username, "password")
+
+        self.assertEqual(user.username, self.user.username)
+
+    async def test_authenticate_fail_wrong_password(self):
+        user = await aauthenticate_user(self.user.username, "wrong")
+
+        self.assertIsNone(user)
+
+    async def test_authenticate_fail_unknown_user_still_hashes(self):
+        hashing_pool.clear()
+
+        user = await aauthenticate_user("nonexistent", "password")
+
+        self.assertIsNone(user)
+        self.assertEqual(hashing_pool.stats()["completed"], 1)
+
+    async def test_authenticate_fail_inactive_user(self):
+        self.user.is_active = False
+        await self.user.asave()
+
+        user = await aauthenticate_user(self.user.username, "password")
+
+        self.assertIsNone(user)
+
+    @override_settings(PASSWORD_HASHERS=[
+        "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ])
+    async def test_authenticate_upgrades_outdated_hash(self):
+        self.user.password = make_password("password", hasher="md5")
+        await self.user.asave()
+
+        await aauthenticate_user(self.user.username, "password")
+
+        await self.user.arefresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+        self.assertTrue(check_password("password", self.user.password))
+
+
+class APIPasswordHashingTestCase(TestCase):
+    """Test login/signup/patch through the hashing pool."""
+
+    def setUp(self):
+        self.user = UserFactory()
+        self.user.set_password("password")
+        self.user.save()
+
+    def test_login_reports_server_timing(self):
+        response = self.client.post(
+            '/api/users/login',
+            data=json.dumps({
+                "username": self.user.username,
+                "password": "password",
+            }),
+            content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("hash;dur=", response["Server-Timing"])
+
+    def test_signup_fail_503_when_pool_saturated(self):
+        with mock.patch.object(hashing_pool, "workers", 0), \
+                mock.patch.object(hashing_pool, "max_queue", 0):
+            response = self.client.post(
+                '/api/users/signup',
+                data=json.dumps({
+                    "username": "newuser",
+                    "password": "password",
+                    "first_name": "First",
+                    "last_name": "Last",
+                }),
+                content_type="application/json"
+            )
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertJSONEqual(
+            response.content,
+            {"detail": "Server busy. Try again shortly."}
+        )
+
+    def test_signup_password_hashed(self):
+        response = self.client.post(
+            '/api/users/signup',
+            data=json.dumps({
+                "username": "newuser",
+                "password": "password",
+                "first_name": "First",
+                "last_name": "Last",
+            }),
+            content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(
+            '/api/users/login',
+            data=json.dumps({"username": "newuser", "password": "password"}),
+            content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, 200)